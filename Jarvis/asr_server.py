@@ -4,37 +4,51 @@ import socket
 import threading
 import json
 import os
+import time
+from collections import namedtuple
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from accelerate import Accelerator
 import torch
-import requests
-import re
 from memory import (
     initialize_db,
     set_persistent,
     get_persistent,
     add_short_term,
-    get_short_term,
-    cleanup_short_term,
-    start_memory_cleanup
+    get_conversation_context,
+    start_memory_cleanup,
+    start_summary_compaction,
+    start_write_behind,
+    flush_memory,
+    enable_semantic_index,
+    recall,
+    format_turn,
+    DEFAULT_SESSION
 )
-from info_retriever.info_retriever import InfoRetriever  # Ensure correct import
+from memory_index import load_embedder
+from info_retriever.info_retriever import InfoRetriever, RetrievalFailure  # Ensure correct import
+from info_retriever.wiki_index import WikiIndex
+from generation import generate, load_draft_model, reply_token_budget, record_wasted_tokens
+from sanitizer import sanitize
+from model_worker import ModelWorkerPool, RemoteModel
+from fast_path import FastPath, DETERMINISTIC_INTENTS
+from scheduler import RequestScheduler, PRIORITY_CONTROL, PRIORITY_DIRECT, PRIORITY_CHAT, PRIORITY_SUMMARY, PRIORITY_NAMES
+from cancellation import CancellationToken, RequestCancelled, check_cancelled, current_token
+from audio_transport import negotiate, pack_header, DEFAULT_SAMPLE_RATE
+from structured_logging import setup_logging, request_context, elapsed_ms
+from warm_state import WarmCache, WarmState, cache_version
 import logging
 from dotenv import load_dotenv
 import warnings
 import azure.cognitiveservices.speech as speechsdk
-from pydub import AudioSegment
-import io
 from datetime import datetime  # Import datetime for date functionality
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
+# Configure logging: queued, so request threads never wait on file I/O; noisy categories are sampled
+setup_logging(
     filename='/c/Users/user/Desktop/Jarvis/asr_server.log',
     filemode='a',
-    format='%(asctime)s - %(levelname)s - %(message)s',
     level=logging.DEBUG  # Set to DEBUG for detailed logs
 )
 logger = logging.getLogger("ASR_Server")
@@ -47,6 +61,8 @@ warnings.filterwarnings("ignore", category=FutureWarning, module="transformers")
 # Initialize memory
 initialize_db()
 start_memory_cleanup()
+start_write_behind()
+enable_semantic_index(load_embedder(os.getenv("EMBEDDING_MODEL")))  # e.g., "all-MiniLM-L6-v2"
 
 # Token for Hugging Face
 token = os.getenv("HUGGINGFACE_HUB_TOKEN")
@@ -82,39 +98,215 @@ if tokenizer.pad_token is None:
     tokenizer.pad_token = tokenizer.eos_token
     logging.info("Set pad_token to eos_token.")
 
-# Load the model in float16 without bitsandbytes
-try:
-    model = AutoModelForCausalLM.from_pretrained(
+# Optional draft model for assisted (speculative) decoding; must share Vicuna's tokenizer
+DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL_NAME")  # e.g., "double7/vicuna-68m"
+ASSISTED_DECODING_CHAT = os.getenv("ASSISTED_DECODING_CHAT", "1") == "1"
+ASSISTED_DECODING_SUMMARY = os.getenv("ASSISTED_DECODING_SUMMARY", "1") == "1"
+
+# Serve the model from dedicated worker processes instead of this one (0 keeps it in-process)
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "0"))
+MODEL_WORKER_DEVICES = os.getenv("MODEL_WORKER_DEVICES", "auto").split(",")  # e.g., "cuda:0,cuda:1"
+MODEL_WORKER_START_TIMEOUT = float(os.getenv("MODEL_WORKER_START_TIMEOUT", "900"))  # Seconds to load the models
+
+model_pool = None
+chat_draft_model = None
+summary_draft_model = None
+
+if MODEL_WORKERS > 0:
+    model_pool = ModelWorkerPool(
+        MODEL_WORKERS,
         model_name,
-        torch_dtype=torch.float16,
-        device_map="auto",  # Automatically maps layers to available devices
-        offload_folder="/c/Users/user/Desktop/Jarvis/offload",
-        low_cpu_mem_usage=True,
-        use_auth_token=token,
-        use_safetensors=False
+        devices=MODEL_WORKER_DEVICES,
+        draft_model_name=DRAFT_MODEL_NAME if (ASSISTED_DECODING_CHAT or ASSISTED_DECODING_SUMMARY) else None,
+        token=token,
+        start_timeout=MODEL_WORKER_START_TIMEOUT
     )
+    model_pool.start()
+    logging.info(f"Serving Vicuna 7B from {MODEL_WORKERS} worker process(es).")
 
-    logging.info("Vicuna 7B model loaded successfully.")
+    chat_model = RemoteModel(model_pool, assisted=bool(DRAFT_MODEL_NAME) and ASSISTED_DECODING_CHAT, label="chat")
+    summary_model = RemoteModel(model_pool, assisted=bool(DRAFT_MODEL_NAME) and ASSISTED_DECODING_SUMMARY, label="summary")
+else:
+    # Load the model in float16 without bitsandbytes
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            device_map="auto",  # Automatically maps layers to available devices
+            offload_folder="/c/Users/user/Desktop/Jarvis/offload",
+            low_cpu_mem_usage=True,
+            use_auth_token=token,
+            use_safetensors=False
+        )
 
-    # Prepare the model with Accelerator
-    model = accelerator.prepare(model)
-    logging.info("Model prepared with Accelerator.")
+        logging.info("Vicuna 7B model loaded successfully.")
 
-    # Update generation configuration to enable sampling
-    model.config.update({
-        "do_sample": True,
-        "temperature": 0.7,
-        "top_p": 0.9,
-        "max_length": 512
-    })
-    logging.debug("Model generation configuration updated.")
+        # Prepare the model with Accelerator
+        model = accelerator.prepare(model)
+        logging.info("Model prepared with Accelerator.")
 
-except Exception as e:
-    logging.critical(f"Failed to load AI model: {e}", exc_info=True)
-    raise e
+        # Update generation configuration to enable sampling
+        model.config.update({
+            "do_sample": True,
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "max_length": 512
+        })
+        logging.debug("Model generation configuration updated.")
+
+    except Exception as e:
+        logging.critical(f"Failed to load AI model: {e}", exc_info=True)
+        raise e
+
+    draft_model = None
+    if DRAFT_MODEL_NAME and (ASSISTED_DECODING_CHAT or ASSISTED_DECODING_SUMMARY):
+        draft_model = load_draft_model(DRAFT_MODEL_NAME, model, token=token)
+
+    chat_draft_model = draft_model if ASSISTED_DECODING_CHAT else None
+    summary_draft_model = draft_model if ASSISTED_DECODING_SUMMARY else None
+    chat_model = model
+    summary_model = model
+
+# Optional local Wikipedia index (built with `python -m info_retriever.wiki_index`)
+WIKI_INDEX_PATH = os.getenv("WIKI_INDEX_PATH")
+wiki_index = None
+if WIKI_INDEX_PATH:
+    try:
+        wiki_index = WikiIndex(WIKI_INDEX_PATH)
+        logging.info(f"Using local Wikipedia index at {WIKI_INDEX_PATH}.")
+    except FileNotFoundError as e:
+        logging.warning(f"{e} Wikipedia lookups will use the network.")
 
 # Initialize InfoRetriever with tokenizer and model
-info_retriever = InfoRetriever(tokenizer, model)
+info_retriever = InfoRetriever(tokenizer, summary_model, draft_model=summary_draft_model, wiki_index=wiki_index)
+
+def summarize_conversation(previous_summary, turns):
+    """
+    Summarizer used by the background memory compaction; folds older turns into the rolling summary.
+    """
+    assistant_name = get_persistent("assistant_name")
+    text = f"Summary so far: {previous_summary}\n\n" if previous_summary else ""
+    text += "".join(f"User: {cmd}\n{assistant_name}: {resp}\n" for cmd, resp in turns)
+    summary = info_retriever.summarize_text_local(text, max_length=120)
+    if isinstance(summary, RetrievalFailure):
+        raise RuntimeError(summary)
+    return summary
+
+# Requests run on a priority scheduler: control > direct answers > LLM chat > summarization
+# Two general workers let concurrent requests overlap (and identical ones share one retrieval or summary);
+# a single worker runs every generation strictly one at a time
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "2"))  # Workers that take any class, including the LLM
+SCHEDULER_RESERVED_WORKERS = int(os.getenv("SCHEDULER_RESERVED_WORKERS", "1"))  # Workers kept for control/direct requests
+scheduler = RequestScheduler(workers=SCHEDULER_WORKERS, reserved_workers=SCHEDULER_RESERVED_WORKERS)
+
+# Background compaction competes for the model at the lowest priority
+start_summary_compaction(
+    lambda previous_summary, turns: scheduler.submit(
+        PRIORITY_SUMMARY, summarize_conversation, previous_summary, turns
+    ).result()
+)
+
+# Commands that cancel the session's in-flight requests
+STOP_COMMANDS = {"stop", "cancel", "jarvis stop", "jarvis cancel"}
+
+# Cancellation tokens of in-flight requests, per session
+active_requests = {}
+active_requests_lock = threading.Lock()
+
+def request_priority(command):
+    lowered = command.lower()
+    if lowered == "system_greet" or lowered in STOP_COMMANDS:
+        return PRIORITY_CONTROL
+    intent = info_retriever.classify_intent(command)
+    if intent in DETERMINISTIC_INTENTS:
+        return PRIORITY_DIRECT
+    if intent == "search":
+        return PRIORITY_SUMMARY  # Web results are summarized before the chat model even runs
+    return PRIORITY_CHAT
+
+def cancel_session_requests(session_id, reason):
+    current = current_token.get()
+    with active_requests_lock:
+        tokens = [token for token in active_requests.get(session_id, ()) if token is not current]
+    for token in tokens:
+        token.cancel(reason)
+    return len(tokens)
+
+def watch_client(client_socket, token, finished):
+    """
+    Cancel the request if the client disconnects or sends {"type": "cancel"} while it is being processed.
+    """
+    while not finished.is_set():
+        try:
+            data = client_socket.recv(4096)
+        except OSError:
+            data = b""
+        if finished.is_set():
+            return
+        if not data:
+            token.cancel("client disconnected")
+            return
+        try:
+            message = json.loads(data.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+        if isinstance(message, dict) and message.get("type") == "cancel":
+            token.cancel("client cancelled")
+            return
+
+def rephrase_answer(text):
+    """
+    Reword a templated fast-path answer; runs in the background and is cached by FastPath.
+    """
+    prompt = f"Rephrase the following answer naturally, in one or two sentences:\n\n{text}\n\nRephrased:"
+    encoding = tokenizer(prompt, return_tensors="pt")
+    input_ids = encoding["input_ids"].to(chat_model.device)
+    with torch.no_grad():
+        output_ids = generate(
+            chat_model,
+            input_ids=input_ids,
+            attention_mask=encoding["attention_mask"].to(chat_model.device),
+            max_new_tokens=60,
+            temperature=0.7,
+            do_sample=True,
+            top_p=0.9,
+            pad_token_id=tokenizer.pad_token_id
+        )
+    return sanitize_response(tokenizer.decode(output_ids[0][input_ids.shape[-1]:], skip_special_tokens=True).strip())
+
+# Replies longer than this are cut before TTS, so generating past it is wasted work
+TTS_CHAR_LIMIT = 500
+CHAT_MAX_NEW_TOKENS = reply_token_budget(TTS_CHAR_LIMIT)
+
+# Text after any of these phrases is dropped from replies
+UNWANTED_PHRASES = [
+    "Please provide the actual text",
+    "Is there anything else I can assist you with?",
+    "Please let me know if you need further assistance.",
+    "Based on your owner's profile",  # Remove profile-based instructions
+    "Please provide a concise and accurate response based on the information provided."  # Added phrase
+]
+
+def limit_tts_length(text):
+    """
+    Cut replies longer than TTS_CHAR_LIMIT; applies to every path that reaches TTS.
+    """
+    if len(text) > TTS_CHAR_LIMIT:
+        logging.warning("Response truncated to prevent TTS cutoff.")
+        return text[:TTS_CHAR_LIMIT - 3] + "..."
+    return text
+
+def chat_stop_phrases(assistant_name):
+    """
+    Chat replies end where the model starts another speaker's turn or a phrase sanitize_response would cut.
+    """
+    return ["User:", f"{assistant_name}:"] + UNWANTED_PHRASES
+
+# Answers deterministic intents without the model; FAST_PATH_REPHRASE=1 adds cached background rewording
+fast_path = FastPath(
+    rephraser=rephrase_answer if os.getenv("FAST_PATH_REPHRASE") == "1" else None,
+    cache_version=cache_version(model_name)
+)
 
 # Example: Set persistent memory
 set_persistent("user_name", "Fabian")
@@ -133,30 +325,65 @@ if not AZURE_SPEECH_KEY or not AZURE_SERVICE_REGION:
     logging.critical("Azure Speech Service credentials are not set in environment variables.")
     raise Exception("Azure Speech Service credentials are missing.")
 
-speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_SERVICE_REGION)
-speech_config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3)
-speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+# Azure produces every transport codec directly, so replies are never transcoded here
+AZURE_OUTPUT_FORMATS = {
+    ("opus", 16000): "Ogg16Khz16BitMonoOpus",
+    ("opus", 24000): "Ogg24Khz16BitMonoOpus",
+    ("opus", 48000): "Ogg48Khz16BitMonoOpus",
+    ("mp3", 16000): "Audio16Khz32KBitRateMonoMp3",
+    ("mp3", 24000): "Audio24Khz48KBitRateMonoMp3",
+    ("mp3", 48000): "Audio48Khz96KBitRateMonoMp3",
+    ("pcm", 8000): "Raw8Khz16BitMonoPcm",
+    ("pcm", 16000): "Raw16Khz16BitMonoPcm",
+    ("pcm", 24000): "Raw24Khz16BitMonoPcm",
+    ("pcm", 48000): "Raw48Khz16BitMonoPcm",
+    ("wav", 8000): "Riff8Khz16BitMonoPcm",
+    ("wav", 16000): "Riff16Khz16BitMonoPcm",
+    ("wav", 24000): "Riff24Khz16BitMonoPcm",
+    ("wav", 48000): "Riff48Khz16BitMonoPcm"
+}
+
+# Synthesized replies by (text, codec, sample_rate); greetings and fast-path answers repeat often
+AUDIO_CACHE_MB = int(os.getenv("AUDIO_CACHE_MB", "64"))
+audio_cache = WarmCache(
+    "audio",
+    max_entries=4096,
+    max_bytes=AUDIO_CACHE_MB * 1024 * 1024,
+    codec="bytes",
+    version=cache_version(AZURE_SERVICE_REGION, sorted(AZURE_OUTPUT_FORMATS.items()))
+)
 
-def synthesize_audio_azure(text):
+# One synthesizer per output format, created on first use
+speech_synthesizers = {}
+speech_synthesizers_lock = threading.Lock()
+
+def get_speech_synthesizer(codec, sample_rate):
+    key = (codec, sample_rate)
+    with speech_synthesizers_lock:
+        synthesizer = speech_synthesizers.get(key)
+        if synthesizer is None:
+            speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_SERVICE_REGION)
+            speech_config.set_speech_synthesis_output_format(
+                getattr(speechsdk.SpeechSynthesisOutputFormat, AZURE_OUTPUT_FORMATS[key])
+            )
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+            speech_synthesizers[key] = synthesizer
+        return synthesizer
+
+def synthesize_audio_azure(text, codec="wav", sample_rate=DEFAULT_SAMPLE_RATE):
+    cached = audio_cache.get((text, codec, sample_rate))
+    if cached is not None:
+        logger.info(f"Serving cached {codec} audio ({len(cached)} bytes).")
+        return cached
     try:
-        logger.debug(f"Synthesizing audio for text: {text}")
+        logger.debug("Synthesizing %s audio at %d Hz for text: %s", codec, sample_rate, text, extra={"category": "payload"})
 
-        result = speech_synthesizer.speak_text_async(text).get()
+        result = get_speech_synthesizer(codec, sample_rate).speak_text_async(text).get()
 
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
             logger.info("Azure Speech Service synthesized the audio successfully.")
-
-            # Access the audio data as bytes
-            audio_data = result.audio_data
-
-            # Convert MP3 bytes to WAV using pydub
-            audio_segment = AudioSegment.from_mp3(io.BytesIO(audio_data))  # <-- Uses io
-            buf = io.BytesIO()
-            audio_segment.export(buf, format="wav")
-            buf.seek(0)
-
-            logger.info("Audio converted to WAV format successfully.")
-            return buf
+            audio_cache.put((text, codec, sample_rate), result.audio_data)
+            return result.audio_data
 
         elif result.reason == speechsdk.ResultReason.Canceled:
             cancellation_details = result.cancellation_details
@@ -169,51 +396,185 @@ def synthesize_audio_azure(text):
         logger.error(f"Error during Azure synthesis: {e}", exc_info=True)
         raise e
 
+# Warm caches are snapshotted periodically and at exit, and mapped back lazily on the next start
+WARM_STATE_DIR = os.getenv("WARM_STATE_DIR", "warm_state")  # Empty disables snapshots
+WARM_STATE_INTERVAL = int(os.getenv("WARM_STATE_INTERVAL", "300"))
+warm_state = None
+if WARM_STATE_DIR:
+    warm_state = WarmState(WARM_STATE_DIR, interval=WARM_STATE_INTERVAL)
+    for cache in (info_retriever.summary_cache, info_retriever.retrieval_cache, fast_path.rephrase_cache, audio_cache):
+        warm_state.register(cache)
+    warm_state.restore()
+    warm_state.start()
+
+def parse_client_message(data, client_socket):
+    """
+    Clients send either JSON {"session_id": ..., "text": ..., "codecs": [...], "sample_rate": ..., "request_id": ...}
+    or, for older clients, plain text. Plain-text clients get a session per remote address.
+    Returns (text, session_id, transport, request_id); transport is the negotiated (codec, sample_rate), or None
+    for clients that expect the legacy WAV reply. request_id is the client's, so both logs can be joined on it.
+    """
+    message = data.decode('utf-8').strip()
+    if message.startswith("{"):
+        try:
+            payload = json.loads(message)
+            transport = None
+            if payload.get("codecs"):
+                codec, sample_rate = negotiate(payload["codecs"], int(payload.get("sample_rate") or DEFAULT_SAMPLE_RATE))
+                transport = (codec, sample_rate) if codec else None
+            request_id = str(payload["request_id"]) if payload.get("request_id") else None
+            return payload.get("text", "").strip(), str(payload.get("session_id") or DEFAULT_SESSION), transport, request_id
+        except (json.JSONDecodeError, TypeError, ValueError):
+            logging.warning("Client message looked like JSON but could not be parsed; treating it as text.")
+    try:
+        session_id = f"addr:{client_socket.getpeername()[0]}"
+    except OSError:
+        session_id = DEFAULT_SESSION
+    return message, session_id, None, None
+
 def handle_client_connection(client_socket):
+    finished = threading.Event()
     try:
         data = client_socket.recv(4096)
         if not data:
             logging.warning("No data received from client.")
             return
-        text = data.decode('utf-8').strip()
-        logging.info(f"Received ASR text: {text}")
-        response_text = process_command(text)
+        text, session_id, transport, request_id = parse_client_message(data, client_socket)
+        with request_context(request_id):
+            serve_request(client_socket, text, session_id, transport, finished)
+    except Exception as e:
+        logging.error(f"Error handling client connection: {e}", exc_info=True)
+    finally:
+        finished.set()
+        try:
+            client_socket.shutdown(socket.SHUT_RDWR)  # Wakes the watcher blocked in recv()
+        except OSError:
+            pass
+        client_socket.close()
+        logging.debug("Client socket closed.")
+
+def serve_request(client_socket, text, session_id, transport, finished):
+    """
+    Runs inside the request's logging context; ends with one structured record of per-stage timings,
+    whether the request completed, failed or was cancelled.
+    """
+    timings = {}
+    priority = request_priority(text)
+    outcome = "failed"  # Unless the request gets further; errors propagate to the connection handler
+    try:
+        logging.info(f"Received ASR text for session '{session_id}': {text}")
+
+        token = CancellationToken()
+        with active_requests_lock:
+            active_requests.setdefault(session_id, set()).add(token)
+        threading.Thread(target=watch_client, args=(client_socket, token, finished), daemon=True).start()
+
+        start = time.perf_counter()
+        try:
+            response_text = scheduler.submit(priority, process_command, text, session_id, token=token).result()
+            if isinstance(response_text, PendingChat):
+                # The model never runs on a worker reserved for direct answers, even when a direct lookup failed
+                response_text = scheduler.submit(
+                    max(priority, PRIORITY_CHAT), generate_chat_response, text, session_id,
+                    response_text.retrieved_info, token=token
+                ).result()
+        finally:
+            timings["process_ms"] = round(1000 * (time.perf_counter() - start), 1)
+            with active_requests_lock:
+                session_tokens = active_requests.get(session_id)
+                session_tokens.discard(token)
+                if not session_tokens:
+                    del active_requests[session_id]
         logging.info(f"Generated response: {response_text}")
-        audio_buf = synthesize_audio_azure(response_text)
-        if audio_buf:
-            audio_data = audio_buf.read()
+
+        # No point synthesizing audio nobody will hear
+        token.raise_if_cancelled()
+        codec, sample_rate = transport or ("wav", DEFAULT_SAMPLE_RATE)
+        start = time.perf_counter()
+        audio_data = synthesize_audio_azure(response_text, codec, sample_rate)
+        timings["synthesis_ms"] = round(1000 * (time.perf_counter() - start), 1)
+        token.raise_if_cancelled()
+        if audio_data:
             audio_size = len(audio_data)
-            client_socket.sendall(audio_size.to_bytes(4, byteorder='big'))
+            start = time.perf_counter()
+            if transport:
+                client_socket.sendall(pack_header(codec, sample_rate, audio_size))
+            else:
+                client_socket.sendall(audio_size.to_bytes(4, byteorder='big'))
             client_socket.sendall(audio_data)
-            logging.info(f"Audio data of size {audio_size} bytes sent to client.")
+            timings["send_ms"] = round(1000 * (time.perf_counter() - start), 1)
+            logging.info(f"Audio data of size {audio_size} bytes ({codec}, {sample_rate} Hz) sent to client.")
         else:
             logging.error("Failed to synthesize audio.")
-    except Exception as e:
-        logging.error(f"Error handling client connection: {e}", exc_info=True)
+        outcome = "completed" if audio_data else "failed"
+    except RequestCancelled as e:
+        logging.info(f"Request cancelled: {e}")
+        outcome = "cancelled"
     finally:
-        client_socket.close()
-        logging.debug("Client socket closed.")
+        timings["total_ms"] = round(elapsed_ms(), 1)
+        logger.info(
+            "Request %s.", outcome,
+            extra={"category": "request", "session_id": session_id, "priority": PRIORITY_NAMES[priority], "timings": timings}
+        )
+
+# Returned by process_command when the chat model has to write the reply
+PendingChat = namedtuple("PendingChat", "retrieved_info")
 
-def process_command(command):
+def process_command(command, session_id=DEFAULT_SESSION):
+    """
+    Answer `command` without the model where possible: greetings, control commands and fast-path
+    answers. Otherwise returns a PendingChat for generate_chat_response, which the caller schedules
+    at chat priority.
+    """
     try:
-        # Retrieve persistent memory
         user_name = get_persistent("user_name")
-        assistant_name = get_persistent("assistant_name")
-        relationship = get_persistent("relationship")
 
         # Handle 'system_greet' command separately
         if command.lower() == "system_greet":
-            response = f"Hello there, {user_name}! How may I help you?"
-            add_short_term("conversation", command, response)
+            response = fast_path.greet(user_name)
+            add_short_term("conversation", command, response, session_id)
             logging.info(f"Generated response for 'system_greet': {response}")
             return response
 
-        # Retrieve short-term memory
-        short_term = get_short_term()
+        if command.lower() in STOP_COMMANDS:
+            cancelled = cancel_session_requests(session_id, "stopped by user")
+            logging.info(f"Cancelled {cancelled} in-flight request(s) for session '{session_id}'.")
+            return "Okay, stopping."
 
         # Perform information retrieval if needed
         retrieved_info = info_retriever.retrieve_information(command)
-        logging.debug(f"Retrieved information: {retrieved_info}")
+        logging.debug("Retrieved information: %s", retrieved_info, extra={"category": "payload"})
+        check_cancelled()
+
+        # Deterministic intents already have their final answer; skip the model entirely.
+        # Failed retrievals (errors, requests for more input) go to the model instead of being read out.
+        fast_answer = fast_path.answer(
+            info_retriever.classify_intent(command),
+            retrieved_info,
+            failed=isinstance(retrieved_info, RetrievalFailure)
+        )
+        if fast_answer is not None:
+            fast_answer = limit_tts_length(fast_answer)
+            add_short_term("conversation", command, fast_answer, session_id)
+            logging.info(f"Fast-path response: {fast_answer}")
+            return fast_answer
+        return PendingChat(retrieved_info)
+    except Exception as e:
+        logging.error(f"Error processing command '{command}': {e}", exc_info=True)
+        return "I'm sorry, I encountered an error while processing your request."
+
+def generate_chat_response(command, session_id, retrieved_info):
+    try:
+        # Retrieve persistent memory
+        user_name = get_persistent("user_name")
+        assistant_name = get_persistent("assistant_name")
+        relationship = get_persistent("relationship")
+
+        # Retrieve short-term memory: rolling summary of older turns plus every turn it does not cover yet
+        conversation_summary, recent_turns = get_conversation_context(session_id)
+
+        # Pull in only the most relevant older turns and facts
+        memories = recall(command, session_id, exclude_texts={format_turn(cmd, resp) for cmd, resp in recent_turns})
 
         # Ensure retrieved_info is a string
         if retrieved_info is None:
@@ -222,9 +583,8 @@ def process_command(command):
 
         # Determine if retrieved_info is an error or valid information
         info_section = ""
-        error_phrases = ["an error occurred", "please specify", "no search results found"]
 
-        if not any(substring in retrieved_info.lower() for substring in error_phrases):
+        if not isinstance(retrieved_info, RetrievalFailure):
             info_section = f"Here is some information I found:\n{retrieved_info}\n\n"
         else:
             # If retrieval failed, provide a fallback message
@@ -240,18 +600,26 @@ def process_command(command):
             f"Current date and time: {current_datetime}\n"
             "You remember past interactions to provide contextually relevant responses.\n\n"
             f"{info_section}"
-            "Conversation History:\n"
         )
 
-        for entry in short_term:
-            category, cmd, resp, timestamp = entry
-            if category == "conversation":
-                prompt += f"User: {cmd}\n{assistant_name}: {resp}\n"
+        if memories:
+            prompt += "Relevant memories:\n"
+            prompt += "".join(f"- {text}\n" for kind, text, score in memories)
+            prompt += "\n"
+
+        prompt += "Conversation History:\n"
+
+        if conversation_summary:
+            prompt += f"Summary of earlier conversation: {conversation_summary}\n"
+
+        for cmd, resp in recent_turns:
+            prompt += f"User: {cmd}\n{assistant_name}: {resp}\n"
 
         # Add user command without additional instructions
         prompt += f"User: {command}\n{assistant_name}: "
 
-        logging.debug(f"Final prompt sent to AI model:\n{prompt}")
+        logging.debug("Final prompt sent to AI model (%d chars):\n%s", len(prompt), prompt, extra={"category": "prompt"})
+        check_cancelled()
 
         # Tokenize the input prompt with attention mask
         encoding = tokenizer(
@@ -262,16 +630,22 @@ def process_command(command):
             max_length=2048  # Adjust based on model's capacity
         )
 
-        input_ids = encoding["input_ids"].to(model.device)
-        attention_mask = encoding["attention_mask"].to(model.device)
+        input_ids = encoding["input_ids"].to(chat_model.device)
+        attention_mask = encoding["attention_mask"].to(chat_model.device)
 
         # Generate response using AI model
         logging.info("Generating response using the AI model.")
+        stop_phrases = chat_stop_phrases(assistant_name)
         with torch.no_grad():
-            output_ids = model.generate(
+            output_ids = generate(
+                chat_model,
+                draft_model=chat_draft_model,
+                label="chat",
                 input_ids=input_ids,
                 attention_mask=attention_mask,
-                max_length=512,  # Adjust as needed
+                max_new_tokens=CHAT_MAX_NEW_TOKENS,  # Counts only the reply, unlike max_length
+                stop_phrases=stop_phrases,
+                tokenizer=tokenizer,
                 temperature=0.7,
                 do_sample=True,
                 top_p=0.9,
@@ -279,24 +653,27 @@ def process_command(command):
                 pad_token_id=tokenizer.pad_token_id
             )
 
-        response = tokenizer.decode(output_ids[0], skip_special_tokens=True).split(f"{assistant_name}:")[-1].strip()
+        # The prompt ends with the assistant tag, so the reply is everything generated
+        generated_ids = output_ids[0][input_ids.shape[-1]:]
+        response = tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
         logging.info(f"AI model response: {response}")
 
-        # Sanitize response
-        sanitized_response = sanitize_response(response)
-        logging.debug(f"Sanitized AI model response: {sanitized_response}")
+        # Sanitize response: cut at the next speaker tag or an unwanted phrase, drop emojis
+        sanitized_response = sanitize(response, stop_phrases)
+        logging.debug("Sanitized AI model response: %s", sanitized_response, extra={"category": "payload"})
 
         # Add to short-term memory
-        add_short_term("conversation", command, sanitized_response)
+        add_short_term("conversation", command, sanitized_response, session_id)
         logging.debug("Added response to short-term memory.")
 
         # Limit response length to prevent TTS cutoff
-        if len(sanitized_response) > 500:  # Adjust the limit as per TTS capabilities
-            sanitized_response = sanitized_response[:497] + "..."
-            logging.warning("Response truncated to prevent TTS cutoff.")
+        sanitized_response = limit_tts_length(sanitized_response)
+
+        kept_tokens = len(tokenizer(sanitized_response, add_special_tokens=False)["input_ids"])
+        record_wasted_tokens("chat", len(generated_ids), kept_tokens)
 
         # Free up GPU memory
-        del input_ids, attention_mask, output_ids
+        del input_ids, attention_mask, output_ids, generated_ids
         torch.cuda.empty_cache()
 
         return sanitized_response
@@ -309,30 +686,7 @@ def sanitize_response(response):
     """
     Remove any unwanted instructions, tokens, or emojis from the AI model's response.
     """
-    # Remove any text after specific unwanted phrases
-    unwanted_phrases = [
-        "Please provide the actual text",
-        "Is there anything else I can assist you with?",
-        "Please let me know if you need further assistance.",
-        "Based on your owner's profile",  # Remove profile-based instructions
-        "Please provide a concise and accurate response based on the information provided."  # Added phrase
-    ]
-    for phrase in unwanted_phrases:
-        if phrase in response:
-            response = response.split(phrase)[0].strip()
-    
-    # Remove emojis using regex
-    emoji_pattern = re.compile("["
-                           u"\U0001F600-\U0001F64F"  # Emoticons
-                           u"\U0001F300-\U0001F5FF"  # Symbols & Pictographs
-                           u"\U0001F680-\U0001F6FF"  # Transport & Map Symbols
-                           u"\U0001F1E0-\U0001F1FF"  # Flags
-                           u"\U00002702-\U000027B0"
-                           u"\U000024C2-\U0001F251"
-                           "]+", flags=re.UNICODE)
-    response = emoji_pattern.sub(r'', response)
-    
-    return response
+    return sanitize(response, UNWANTED_PHRASES)
 
 def main():
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -354,6 +708,11 @@ def main():
     finally:
         server_socket.close()
         logging.debug("Server socket closed.")
+        flush_memory()
+        if warm_state is not None:
+            warm_state.snapshot()
+        if model_pool is not None:
+            model_pool.shutdown()
 
 if __name__ == "__main__":
     main()
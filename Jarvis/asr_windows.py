@@ -11,15 +11,34 @@ import wave
 import io
 import winsound
 import os
+import uuid
+from audio_transport import decodable_codecs, decode_to_wav, read_response
+from energy_gate import EnergyGate
+import structured_logging
+from structured_logging import request_context
 
 greet_sent = False 
 
+# Identifies this listener's conversation on the server; set JARVIS_SESSION_ID to keep it across restarts
+SESSION_ID = os.getenv("JARVIS_SESSION_ID") or uuid.uuid4().hex
+
+# Reply codecs offered to the server, which picks the cheapest; e.g. JARVIS_AUDIO_CODECS=pcm to force raw audio
+AUDIO_CODECS = os.getenv("JARVIS_AUDIO_CODECS", ",".join(decodable_codecs())).split(",")
+AUDIO_SAMPLE_RATE = int(os.getenv("JARVIS_AUDIO_SAMPLE_RATE", "16000"))
+
+# Skip wake-word inference on silence: frames are read in blocks and only those loud enough to hold
+# speech (plus a short look-back) reach Porcupine. A block adds its length to wake-word latency.
+ENERGY_GATE = os.getenv("JARVIS_ENERGY_GATE", "1") == "1"
+GATE_BLOCK_FRAMES = int(os.getenv("JARVIS_GATE_BLOCK_FRAMES", "8"))  # 8 x 32 ms frames
+GATE_MARGIN_DB = float(os.getenv("JARVIS_GATE_MARGIN_DB", "9"))
+GATE_STATS_INTERVAL = 600  # Blocks between pass-ratio log lines (~2.5 minutes)
+
 def setup_logging():
-    logging.basicConfig(
+    # Queued and sampled: the audio loop logs every 4000-byte read
+    structured_logging.setup_logging(
         filename='asr_windows.log',
         filemode='a',
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        level=logging.DEBUG 
+        level=logging.DEBUG
     )
 
 def detect_wake_word():
@@ -43,7 +62,7 @@ def detect_wake_word():
             channels=1,
             format=pyaudio.paInt16,
             input=True,
-            frames_per_buffer=porcupine.frame_length
+            frames_per_buffer=porcupine.frame_length * (GATE_BLOCK_FRAMES if ENERGY_GATE else 1)
         )
         logging.debug("Audio stream for wake word detection opened successfully.")
     except Exception as e:
@@ -57,6 +76,22 @@ def detect_wake_word():
     logging.info("Listening for wake word...")
 
     try:
+        if ENERGY_GATE:
+            gate = EnergyGate(porcupine.frame_length, porcupine.sample_rate, margin_db=GATE_MARGIN_DB)
+            blocks = 0
+            while True:
+                block = stream.read(porcupine.frame_length * GATE_BLOCK_FRAMES, exception_on_overflow=False)
+                for frame in gate.process(block):
+                    if porcupine.process(frame) >= 0:
+                        print("Wake word detected!")
+                        logging.info("Wake word detected!")
+                        return True
+                blocks += 1
+                if blocks % GATE_STATS_INTERVAL == 0:
+                    logging.debug(
+                        f"Energy gate passed {gate.pass_ratio:.1%} of {gate.frames_seen} frames "
+                        f"(noise floor {gate.floor_db:.1f} dBFS)."
+                    )
         while True:
             pcm = stream.read(porcupine.frame_length, exception_on_overflow=False)
             pcm = np.frombuffer(pcm, dtype=np.int16)
@@ -77,45 +112,48 @@ def detect_wake_word():
         logging.debug("Wake word detection stream closed and Porcupine deleted.")
 
 def send_text_to_server(text, server_ip='localhost', port=65432):
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.connect((server_ip, port))
-            sock.sendall(text.encode('utf-8'))
-            logging.info(f"Sent text to ASR server: {text}")
+    # The request ID goes to the server too, so both logs can be joined on it
+    with request_context() as request_id:
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.connect((server_ip, port))
+                sock.sendall(json.dumps({
+                    "session_id": SESSION_ID,
+                    "text": text,
+                    "codecs": AUDIO_CODECS,
+                    "sample_rate": AUDIO_SAMPLE_RATE,
+                    "request_id": request_id
+                }).encode('utf-8'))
+                logging.info(f"Sent text to ASR server: {text}")
             
-            audio_size_data = sock.recv(4)
-            if not audio_size_data:
-                logging.error("No audio size data received from ASR server.")
-                print("No audio size data received from ASR server.")
-                return
+                header, payload = read_response(sock)
+                if header is None:
+                    logging.error("No audio header received from ASR server.")
+                    print("No audio header received from ASR server.")
+                    return
             
-            audio_size = int.from_bytes(audio_size_data, byteorder='big')
-            logging.info(f"Expecting audio data of size: {audio_size} bytes")
+                audio_size = header["size"]
+                logging.info(f"Received {header['codec']} audio at {header['sample_rate']} Hz: {len(payload)} bytes")
             
-            audio_data = b''
-            while len(audio_data) < audio_size:
-                packet = sock.recv(4096)
-                if not packet:
-                    break
-                audio_data += packet
+                if len(payload) != audio_size:
+                    logging.warning(f"Expected audio size {audio_size} bytes, but received {len(payload)} bytes.")
+                    print(f"Expected audio size {audio_size} bytes, but received {len(payload)} bytes.")
             
-            if len(audio_data) != audio_size:
-                logging.warning(f"Expected audio size {audio_size} bytes, but received {len(audio_data)} bytes.")
-                print(f"Expected audio size {audio_size} bytes, but received {len(audio_data)} bytes.")
+                audio_data = decode_to_wav(header["codec"], payload, header["sample_rate"])
             
-            with open("response.wav", "wb") as f:
-                f.write(audio_data)
-                logging.info("Audio data saved to response.wav for testing.")
+                with open("response.wav", "wb") as f:
+                    f.write(audio_data)
+                    logging.info("Audio data saved to response.wav for testing.")
             
-            play_audio(audio_data)
-            logging.info("Audio data received and played successfully.")
+                play_audio(audio_data)
+                logging.info("Audio data received and played successfully.")
             
-    except ConnectionRefusedError:
-        logging.error("Unable to connect to ASR server. Ensure it is running.", exc_info=True)
-        print("Unable to connect to ASR server. Ensure it is running.")
-    except Exception as e:
-        logging.error(f"Error sending/receiving data to/from ASR server: {e}", exc_info=True)
-        print(f"Error sending/receiving data to/from ASR server: {e}")
+        except ConnectionRefusedError:
+            logging.error("Unable to connect to ASR server. Ensure it is running.", exc_info=True)
+            print("Unable to connect to ASR server. Ensure it is running.")
+        except Exception as e:
+            logging.error(f"Error sending/receiving data to/from ASR server: {e}", exc_info=True)
+            print(f"Error sending/receiving data to/from ASR server: {e}")
 
 def play_audio(audio_bytes):
     try:
@@ -185,7 +223,7 @@ def main():
             while True:
                 try:
                     data = stream.read(4000, exception_on_overflow=False)
-                    logging.debug("Read 4000 bytes from audio stream.")
+                    logging.debug("Read 4000 bytes from audio stream.", extra={"category": "audio_read"})
                 except Exception as e:
                     logging.error(f"Error reading from audio stream: {e}", exc_info=True)
                     break
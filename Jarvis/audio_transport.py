@@ -0,0 +1,106 @@
+# audio_transport.py
+#
+# Reply audio framing shared by asr_server and asr_windows. Clients that list "codecs" in their
+# request get a length-prefixed JSON header ({"codec", "sample_rate", "size"}) followed by the
+# payload; older clients keep getting a 4-byte size followed by WAV.
+
+import io
+import json
+import wave
+
+try:
+    import soundfile as sf  # Decodes Ogg/Opus and MP3 in-process (libsndfile >= 1.1)
+except ImportError:
+    sf = None
+
+# Cheapest first: the server picks the first codec in this list that the client can decode
+CODEC_PREFERENCE = ["opus", "mp3", "pcm"]
+SAMPLE_RATES = {
+    "opus": (16000, 24000, 48000),
+    "mp3": (16000, 24000, 48000),
+    "pcm": (8000, 16000, 24000, 48000),
+    "wav": (8000, 16000, 24000, 48000)
+}
+DEFAULT_SAMPLE_RATE = 16000
+
+
+def negotiate(codecs, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Pick the cheapest codec the client offered and the highest supported rate not above the one
+    it asked for. Returns (None, None) if nothing offered is supported.
+    """
+    for codec in CODEC_PREFERENCE:
+        if codec in codecs:
+            rates = SAMPLE_RATES[codec]
+            fitting = [rate for rate in rates if rate <= sample_rate]
+            return codec, max(fitting) if fitting else min(rates)
+    return None, None
+
+
+def decodable_codecs():
+    codecs = []
+    if sf is not None:
+        if "OPUS" in sf.available_subtypes("OGG"):
+            codecs.append("opus")
+        if "MP3" in sf.available_formats():
+            codecs.append("mp3")
+    codecs.append("pcm")
+    return codecs
+
+
+def pack_header(codec, sample_rate, size):
+    header = json.dumps({"codec": codec, "sample_rate": sample_rate, "size": size}).encode('utf-8')
+    return len(header).to_bytes(4, byteorder='big') + header
+
+
+def recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        packet = sock.recv(min(65536, size - len(data)))
+        if not packet:
+            break
+        data += packet
+    return bytes(data)
+
+
+def read_response(sock):
+    """
+    Read a negotiated reply; returns (header, payload), or (None, b"") if the server sent nothing.
+    """
+    header_size = recv_exact(sock, 4)
+    if len(header_size) < 4:
+        return None, b""
+    header = json.loads(recv_exact(sock, int.from_bytes(header_size, byteorder='big')).decode('utf-8'))
+    return header, recv_exact(sock, header["size"])
+
+
+def pcm_to_wav(pcm, sample_rate, channels=1):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)  # 16-bit
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+def decode_to_pcm(codec, payload, sample_rate):
+    """
+    Decode a payload to 16-bit PCM; returns (pcm_bytes, sample_rate, channels).
+    """
+    if codec == "pcm":
+        return payload, sample_rate, 1
+    if codec in ("opus", "mp3"):
+        if sf is None:
+            raise RuntimeError(f"Decoding {codec} requires the soundfile package.")
+        samples, decoded_rate = sf.read(io.BytesIO(payload), dtype="int16")
+        channels = 1 if samples.ndim == 1 else samples.shape[1]
+        return samples.tobytes(), decoded_rate, channels
+    raise ValueError(f"Unsupported codec '{codec}'.")
+
+
+def decode_to_wav(codec, payload, sample_rate):
+    if codec == "wav":
+        return payload
+    pcm, decoded_rate, channels = decode_to_pcm(codec, payload, sample_rate)
+    return pcm_to_wav(pcm, decoded_rate, channels)
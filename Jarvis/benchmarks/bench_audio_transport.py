@@ -0,0 +1,88 @@
+# bench_audio_transport.py
+#
+# Bytes on the wire and client decode cost per second of reply audio for each transport codec.
+# Payloads are encoded locally at bitrates close to the Azure formats the server requests
+# (MP3 32 kbps CBR, Opus ~24 kbps); pass a WAV recording of real speech for representative numbers.
+# Usage: python benchmarks/bench_audio_transport.py [speech.wav] [--repeat 20]
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_transport import CODEC_PREFERENCE, decode_to_wav, pcm_to_wav
+
+SAMPLE_RATE = 16000
+ENCODINGS = {
+    "opus": dict(format="OGG", subtype="OPUS", compression_level=0.935),
+    "mp3": dict(format="MP3", subtype="MPEG_LAYER_III", compression_level=0.85, bitrate_mode="CONSTANT")
+}
+
+
+def synthetic_speech(seconds=10.0, sample_rate=SAMPLE_RATE):
+    """
+    Speech-like test signal: a gliding harmonic voice gated at syllable rate plus a little noise.
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    signal = 0.25 * envelope * voiced + 0.01 * rng.standard_normal(len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+
+def load_speech(path):
+    samples, sample_rate = sf.read(path, dtype="int16")
+    if samples.ndim > 1:
+        samples = samples[:, 0]
+    if sample_rate != SAMPLE_RATE:
+        # Nearest-sample resampling is enough for a size/decode-cost comparison
+        positions = np.arange(0, len(samples), sample_rate / SAMPLE_RATE).astype(np.int64)
+        samples = samples[positions[positions < len(samples)]]
+    return samples
+
+
+def encode(codec, samples):
+    if codec == "pcm":
+        return samples.tobytes()
+    buf = io.BytesIO()
+    sf.write(buf, samples, SAMPLE_RATE, **ENCODINGS[codec])
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reply audio transport benchmark")
+    parser.add_argument("input", nargs="?", help="WAV file with speech (default: synthetic signal)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    samples = load_speech(args.input) if args.input else synthetic_speech()
+    seconds = len(samples) / SAMPLE_RATE
+    payloads = {"wav (legacy)": ("wav", pcm_to_wav(samples.tobytes(), SAMPLE_RATE))}
+    for codec in CODEC_PREFERENCE:
+        payloads[codec] = (codec, encode(codec, samples))
+
+    legacy_size = len(payloads["wav (legacy)"][1])
+    print(f"{seconds:.1f}s of {'recorded' if args.input else 'synthetic'} speech at {SAMPLE_RATE} Hz")
+    print(f"{'codec':<14}{'bytes':>10}{'bytes/s':>10}{'kbps':>8}{'vs wav':>9}{'decode ms/s':>14}")
+    for name, (codec, payload) in payloads.items():
+        decode_to_wav(codec, payload, SAMPLE_RATE)  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            decode_to_wav(codec, payload, SAMPLE_RATE)
+        decode_ms = 1000 * (time.perf_counter() - start) / args.repeat / seconds
+        print(
+            f"{name:<14}{len(payload):>10}{len(payload) / seconds:>10.0f}{8 * len(payload) / seconds / 1000:>8.1f}"
+            f"{legacy_size / len(payload):>8.1f}x{decode_ms:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
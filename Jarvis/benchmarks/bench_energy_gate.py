@@ -0,0 +1,143 @@
+# bench_energy_gate.py
+#
+# CPU time of idle wake-word listening with and without the energy gate, per hour of audio, plus how
+# much of each speech burst (and the look-back before it) still reaches the engine. Runs the real
+# Porcupine engine when pvporcupine is installed and an access key is given; otherwise a stand-in with
+# a comparable per-frame shape (log-mel front end and a small dense network) so the relative saving
+# can be read off; scale the absolute numbers by Porcupine's measured per-frame cost.
+# Usage: python benchmarks/bench_energy_gate.py [--seconds 120] [--access-key KEY] [--block-frames 8]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from energy_gate import EnergyGate
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512  # Porcupine's frame length at 16 kHz
+
+
+class StandInEngine:
+    """
+    Per-frame work shaped like a small keyword spotter: windowed FFT, 40 mel bands, two dense layers.
+    """
+
+    sample_rate = SAMPLE_RATE
+    frame_length = FRAME_LENGTH
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.window = np.hanning(FRAME_LENGTH).astype(np.float32)
+        self.mel = rng.random((FRAME_LENGTH // 2 + 1, 40), dtype=np.float32)
+        self.layers = [rng.standard_normal((40, 128), dtype=np.float32), rng.standard_normal((128, 128), dtype=np.float32)]
+
+    def process(self, pcm):
+        spectrum = np.abs(np.fft.rfft(self.window * np.asarray(pcm, dtype=np.float32)))
+        hidden = np.log(spectrum @ self.mel + 1e-6)
+        for weights in self.layers:
+            hidden = np.maximum(hidden @ weights, 0)
+        return -1
+
+
+def scenario(name, seconds, rng):
+    """
+    Room noise at about -60 dBFS, with keyboard clicks and a door ("noisy") or speech bursts ("speech").
+    Returns the signal and the (start, end) sample ranges of the bursts that must reach the engine.
+    """
+    signal = rng.standard_normal(int(seconds * SAMPLE_RATE)) * 30
+    bursts = []
+    if name == "noisy":
+        for start in rng.integers(0, len(signal) - SAMPLE_RATE, size=int(seconds / 5)):
+            click = np.exp(-np.arange(400) / 60) * rng.standard_normal(400) * 4000
+            signal[start:start + 400] += click
+    elif name == "speech":
+        t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+        pitch = 2 * np.pi * np.cumsum(130 + 30 * np.sin(2 * np.pi * 0.7 * t)) / SAMPLE_RATE
+        voiced = sum(np.sin(k * pitch) / k for k in range(1, 10))
+        word = 3000 * voiced * np.clip(np.sin(2 * np.pi * 3 * t), 0, None) ** 2
+        for start in range(3 * SAMPLE_RATE, len(signal) - SAMPLE_RATE, 15 * SAMPLE_RATE):
+            signal[start:start + SAMPLE_RATE] += word
+            bursts.append((start, start + SAMPLE_RATE))
+    return np.clip(signal, -32768, 32767).astype(np.int16), bursts
+
+
+def ungated(engine, pcm, block_frames):
+    frames = 0
+    for offset in range(0, len(pcm) - FRAME_LENGTH + 1, FRAME_LENGTH):
+        frame = np.frombuffer(pcm[offset:offset + FRAME_LENGTH].tobytes(), dtype=np.int16)
+        engine.process(frame)
+        frames += 1
+    return frames, None
+
+
+def gated(engine, pcm, block_frames):
+    gate = EnergyGate(FRAME_LENGTH, SAMPLE_RATE)
+    block = FRAME_LENGTH * block_frames
+    passed = []
+    for offset in range(0, len(pcm) - block + 1, block):
+        for frame in gate.process(pcm[offset:offset + block].tobytes()):
+            engine.process(frame)
+            passed.append(frame)
+    return gate.frames_passed, passed
+
+
+def coverage(pcm, bursts, passed, lookback_frames):
+    """
+    Fraction of burst frames, and of the look-back frames before each burst, that reached the engine.
+    """
+    seen = {frame.tobytes() for frame in passed}
+    frames = pcm[:len(pcm) - len(pcm) % FRAME_LENGTH].reshape(-1, FRAME_LENGTH)
+    burst_hits = burst_total = lookback_hits = lookback_total = 0
+    for start, end in bursts:
+        first, last = start // FRAME_LENGTH, (end - 1) // FRAME_LENGTH
+        burst_hits += sum(frames[i].tobytes() in seen for i in range(first, last + 1))
+        burst_total += last - first + 1
+        lookback_hits += sum(frames[i].tobytes() in seen for i in range(first - lookback_frames, first))
+        lookback_total += lookback_frames
+    return burst_hits / burst_total, lookback_hits / lookback_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wake-word energy gate CPU benchmark")
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--block-frames", type=int, default=8)
+    parser.add_argument("--access-key", help="Picovoice access key; uses the real Porcupine engine")
+    args = parser.parse_args()
+
+    if args.access_key:
+        import pvporcupine
+        engine = pvporcupine.create(access_key=args.access_key, keywords=["jarvis"])
+    else:
+        engine = StandInEngine()
+    print(f"Engine: {'Porcupine' if args.access_key else 'stand-in'}; {args.seconds:.0f}s per scenario, "
+          f"blocks of {args.block_frames} frames ({1000 * args.block_frames * FRAME_LENGTH / SAMPLE_RATE:.0f} ms)")
+    print(f"{'scenario':<10}{'mode':<10}{'frames in':>10}{'CPU s/hour':>12}{'saving':>9}{'speech':>9}{'look-back':>11}")
+
+    rng = np.random.default_rng(0)
+    lookback_frames = EnergyGate(FRAME_LENGTH, SAMPLE_RATE).lookback
+    for name in ("silent", "noisy", "speech"):
+        pcm, bursts = scenario(name, args.seconds, rng)
+        results = {}
+        for mode, run in (("ungated", ungated), ("gated", gated)):
+            start = time.process_time()
+            frames, passed = run(engine, pcm, args.block_frames)
+            cpu_per_hour = (time.process_time() - start) * 3600 / args.seconds
+            results[mode] = cpu_per_hour
+            line = f"{name:<10}{mode:<10}{frames:>10}{cpu_per_hour:>12.2f}"
+            if mode == "gated":
+                line += f"{results['ungated'] / cpu_per_hour:>8.1f}x"
+                if bursts:
+                    speech, lookback = coverage(pcm, bursts, passed, lookback_frames)
+                    line += f"{speech:>9.0%}{lookback:>11.0%}"
+            print(line)
+
+    if args.access_key:
+        engine.delete()
+
+
+if __name__ == "__main__":
+    main()
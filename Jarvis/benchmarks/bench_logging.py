@@ -0,0 +1,93 @@
+# bench_logging.py
+#
+# Logging cost paid by the request thread for one simulated request: the old synchronous FileHandler
+# with eagerly formatted f-strings against the queued, sampled setup. Each request logs what the server
+# and client do today: a burst of audio-read debugs, the full prompt, payload dumps and a few info lines.
+# The queued setup is timed twice: with the listener paused (what the caller itself pays) and running
+# (the listener thread also competes for the GIL, which on the server it mostly gets during generation).
+# Usage: python benchmarks/bench_logging.py [--requests 500] [--audio-reads 150]
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import structured_logging
+from structured_logging import request_context, stop_listener
+
+PROMPT = "You are Jarvis, a helpful assistant.\n" + "User: what is the weather like?\nJarvis: It is sunny.\n" * 40
+PAYLOAD = {"weather": [{"description": "clear sky"}], "main": {"temp": 18.4, "humidity": 60}, "wind": {"speed": 3.1}}
+
+
+def legacy_request(audio_reads):
+    for _ in range(audio_reads):
+        logging.debug("Read 4000 bytes from audio stream.")
+    logging.info(f"Received ASR text for session 'default': what is the weather like")
+    logging.debug(f"Weather API response: {PAYLOAD}")
+    logging.debug(f"Retrieved information: {PAYLOAD}")
+    logging.debug(f"Final prompt sent to AI model:\n{PROMPT}")
+    logging.debug(f"Sanitized AI model response: It is sunny.")
+    logging.info(f"Audio data of size 48000 bytes (opus, 16000 Hz) sent to client.")
+
+
+def structured_request(audio_reads):
+    with request_context():
+        for _ in range(audio_reads):
+            logging.debug("Read 4000 bytes from audio stream.", extra={"category": "audio_read"})
+        logging.info("Received ASR text for session 'default': what is the weather like")
+        logging.debug("Weather API response: %s", PAYLOAD, extra={"category": "payload"})
+        logging.debug("Retrieved information: %s", PAYLOAD, extra={"category": "payload"})
+        logging.debug("Final prompt sent to AI model (%d chars):\n%s", len(PROMPT), PROMPT, extra={"category": "prompt"})
+        logging.debug("Sanitized AI model response: %s", "It is sunny.", extra={"category": "payload"})
+        logging.info("Request completed.", extra={"category": "request", "timings": {"total_ms": 812.4}})
+
+
+def run(label, request, requests, audio_reads):
+    request(audio_reads)  # Warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        request(audio_reads)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34}{1e6 * elapsed / requests:>10.1f} us/request")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request-path logging overhead benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--audio-reads", type=int, default=150, help="Audio-read debugs per request (~38 s of listening)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.log")
+        logging.basicConfig(
+            filename=legacy_path,
+            filemode='a',
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            level=logging.DEBUG,
+            force=True
+        )
+        legacy = run("legacy (sync, f-string)", legacy_request, args.requests, args.audio_reads)
+
+        queued_path = os.path.join(tmp, "structured.log")
+        listener = structured_logging.setup_logging(filename=queued_path, level=logging.DEBUG)
+        listener.stop()
+        caller = run("queued + sampled, listener paused", structured_request, args.requests, args.audio_reads)
+        listener.start()
+        listener.stop()  # Drain the backlog before timing with the listener running
+        listener.start()
+        queued = run("queued + sampled, listener running", structured_request, args.requests, args.audio_reads)
+        stop_listener(listener)
+        logging.getLogger().handlers.clear()
+
+        print(f"Request-thread logging time: {legacy / caller:.1f}x less paid by the caller, "
+              f"{legacy / queued:.1f}x less including the listener")
+        print(f"Log volume: {os.path.getsize(legacy_path) / 1024 / (args.requests + 1):.1f} KiB/request legacy, "
+              f"{os.path.getsize(queued_path) / 1024 / (2 * args.requests + 2):.1f} KiB/request sampled")
+
+
+if __name__ == "__main__":
+    main()
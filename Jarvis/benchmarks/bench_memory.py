@@ -0,0 +1,104 @@
+# bench_memory.py
+#
+# Compares short-term memory queries and cleanup on the legacy schema (no indexes) against the
+# migrated schema. Usage: python benchmarks/bench_memory.py [rows]
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import memory
+
+SESSIONS = 1000
+CATEGORIES = ["conversation", "conversation", "conversation", "retrieval"]
+
+
+def populate(path, rows):
+    conn = sqlite3.connect(path)
+    memory._create_tables(conn.cursor())
+    # Two hours of history, so roughly half the rows are expired; UTC, like every stored time
+    history = timedelta(hours=2)
+    step = history / rows
+    conn.executemany(
+        'INSERT INTO short_term_memory (category, command, response, timestamp, session_id) VALUES (?, ?, ?, ?, ?)',
+        (
+            (random.choice(CATEGORIES), f"command {i}", f"response {i}",
+             memory.utc_timestamp(history - step * i), f"session-{random.randrange(SESSIONS)}")
+            for i in range(rows)
+        )
+    )
+    conn.execute('PRAGMA user_version = 1')  # Sessions present, indexes not yet created
+    conn.commit()
+    conn.close()
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<38} {elapsed * 1000:10.2f} ms")
+    return result
+
+
+def longest_lock_hold(fn):
+    # Wrap memory_lock to measure how long cleanup holds it at a time
+    original = memory.memory_lock
+    holds = []
+
+    class TimedLock:
+        def __enter__(self):
+            original.acquire()
+            self.start = time.perf_counter()
+
+        def __exit__(self, *exc):
+            holds.append(time.perf_counter() - self.start)
+            original.release()
+
+    memory.memory_lock = TimedLock()
+    try:
+        fn()
+    finally:
+        memory.memory_lock = original
+    return max(holds) if holds else 0.0
+
+
+def run(path, label):
+    memory.DB_PATH = path
+    memory.session_buffers.clear()
+    print(label)
+    session = f"session-{random.randrange(SESSIONS)}"
+    timed("recent turns (cold session)", lambda: memory._load_session_buffer(session), repeat=20)
+    timed("get_short_term(category=conversation)", lambda: memory.get_short_term(session, "conversation"), repeat=20)
+    hold = longest_lock_hold(lambda: timed("cleanup_short_term", memory.cleanup_short_term))
+    print(f"  {'longest memory_lock hold in cleanup':<38} {hold * 1000:10.2f} ms")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = os.path.join(directory, "legacy.db")
+        migrated = os.path.join(directory, "migrated.db")
+        print(f"Populating {rows} rows...")
+        populate(legacy, rows)
+        populate(migrated, rows)
+
+        # Legacy behaviour: unindexed table, cleanup as a single DELETE
+        memory.CLEANUP_BATCH_SIZE = rows
+        run(legacy, "Legacy schema, single-statement cleanup:")
+
+        memory.CLEANUP_BATCH_SIZE = 1000
+        memory.DB_PATH = migrated
+        start = time.perf_counter()
+        memory.initialize_db()
+        print(f"Migration took {time.perf_counter() - start:.2f} s")
+        run(migrated, "Migrated schema, batched cleanup:")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench_sanitizer.py
+#
+# Throughput of reply sanitizing over recorded model outputs: the old per-phrase scan against the
+# compiled sanitizer, one-shot and streamed token by token. Outputs are read from a JSONL file of
+# strings or {"response": ...} objects; without one, a seeded corpus of Vicuna-style rambles is used.
+# Usage: python benchmarks/bench_sanitizer.py [outputs.jsonl] [--repeat 5]
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sanitizer import StreamingSanitizer, sanitize
+
+ASSISTANT_NAME = "Jarvis"
+UNWANTED_PHRASES = [
+    "Please provide the actual text",
+    "Is there anything else I can assist you with?",
+    "Please let me know if you need further assistance.",
+    "Based on your owner's profile",
+    "Please provide a concise and accurate response based on the information provided."
+]
+STOP_PHRASES = ["User:", f"{ASSISTANT_NAME}:"] + UNWANTED_PHRASES
+CHARS_PER_TOKEN = 4  # Stream in token-sized chunks
+
+SENTENCES = [
+    "The capital of France is Paris, which is also its largest city.",
+    "It is currently 18 degrees and partly cloudy in New York.",
+    "Python is a high-level programming language known for its readability.",
+    "I have added that to your list of reminders for tomorrow morning.",
+    "The Eiffel Tower was completed in 1889 for the World's Fair.",
+    "Sure, here is a short summary of the latest technology news.",
+    "Water boils at 100 degrees Celsius at sea level. \U0001F30D",
+    "That sounds like a great plan! \U0001F600"
+]
+
+
+def legacy_sanitize(response):
+    """
+    sanitize_response as it was: one scan per phrase and the emoji regex looked up on every call.
+    """
+    for phrase in STOP_PHRASES:
+        if phrase in response:
+            response = response.split(phrase)[0].strip()
+    emoji_pattern = re.compile("["
+                               u"\U0001F600-\U0001F64F"
+                               u"\U0001F300-\U0001F5FF"
+                               u"\U0001F680-\U0001F6FF"
+                               u"\U0001F1E0-\U0001F1FF"
+                               u"\U00002702-\U000027B0"
+                               u"\U000024C2-\U0001F251"
+                               "]+", flags=re.UNICODE)
+    return emoji_pattern.sub(r'', response)
+
+
+def synthetic_outputs(count=2000, seed=0):
+    rng = random.Random(seed)
+    outputs = []
+    for _ in range(count):
+        reply = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4)))
+        tail = rng.random()
+        if tail < 0.4:
+            # The model invents the next turns of the conversation
+            reply += f"\nUser: {rng.choice(SENTENCES)}\n{ASSISTANT_NAME}: {rng.choice(SENTENCES)}"
+        elif tail < 0.7:
+            reply += " " + rng.choice(UNWANTED_PHRASES) + " " + rng.choice(SENTENCES)
+        outputs.append(reply)
+    return outputs
+
+
+def load_outputs(path):
+    outputs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                outputs.append(record["response"] if isinstance(record, dict) else record)
+    return outputs
+
+
+def stream(text):
+    sanitizer = StreamingSanitizer(STOP_PHRASES)
+    for start in range(0, len(text), CHARS_PER_TOKEN):
+        sanitizer.feed(text[start:start + CHARS_PER_TOKEN])
+        if sanitizer.stopped:
+            return sanitizer.text, start + CHARS_PER_TOKEN
+    sanitizer.finish()
+    return sanitizer.text, len(text)
+
+
+def timed(label, fn, outputs, repeat, total_chars):
+    fn(outputs[0])  # Warm up (compiles the automaton)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in outputs:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(outputs)
+    print(f"{label:<28}{1e6 * elapsed / calls:>10.2f} us/reply{repeat * total_chars / elapsed / 1e6:>10.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reply sanitizer throughput benchmark")
+    parser.add_argument("outputs", nargs="?", help="JSONL file of recorded model outputs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    outputs = load_outputs(args.outputs) if args.outputs else synthetic_outputs()
+    total_chars = sum(len(text) for text in outputs)
+    print(f"{len(outputs)} {'recorded' if args.outputs else 'synthetic'} outputs, "
+          f"{total_chars / len(outputs):.0f} chars on average")
+
+    mismatches = sum(legacy_sanitize(text) != sanitize(text, STOP_PHRASES) for text in outputs)
+    mismatches += sum(legacy_sanitize(text) != stream(text)[0] for text in outputs)
+    print(f"Outputs differing from the legacy sanitizer: {mismatches}")
+
+    timed("legacy (per-phrase scan)", legacy_sanitize, outputs, args.repeat, total_chars)
+    timed("compiled, one-shot", lambda text: sanitize(text, STOP_PHRASES), outputs, args.repeat, total_chars)
+    timed("streaming, per token", stream, outputs, args.repeat, total_chars)
+
+    # Characters the streaming sanitizer stops before, i.e. text the model no longer has to generate
+    consumed = sum(stream(text)[1] for text in outputs)
+    saved = total_chars - consumed
+    print(f"Stopping at the first cut-off phrase skips {saved} of {total_chars} chars "
+          f"({saved / total_chars:.1%}, ~{saved / CHARS_PER_TOKEN / len(outputs):.1f} tokens per reply)")
+
+
+if __name__ == "__main__":
+    main()
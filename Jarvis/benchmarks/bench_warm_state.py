@@ -0,0 +1,82 @@
+# bench_warm_state.py
+#
+# Cost of warm-state snapshots at realistic cache sizes: snapshot write time and size, startup restore
+# time (mapping the snapshot and parsing its index) against eagerly decoding every value, and lookup
+# latency for a live entry, a restored entry on first use and a miss.
+# Usage: python benchmarks/bench_warm_state.py [--summaries 1024] [--audio 512] [--audio-kb 24]
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warm_state import WarmCache, WarmState
+
+WORDS = "the capital city weather news summary model answer paris london river history music science".split()
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build(directory, summaries, audio, audio_kb, rng):
+    state = WarmState(directory)
+    summary_cache = state.register(WarmCache("summaries", max_entries=summaries))
+    audio_cache = state.register(WarmCache("audio", max_entries=audio, codec="bytes"))
+    for _ in range(summaries):
+        # Keyed like InfoRetriever's summaries: the source text's digest, the length and the query
+        source_digest = hashlib.sha1(text(rng, 400).encode("utf-8")).hexdigest()
+        summary_cache.put((source_digest, 150, text(rng, 5)), text(rng, 100))
+    for _ in range(audio):
+        audio_cache.put((text(rng, 20), "opus", 16000), rng.randbytes(audio_kb * 1024))
+    return state
+
+
+def lookup_us(cache, keys):
+    start = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    return 1e6 * (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-state snapshot benchmark")
+    parser.add_argument("--summaries", type=int, default=1024)
+    parser.add_argument("--audio", type=int, default=512)
+    parser.add_argument("--audio-kb", type=int, default=24, help="Size of one cached reply (~9 s of 24 kbps Opus)")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        state = build(directory, args.summaries, args.audio, args.audio_kb, rng)
+        start = time.perf_counter()
+        state.snapshot()
+        print(f"Snapshot written in {1000 * (time.perf_counter() - start):.1f} ms:")
+        for name in state.caches:
+            print(f"  {name:<10}{os.path.getsize(state.path(name)) / 1024:>10.0f} KiB")
+
+        for name, live in state.caches.items():
+            keys = list(live.entries)
+            restored = WarmCache(name, max_entries=live.max_entries, codec=live.codec)
+            start = time.perf_counter()
+            restored.restore(state.path(name))
+            lazy_ms = 1000 * (time.perf_counter() - start)
+
+            eager = WarmCache(name, max_entries=live.max_entries, codec=live.codec)
+            start = time.perf_counter()
+            eager.restore(state.path(name))
+            for key in keys:
+                eager.get(key)
+            eager_ms = 1000 * (time.perf_counter() - start)
+
+            print(f"{name}: restore {lazy_ms:.1f} ms lazily vs {eager_ms:.1f} ms decoding everything; lookups "
+                  f"{lookup_us(live, keys):.2f} us live, {lookup_us(restored, keys):.2f} us restored on first use, "
+                  f"{lookup_us(restored, [('missing', i) for i in range(len(keys))]):.2f} us miss")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# cancellation.py
+
+import contextvars
+import threading
+
+
+# BaseException, like asyncio.CancelledError, so the pipeline's broad `except Exception` handlers let it through
+class RequestCancelled(BaseException):
+    pass
+
+
+class CancellationToken:
+    """
+    Set when the client disconnects or asks to cancel; checked between pipeline stages
+    and by generation stopping criteria.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reason = None
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """
+        Run `callback` when the token is cancelled (immediately if it already is).
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise RequestCancelled(self.reason)
+
+
+# Token of the request being processed; copied into helper threads with contextvars.copy_context()
+current_token = contextvars.ContextVar("current_token", default=None)
+
+
+def check_cancelled():
+    token = current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
@@ -0,0 +1,115 @@
+# load_test.py
+#
+# Load-tests the TTS server against the local fake engine (no Azure calls): concurrent /synthesize
+# requests, then one /synthesize_batch versus the same sentences sent one at a time.
+# Usage: python load_test.py [--pool-size 4] [--clients 16] [--requests 200] [--batch-size 12]
+
+import argparse
+import base64
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(pool_size):
+    os.environ["TTS_ENGINE"] = "fake"
+    os.environ["TTS_POOL_SIZE"] = str(pool_size)
+    os.environ["TTS_HEALTH_CHECK_INTERVAL"] = "1"  # Probe often so checks overlap with the load
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import uvicorn
+    import tts_server
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(tts_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("TTS server did not start.")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run_single_load(url, clients, total):
+    session_local = threading.local()
+
+    def one(i):
+        session = getattr(session_local, "session", None) or requests.Session()
+        session_local.session = session
+        text = f"Load test sentence number {i}."
+        start = time.perf_counter()
+        response = session.post(f"{url}/synthesize", json={"text": text}, timeout=30)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code == 200 and response.content == b"FAKE:" + text.encode()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, _ in results]
+    failures = sum(not ok for _, ok in results)
+    print(f"/synthesize: {total} requests from {clients} clients in {wall:.2f}s "
+          f"({total / wall:.1f} req/s), p50 {1000 * statistics.median(latencies):.0f} ms, "
+          f"p95 {1000 * percentile(latencies, 0.95):.0f} ms, {failures} failed")
+    return failures
+
+
+def run_batch(url, batch_size):
+    sentences = [f"This is sentence {i} of a long answer." for i in range(batch_size)]
+
+    start = time.perf_counter()
+    with requests.Session() as session:
+        for sentence in sentences:
+            session.post(f"{url}/synthesize", json={"text": sentence}, timeout=30).raise_for_status()
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = requests.post(f"{url}/synthesize_batch", json={"text": " ".join(sentences)}, timeout=60)
+    batched = time.perf_counter() - start
+    response.raise_for_status()
+
+    results = response.json()["results"]
+    in_order = [base64.b64decode(result["audio"]) for result in results] == [b"FAKE:" + s.encode() for s in sentences]
+    print(f"{batch_size} sentences: sequential {1000 * sequential:.0f} ms, batch {1000 * batched:.0f} ms "
+          f"({sequential / batched:.1f}x), results in order: {in_order}")
+    return 0 if in_order else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS server load test with the fake engine")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=12)
+    args = parser.parse_args()
+
+    url = start_server(args.pool_size)
+    print(f"Fake-engine TTS server with a pool of {args.pool_size} at {url}")
+    failures = run_single_load(url, args.clients, args.requests)
+    failures += run_batch(url, args.batch_size)
+    print(f"Pool health: {requests.get(f'{url}/health', timeout=5).json()}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# synthesizer_pool.py
+
+import logging
+import queue
+import threading
+import time
+
+try:
+    import azure.cognitiveservices.speech as speechsdk
+except ImportError:  # Only the fake engine is available without the Speech SDK
+    speechsdk = None
+
+logger = logging.getLogger("Synthesizer_Pool")
+
+
+class SynthesisError(Exception):
+    pass
+
+
+class AzureSynthesizer:
+    def __init__(self, key, region):
+        if speechsdk is None:
+            raise RuntimeError("azure-cognitiveservices-speech is not installed.")
+        speech_config = speechsdk.SpeechConfig(subscription=key, region=region)
+        speech_config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3)
+        self.synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+
+    def synthesize(self, text):
+        result = self.synthesizer.speak_text_async(text).get()
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return result.audio_data
+        if result.reason == speechsdk.ResultReason.Canceled:
+            cancellation_details = result.cancellation_details
+            detail = f"Speech synthesis canceled: {cancellation_details.reason}"
+            if cancellation_details.reason == speechsdk.CancellationReason.Error:
+                detail += f" ({cancellation_details.error_details})"
+            raise SynthesisError(detail)
+        raise SynthesisError(f"Unexpected synthesis result: {result.reason}")
+
+
+class FakeSynthesizer:
+    """
+    Local stand-in for load tests: waits like a network round trip and returns b"FAKE:" + text.
+    Fails if two threads use the same instance at once, which the pool must never allow.
+    """
+
+    def __init__(self, latency=0.05, per_char=0.0005):
+        self.latency = latency
+        self.per_char = per_char
+        self.busy = threading.Lock()
+
+    def synthesize(self, text):
+        if not self.busy.acquire(blocking=False):
+            raise SynthesisError("FakeSynthesizer used by two threads at once.")
+        try:
+            time.sleep(self.latency + self.per_char * len(text))
+            return b"FAKE:" + text.encode("utf-8")
+        finally:
+            self.busy.release()
+
+
+class _Slot:
+    def __init__(self, index, synthesizer):
+        self.index = index
+        self.synthesizer = synthesizer
+        self.healthy = synthesizer is not None
+        self.failures = 0
+        self.replacements = 0
+        self.last_checked = time.monotonic()
+
+
+class SynthesizerPool:
+    """
+    A fixed set of synthesizer instances; each request checks one out, so no instance is ever
+    shared between threads. Instances that keep failing, or fail the periodic probe, are recreated.
+    """
+
+    def __init__(self, factory, size, health_check_interval=300.0, probe_text="OK", max_failures=2):
+        self.factory = factory
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.probe_text = probe_text
+        self.max_failures = max_failures
+        self.slots = [_Slot(index, self._create(index)) for index in range(size)]
+        self.idle = queue.Queue()
+        for slot in self.slots:
+            self.idle.put(slot)
+
+        if health_check_interval > 0:
+            threading.Thread(target=self._health_check_daemon, daemon=True).start()
+        logger.info(f"Synthesizer pool started with {size} instance(s).")
+
+    def _create(self, index):
+        try:
+            return self.factory()
+        except Exception as e:
+            logger.error(f"Failed to create synthesizer {index}: {e}", exc_info=True)
+            return None
+
+    def _replace(self, slot):
+        slot.synthesizer = self._create(slot.index)
+        slot.healthy = slot.synthesizer is not None
+        slot.failures = 0
+        slot.replacements += 1
+        logger.warning(f"Synthesizer {slot.index} recreated ({'healthy' if slot.healthy else 'still unavailable'}).")
+
+    def synthesize(self, text, timeout=None):
+        try:
+            slot = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SynthesisError("No synthesizer became available in time.")
+        try:
+            if not slot.healthy:
+                self._replace(slot)
+                if not slot.healthy:
+                    raise SynthesisError(f"Synthesizer {slot.index} is unavailable.")
+            try:
+                audio = slot.synthesizer.synthesize(text)
+            except Exception:
+                slot.failures += 1
+                if slot.failures >= self.max_failures:
+                    slot.healthy = False
+                raise
+            slot.failures = 0
+            return audio
+        finally:
+            self.idle.put(slot)
+
+    def _health_check_daemon(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            # Probe only instances that are idle right now; busy ones are proving themselves already
+            for _ in range(self.size):
+                try:
+                    slot = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._probe(slot)
+                finally:
+                    self.idle.put(slot)
+
+    def _probe(self, slot):
+        slot.last_checked = time.monotonic()
+        if slot.healthy:
+            try:
+                slot.synthesizer.synthesize(self.probe_text)
+                return
+            except Exception as e:
+                logger.warning(f"Synthesizer {slot.index} failed its health check: {e}")
+        self._replace(slot)
+
+    def health(self):
+        healthy = sum(slot.healthy for slot in self.slots)
+        return {
+            "size": self.size,
+            "healthy": healthy,
+            "idle": self.idle.qsize(),
+            "instances": [
+                {"index": slot.index, "healthy": slot.healthy, "failures": slot.failures, "replacements": slot.replacements}
+                for slot in self.slots
+            ]
+        }
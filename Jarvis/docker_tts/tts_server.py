@@ -3,11 +3,14 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 import uvicorn
-import azure.cognitiveservices.speech as speechsdk
 import io
+import os
+import re
+import base64
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from synthesizer_pool import SynthesizerPool, AzureSynthesizer, FakeSynthesizer, SynthesisError
 
 app = FastAPI()
 
@@ -16,31 +19,34 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %
 logger = logging.getLogger("Azure_TTS_Server")
 
 
-executor = ThreadPoolExecutor(max_workers=4)
+AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY", "YOUR_AZURE_SPEECH_KEY")
+AZURE_SERVICE_REGION = os.getenv("AZURE_SERVICE_REGION", "YOUR_SERVICE_REGION")
 
+# One synthesizer instance per executor worker
+TTS_POOL_SIZE = int(os.getenv("TTS_POOL_SIZE", "4"))
+TTS_HEALTH_CHECK_INTERVAL = float(os.getenv("TTS_HEALTH_CHECK_INTERVAL", "300"))  # Seconds; 0 disables probing
+TTS_ENGINE = os.getenv("TTS_ENGINE", "azure")  # "fake" for load tests without Azure
+MAX_BATCH_TEXTS = 64
 
-AZURE_SPEECH_KEY = "YOUR_AZURE_SPEECH_KEY"  
-AZURE_SERVICE_REGION = "YOUR_SERVICE_REGION"  
+if TTS_ENGINE == "fake":
+    synthesizer_factory = FakeSynthesizer
+else:
+    synthesizer_factory = lambda: AzureSynthesizer(AZURE_SPEECH_KEY, AZURE_SERVICE_REGION)
 
-speech_config = speechsdk.SpeechConfig(subscription=AZURE_SPEECH_KEY, region=AZURE_SERVICE_REGION)
-speech_config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3)
-speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+synthesizer_pool = SynthesizerPool(synthesizer_factory, TTS_POOL_SIZE, health_check_interval=TTS_HEALTH_CHECK_INTERVAL)
+executor = ThreadPoolExecutor(max_workers=TTS_POOL_SIZE)
+
+_sentence_split = re.compile(r"(?<=[.!?])\s+")
 
 def synthesize_audio(text):
     try:
         logger.debug(f"Synthesizing audio for text: {text}")
-        result = speech_synthesizer.speak_text_async(text).get()
-
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            logger.info("Audio synthesized successfully.")
-            audio_stream = io.BytesIO(result.audio_data)
-            return audio_stream
-        elif result.reason == speechsdk.ResultReason.Canceled:
-            cancellation_details = result.cancellation_details
-            logger.error(f"Speech synthesis canceled: {cancellation_details.reason}")
-            if cancellation_details.reason == speechsdk.CancellationReason.Error:
-                logger.error(f"Error details: {cancellation_details.error_details}")
-            raise HTTPException(status_code=500, detail="Speech synthesis canceled.")
+        audio_stream = io.BytesIO(synthesizer_pool.synthesize(text))
+        logger.info("Audio synthesized successfully.")
+        return audio_stream
+    except SynthesisError as e:
+        logger.error(f"{e}")
+        raise HTTPException(status_code=500, detail="Speech synthesis canceled.")
     except Exception as e:
         logger.error(f"Error during synthesis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Synthesis failed.")
@@ -83,9 +89,55 @@ async def synthesize(request: Request):
         logger.error(f"Error during synthesis: {e}", exc_info=True)
         return JSONResponse(content={"error": "Synthesis failed."}, status_code=500)
 
+@app.post('/synthesize_batch')
+async def synthesize_batch(request: Request):
+    """
+    Synthesize {"texts": [...]} or the sentences of {"text": "..."} in parallel across the pool.
+    Results come back in input order, base64-encoded; a failed item carries an error instead of audio.
+    """
+    try:
+        data = await request.json()
+    except Exception as e:
+        logger.warning("Invalid content type. Expected application/json.")
+        return JSONResponse(content={"error": "Invalid content type. Expected application/json."}, status_code=400)
+
+    texts = data.get('texts')
+    if texts is None:
+        texts = _sentence_split.split(data.get('text', '').strip())
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return JSONResponse(content={"error": "'texts' must be a list of strings."}, status_code=400)
+    texts = [text.strip() for text in texts if text.strip()]
+
+    if not texts:
+        logger.warning("No text provided for synthesis.")
+        return JSONResponse(content={"error": "No text provided for synthesis."}, status_code=400)
+    if len(texts) > MAX_BATCH_TEXTS:
+        return JSONResponse(content={"error": f"At most {MAX_BATCH_TEXTS} texts per batch."}, status_code=400)
+
+    logger.info(f"Received batch synthesis request for {len(texts)} texts.")
+
+    loop = asyncio.get_running_loop()
+    outcomes = await asyncio.gather(
+        *(loop.run_in_executor(executor, synthesizer_pool.synthesize, text) for text in texts),
+        return_exceptions=True
+    )
+
+    results = []
+    for index, (text, outcome) in enumerate(zip(texts, outcomes)):
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch item {index} failed: {outcome}")
+            results.append({"index": index, "text": text, "error": "Synthesis failed."})
+        else:
+            results.append({"index": index, "text": text, "audio": base64.b64encode(outcome).decode('ascii')})
+
+    status_code = 500 if all("error" in result for result in results) else 200
+    return JSONResponse(content={"media_type": "audio/mpeg", "results": results}, status_code=status_code)
+
 @app.get('/health')
 async def health_check():
-    return JSONResponse(content={"status": "OK"}, status_code=200)
+    pool_health = synthesizer_pool.health()
+    status = "OK" if pool_health["healthy"] > 0 else "UNAVAILABLE"
+    return JSONResponse(content={"status": status, "pool": pool_health}, status_code=200 if status == "OK" else 503)
 
 if __name__ == '__main__':
     uvicorn.run(app, host='0.0.0.0', port=50051)
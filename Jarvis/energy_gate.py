@@ -0,0 +1,95 @@
+# energy_gate.py
+#
+# Energy gate in front of the wake-word engine. Audio is read in blocks of frames; the energy of every
+# frame in a block is computed in one NumPy pass and only frames that may hold speech are passed on,
+# together with a short look-back so the onset of the wake word is never cut off.
+
+import numpy as np
+
+FULL_SCALE = 32768.0
+
+
+class EnergyGate:
+    """
+    Passes frames whose energy is at least `margin_db` above the tracked noise floor (and above
+    `min_speech_db`), keeps the gate open for `hangover_ms` after the last loud frame and prepends up
+    to `lookback_ms` of the frames just before it opened. The noise floor follows the quietest frame
+    of each block: quickly down, slowly up, so a fan switching on only briefly holds the gate open.
+    """
+
+    def __init__(self, frame_length, sample_rate=16000, margin_db=9.0, min_speech_db=-55.0,
+                 lookback_ms=300, hangover_ms=600, floor_fall=0.5, floor_rise=0.02):
+        self.frame_length = frame_length
+        frame_ms = 1000 * frame_length / sample_rate
+        self.lookback = max(1, round(lookback_ms / frame_ms))
+        self.hangover = max(0, round(hangover_ms / frame_ms))
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.floor_fall = floor_fall
+        self.floor_rise = floor_rise
+
+        self.floor_db = None
+        self.since_loud = self.hangover + 1  # Frames since the last loud one, carried across blocks
+        self.history = np.empty((0, frame_length), dtype=np.int16)  # Closed frames, newest last
+        self.frames_seen = 0
+        self.frames_passed = 0
+
+    def frame_db(self, frames):
+        """
+        Per-frame energy in dBFS for an (n, frame_length) int16 array.
+        """
+        samples = frames.astype(np.float32) / FULL_SCALE
+        energy = np.einsum("ij,ij->i", samples, samples) / self.frame_length
+        return 10 * np.log10(energy + 1e-10)
+
+    def process(self, block):
+        """
+        Takes raw int16 PCM bytes (or an array) holding whole frames and returns the frames to run
+        through the wake-word engine as an (n, frame_length) array, possibly empty.
+        """
+        samples = np.frombuffer(block, dtype=np.int16) if isinstance(block, (bytes, bytearray)) else block
+        frames = samples[:len(samples) - len(samples) % self.frame_length].reshape(-1, self.frame_length)
+        count = len(frames)
+        if not count:
+            return frames
+        self.frames_seen += count
+
+        db = self.frame_db(frames)
+        quietest = float(db.min())
+        if self.floor_db is None:
+            self.floor_db = quietest
+        rate = self.floor_fall if quietest < self.floor_db else self.floor_rise
+        self.floor_db += rate * (quietest - self.floor_db)
+
+        loud = db >= max(self.floor_db + self.margin_db, self.min_speech_db)
+
+        # Open while within `hangover` frames of the last loud frame, including ones from earlier blocks
+        positions = np.arange(count)
+        last_loud = np.maximum.accumulate(np.where(loud, positions, -self.since_loud - 1))
+        is_open = positions - last_loud <= self.hangover
+        self.since_loud = count - 1 - int(last_loud[-1])
+
+        if not is_open.any():
+            self.history = np.concatenate((self.history, frames))[-self.lookback:]
+            return frames[:0]
+
+        # Look-back: closed frames within `lookback` before an opening, here or from earlier blocks
+        opens = np.flatnonzero(is_open & ~np.concatenate(([False], is_open[:-1])))
+        passed = is_open.copy()
+        for start in opens:
+            passed[max(0, start - self.lookback):start] = True
+        first = int(opens[0])
+        earlier = self.history[max(0, len(self.history) - (self.lookback - first)):] if first < self.lookback else self.history[:0]
+
+        trailing = count - 1 - int(np.flatnonzero(passed)[-1])  # Closed frames after the last passed one
+        self.history = frames[count - trailing:][-self.lookback:] if trailing else self.history[:0]
+
+        selected = frames[passed]
+        if len(earlier):
+            selected = np.concatenate((earlier, selected))
+        self.frames_passed += len(selected)
+        return selected
+
+    @property
+    def pass_ratio(self):
+        return self.frames_passed / self.frames_seen if self.frames_seen else 0.0
@@ -0,0 +1,98 @@
+# fast_path.py
+
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from warm_state import WarmCache
+
+logger = logging.getLogger("Fast_Path")
+
+# Intents whose retrieval result is already the final answer
+DETERMINISTIC_INTENTS = {"greet", "weather", "age", "system", "read_screen"}
+
+REPHRASE_CACHE_SIZE = 512
+STATS_LOG_INTERVAL = 50  # Log the fast-path share every N requests
+
+
+class FastPath:
+    """
+    Answers deterministic intents directly, skipping prompt building and generation.
+    With a `rephraser`, answers are reworded off the request path and the rewording is
+    cached so later identical answers sound less canned at no extra latency. `cache_version`
+    should change with the rephrasing model, so snapshots from another model are discarded.
+    """
+
+    def __init__(self, rephraser=None, cache_size=REPHRASE_CACHE_SIZE, cache_version="1"):
+        self.rephraser = rephraser
+        self.cache_size = cache_size
+        self.rephrase_cache = WarmCache("rephrasings", max_entries=cache_size, version=cache_version)
+        self.rephrasing = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rephrase") if rephraser else None
+        self.lock = threading.Lock()
+        self.total = 0
+        self.served = Counter()
+
+    def greet(self, user_name):
+        return self._serve("greet", f"Hello there, {user_name}! How may I help you?")
+
+    def answer(self, intent, retrieved_info, failed=False):
+        """
+        Return the final answer for a deterministic intent, or None if the LLM is needed.
+        A `failed` retrieval (an error or a request for more input) is never the final answer.
+        """
+        if intent not in DETERMINISTIC_INTENTS or not retrieved_info or failed:
+            self.record(None)
+            return None
+        return self._serve(intent, retrieved_info)
+
+    def _serve(self, intent, text):
+        self.record(intent)
+        if self.rephraser is None:
+            return text
+        cached = self.rephrase_cache.get(text)
+        if cached is not None:
+            return cached
+        with self.lock:
+            if text not in self.rephrasing:
+                self.rephrasing.add(text)
+                self.executor.submit(self._rephrase, text)
+        return text
+
+    def _rephrase(self, text):
+        try:
+            rephrased = self.rephraser(text)
+            if rephrased:
+                self.rephrase_cache.put(text, rephrased)
+        except Exception as e:
+            logger.error(f"Rephrasing failed: {e}", exc_info=True)
+        finally:
+            with self.lock:
+                self.rephrasing.discard(text)
+
+    def record(self, intent):
+        """
+        Count a request; `intent` is the fast-path intent that served it, or None if the model did.
+        """
+        with self.lock:
+            self.total += 1
+            if intent is not None:
+                self.served[intent] += 1
+            should_log = self.total % STATS_LOG_INTERVAL == 0
+        if should_log:
+            stats = self.stats()
+            logger.info(
+                f"Fast path served {stats['served']}/{stats['total']} requests "
+                f"({stats['share']:.1%}); by intent: {stats['by_intent']}"
+            )
+
+    def stats(self):
+        with self.lock:
+            served = sum(self.served.values())
+            return {
+                "total": self.total,
+                "served": served,
+                "share": served / self.total if self.total else 0.0,
+                "by_intent": dict(self.served)
+            }
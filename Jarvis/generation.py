@@ -0,0 +1,185 @@
+# generation.py
+
+import logging
+import math
+import threading
+import time
+
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from cancellation import current_token
+from sanitizer import StreamingSanitizer
+
+logger = logging.getLogger("Generation")
+
+# English text averages about 4 characters per Llama token; err low so budgets rarely cut a reply short
+CHARS_PER_TOKEN = 3.5
+WASTE_LOG_INTERVAL = 50  # Log wasted-token totals every N generations
+
+# Per-thread forward pass counters, filled by hooks on the target and draft models
+_counters = threading.local()
+_hooked_models = set()
+_hook_lock = threading.Lock()
+
+# Generated vs kept token totals per label
+_waste = {}
+_waste_lock = threading.Lock()
+
+
+def _count_forward(role):
+    def hook(module, inputs, output):
+        setattr(_counters, role, getattr(_counters, role, 0) + 1)
+    return hook
+
+
+def _track(model, role):
+    with _hook_lock:
+        if id(model) not in _hooked_models:
+            model.register_forward_hook(_count_forward(role))
+            _hooked_models.add(id(model))
+
+
+def _reset_counters():
+    _counters.target = 0
+    _counters.draft = 0
+
+
+def load_draft_model(draft_model_name, model, token=None):
+    """
+    Load a small draft model for assisted generation.
+    Returns None if it cannot be loaded or does not share the main model's vocabulary.
+    """
+    from transformers import AutoModelForCausalLM
+    import torch
+
+    try:
+        draft_model = AutoModelForCausalLM.from_pretrained(
+            draft_model_name,
+            torch_dtype=torch.float16,
+            low_cpu_mem_usage=True,
+            use_auth_token=token
+        ).to(model.device)
+        draft_model.eval()
+    except Exception as e:
+        logger.error(f"Failed to load draft model '{draft_model_name}': {e}", exc_info=True)
+        return None
+
+    if draft_model.config.vocab_size != model.config.vocab_size:
+        logger.warning(
+            f"Draft model '{draft_model_name}' vocabulary ({draft_model.config.vocab_size}) does not match "
+            f"the main model ({model.config.vocab_size}). Assisted generation disabled."
+        )
+        return None
+
+    logger.info(f"Draft model '{draft_model_name}' loaded for assisted generation.")
+    return draft_model
+
+
+class CancelledCriteria(StoppingCriteria):
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.token.cancelled
+
+
+class SanitizerCriteria(StoppingCriteria):
+    """
+    Feeds newly generated text to a StreamingSanitizer and stops as soon as a cut-off phrase completes.
+    """
+
+    def __init__(self, sanitizer, tokenizer, prompt_length):
+        self.sanitizer = sanitizer
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.decoded_length = 0
+
+    def __call__(self, input_ids, scores, **kwargs):
+        # Decoding the whole reply keeps word-initial spaces that per-token decoding would drop
+        text = self.tokenizer.decode(input_ids[0, self.prompt_length:], skip_special_tokens=True)
+        if not text.endswith("\ufffd"):  # Otherwise a multi-byte character is still incomplete
+            self.sanitizer.feed(text[self.decoded_length:])
+            self.decoded_length = len(text)
+        return self.sanitizer.stopped
+
+
+def generate(model, draft_model=None, label="generate", stop_phrases=None, tokenizer=None, **generate_kwargs):
+    """
+    Run model.generate, using draft_model for assisted (speculative) decoding when given.
+    Assisted runs log the draft acceptance rate and the tokens produced per main model pass.
+    With `stop_phrases` (and the `tokenizer` to decode with), generation stops once the reply
+    contains one of them. Generation also stops early, raising RequestCancelled, if the current
+    request is cancelled.
+    """
+    token = current_token.get()
+    if getattr(model, "remote", False):
+        # Workers build the stopping criteria themselves and get cancellation from the pool
+        if stop_phrases:
+            generate_kwargs["stop_phrases"] = stop_phrases
+    else:
+        criteria = StoppingCriteriaList(generate_kwargs.pop("stopping_criteria", None) or [])
+        if stop_phrases:
+            prompt_length = generate_kwargs["input_ids"].shape[-1]
+            criteria.append(SanitizerCriteria(StreamingSanitizer(stop_phrases), tokenizer, prompt_length))
+        if token is not None:
+            criteria.append(CancelledCriteria(token))
+        if criteria:
+            generate_kwargs["stopping_criteria"] = criteria
+
+    if draft_model is None:
+        output_ids = model.generate(**generate_kwargs)
+        if token is not None:
+            token.raise_if_cancelled()
+        return output_ids
+
+    _track(model, "target")
+    _track(draft_model, "draft")
+    _reset_counters()
+
+    prompt_length = generate_kwargs["input_ids"].shape[-1]
+    start = time.perf_counter()
+    output_ids = model.generate(assistant_model=draft_model, **generate_kwargs)
+    elapsed = time.perf_counter() - start
+
+    new_tokens = output_ids.shape[-1] - prompt_length
+    target_passes = _counters.target
+    draft_passes = _counters.draft
+
+    # Every verification pass yields the accepted draft tokens plus one token from the main model
+    accepted = max(new_tokens - target_passes, 0)
+    acceptance_rate = accepted / draft_passes if draft_passes else 0.0
+    speedup = new_tokens / target_passes if target_passes else 0.0
+
+    logger.info(
+        f"[{label}] Assisted generation: {new_tokens} tokens in {elapsed:.2f}s, "
+        f"{target_passes} main passes, {draft_passes} draft tokens proposed, "
+        f"acceptance rate {acceptance_rate:.1%}, {speedup:.2f} tokens per main pass."
+    )
+    if token is not None:
+        token.raise_if_cancelled()
+    return output_ids
+
+
+def reply_token_budget(char_limit):
+    """
+    max_new_tokens for a reply that is cut to `char_limit` characters anyway.
+    """
+    return math.ceil(char_limit / CHARS_PER_TOKEN)
+
+
+def record_wasted_tokens(label, generated, kept):
+    """
+    Track tokens generated but discarded after trimming and sanitizing.
+    """
+    with _waste_lock:
+        totals = _waste.setdefault(label, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += generated
+        totals[2] += max(generated - kept, 0)
+        count, total_generated, total_wasted = totals
+    logger.debug(f"[{label}] Generated {generated} tokens, kept {kept}.")
+    if count % WASTE_LOG_INTERVAL == 0:
+        logger.info(
+            f"[{label}] {total_wasted}/{total_generated} generated tokens discarded "
+            f"({total_wasted / total_generated if total_generated else 0.0:.1%}) over {count} generations."
+        )
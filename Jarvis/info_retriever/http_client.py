@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import concurrent.futures
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("Http_Client")
+
+# Sent with every request; Wikimedia asks API clients to identify themselves and give a way to reach them.
+# The default only names the client, since contact details belong to whoever runs it (set HTTP_USER_AGENT).
+USER_AGENT = os.getenv("HTTP_USER_AGENT", f"Jarvis/1.0 python-requests/{requests.__version__}")
+
+# Per-source connect/read timeouts (seconds), retry budget and circuit breaker settings
+DEFAULT_SOURCE_SETTINGS = {
+    "connect_timeout": 3.05,
+    "read_timeout": 10,
+    "retries": 2,
+    "failure_threshold": 5,  # Consecutive failures before the circuit opens
+    "reset_timeout": 30  # Seconds the circuit stays open before a trial request
+}
+
+SOURCE_SETTINGS = {
+    "openweather": {"read_timeout": 5},
+    "newsapi": {"read_timeout": 8},
+    "serpapi": {"read_timeout": 15, "retries": 1},
+    "wikipedia": {"read_timeout": 8},
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.25  # Seconds; doubled per attempt, with full jitter
+BACKOFF_CAP = 4
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated errors from a source, then lets one trial request through
+    once reset_timeout has passed.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: allow a trial request; another failure re-opens the circuit
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """
+    Shared HTTP layer for InfoRetriever sources: one keep-alive connection pool,
+    per-source timeouts, jittered retries and a circuit breaker per source.
+    """
+
+    def __init__(self, pool_size=10, max_workers=8, source_settings=None, user_agent=USER_AGENT):
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.source_settings = source_settings if source_settings is not None else SOURCE_SETTINGS
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http")
+
+    def settings(self, source):
+        return {**DEFAULT_SOURCE_SETTINGS, **self.source_settings.get(source, {})}
+
+    def breaker(self, source):
+        with self.breakers_lock:
+            if source not in self.breakers:
+                settings = self.settings(source)
+                self.breakers[source] = CircuitBreaker(settings["failure_threshold"], settings["reset_timeout"])
+            return self.breakers[source]
+
+    def get_json(self, source, url, params=None, headers=None):
+        """
+        GET `url` and return the decoded JSON body. Non-retryable 4xx responses are returned
+        as-is so callers can read the API's error message.
+        """
+        settings = self.settings(source)
+        breaker = self.breaker(source)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit for '{source}' is open; skipping request.")
+
+        timeout = (settings["connect_timeout"], settings["read_timeout"])
+        for attempt in range(settings["retries"] + 1):
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    data = response.json()
+                    breaker.record_success()
+                    return data
+                error = requests.HTTPError(f"{source} returned HTTP {response.status_code}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt < settings["retries"]:
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"Request to '{source}' failed ({error}); retrying in {delay:.2f}s.")
+                time.sleep(delay)
+
+        breaker.record_failure()
+        raise error
+
+    def submit(self, source, url, params=None, headers=None):
+        """
+        Run get_json on the client's thread pool and return a concurrent.futures.Future.
+        """
+        return self.executor.submit(self.get_json, source, url, params, headers)
+
+    async def get_json_async(self, source, url, params=None, headers=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.get_json, source, url, params, headers)
+
+
+# Shared by every InfoRetriever
+http_client = HttpClient()
@@ -1,20 +1,25 @@
 import os
-import requests
 from bs4 import BeautifulSoup
-import wikipedia
-from serpapi import GoogleSearch  
-from newsapi import NewsApiClient
 from datetime import datetime
 import logging
 import re
 import time
 import subprocess
 import random
-import concurrent.futures
+import threading
+import contextvars
+import hashlib
+import numpy as np
 from transformers import AutoTokenizer, AutoModelForCausalLM
+from cancellation import CancellationToken, RequestCancelled, current_token
+from generation import generate
+from warm_state import WarmCache, cache_version
+from info_retriever.http_client import http_client
+from info_retriever.wiki_index import WikiIndex
+from info_retriever.single_flight import SingleFlight, normalize_query
+from info_retriever.summarization import split_sentences, extract_relevant, chunk_sentences
 
 
-logging.basicConfig(level=logging.DEBUG)  
 logger = logging.getLogger("Info_Retriever")
 
 
@@ -22,73 +27,169 @@ OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
 NEWSAPI_KEY = os.getenv('NEWSAPI_KEY')
 SERPAPI_API_KEY = os.getenv('SERPAPI_API_KEY')  
 
+# Source endpoints; all requests go through the shared http_client
+OPENWEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+SERPAPI_URL = "https://serpapi.com/search.json"
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+
+# Summarization budgets (tokens)
+CONTEXT_TOKENS = 2048
+SUMMARY_PROMPT = "Summarize the following information professionally:\n\n{text}"
+SUMMARY_PROMPT_TOKENS = 32  # Template plus special tokens, rounded up
+MAP_SUMMARY_TOKENS = 120  # Length of each partial summary in map-reduce
+MAP_REDUCE_MAX_CHUNKS = 3  # The extractive stage keeps at most this many context windows of text
+
+# Warm caches (snapshotted across restarts by asr_server); retrievals are only cached for intents listed here
+SUMMARY_CACHE_SIZE = 1024
+RETRIEVAL_CACHE_SIZE = 2048
+RETRIEVAL_KEY_FORMAT = 2  # Bump when normalize_query changes so snapshotted retrievals are discarded
+RETRIEVAL_TTLS = {
+    "capital": 7 * 24 * 3600,
+    "subject": 24 * 3600,
+    "search": 6 * 3600,
+    "news": 30 * 60,
+    "weather": 10 * 60
+}
+
+
+class RetrievalFailure(str):
+    """
+    A retrieval message that is not an answer: an error, nothing found, or a request for more input.
+    It reads like any other result, but is never cached, served on the fast path or summarized.
+    """
+
 
 if NEWSAPI_KEY:
-    newsapi = NewsApiClient(api_key=NEWSAPI_KEY)
-    logger.info("NewsAPI client initialized.")
+    logger.info("NewsAPI key found.")
 else:
     logger.error("NewsAPI key not found. Please set the NEWSAPI_KEY environment variable.")
 
 class InfoRetriever:
-    def __init__(self, tokenizer: AutoTokenizer, model: AutoModelForCausalLM):
+    def __init__(self, tokenizer: AutoTokenizer, model: AutoModelForCausalLM, draft_model: AutoModelForCausalLM = None,
+                 wiki_index: WikiIndex = None):
         self.tokenizer = tokenizer
         self.model = model
-        self.summary_cache = {}
+        self.draft_model = draft_model  # Enables assisted decoding for summaries when set
+        self.wiki_index = wiki_index  # Local Wikipedia index, consulted before the network
+        # Summaries depend on the model and prompt; cached retrievals may embed summaries too
+        summary_version = cache_version(
+            getattr(tokenizer, "name_or_path", ""), SUMMARY_PROMPT, MAP_SUMMARY_TOKENS, MAP_REDUCE_MAX_CHUNKS
+        )
+        self.summary_cache = WarmCache("summaries", max_entries=SUMMARY_CACHE_SIZE, version=summary_version)
+        self.retrieval_cache = WarmCache(
+            "retrievals", max_entries=RETRIEVAL_CACHE_SIZE, version=cache_version(summary_version, RETRIEVAL_KEY_FORMAT)
+        )
+        # Concurrent identical retrievals/summaries share one execution
+        self.retrieval_flight = SingleFlight("retrieval")
+        self.summary_flight = SingleFlight("summary")
         logger.debug("InfoRetriever initialized with tokenizer and model.")
 
+    def fetch_wikipedia_page(self, query: str, intro_sentences: int = None) -> dict:
+        """
+        Find the best matching Wikipedia page for `query` and return its plain-text extract,
+        limited to the first `intro_sentences` of the lead section when given.
+        Returns None when nothing matches.
+        """
+        if self.wiki_index is not None:
+            try:
+                local = self.wiki_index.lookup(query)
+            except Exception as e:
+                logger.error(f"Local Wikipedia index error: {e}", exc_info=True)
+                local = None
+            if local is not None:
+                logger.debug(f"Local Wikipedia index hit for '{query}': {local['title']}")
+                return {
+                    "title": local["title"],
+                    "extract": local["summary"] if intro_sentences else local["content"],
+                    "disambiguation": local["disambiguation"]
+                }
+            logger.debug(f"Local Wikipedia index miss for '{query}'; querying the API.")
+
+        params = {
+            "action": "query",
+            "format": "json",
+            "generator": "search",
+            "gsrsearch": query,
+            "gsrlimit": 1,
+            "prop": "extracts|pageprops",
+            "explaintext": 1,
+            "redirects": 1
+        }
+        if intro_sentences:
+            params.update({"exintro": 1, "exsentences": intro_sentences})
+        data = http_client.get_json("wikipedia", WIKIPEDIA_API_URL, params=params)
+        pages = data.get("query", {}).get("pages", {})
+        if not pages:
+            return None
+        page = next(iter(pages.values()))
+        return {
+            "title": page.get("title", query),
+            "extract": page.get("extract", ""),
+            "disambiguation": "disambiguation" in page.get("pageprops", {})
+        }
+
     def search_wikipedia(self, query: str) -> str:
         try:
             logger.info(f"Searching Wikipedia for: {query}")
-            summary = wikipedia.summary(query, sentences=3)
-            logger.debug(f"Wikipedia summary: {summary}")
+            page = self.fetch_wikipedia_page(query, intro_sentences=3)
+            if page is None:
+                logger.warning(f"No Wikipedia page found for '{query}'.")
+                return RetrievalFailure(f"No Wikipedia page found for '{query}'.")
+            if page["disambiguation"]:
+                logger.warning(f"Disambiguation page '{page['title']}' for query '{query}'.")
+                return RetrievalFailure(f"Your query '{query}' resulted in multiple topics. Please be more specific.")
+            summary = page["extract"]
+            logger.debug("Wikipedia summary: %s", summary, extra={"category": "payload"})
             return summary
-        except wikipedia.exceptions.DisambiguationError as e:
-            logger.warning(f"Disambiguation error for query '{query}': {e}")
-            return f"Your query '{query}' resulted in multiple topics. Please be more specific."
-        except wikipedia.exceptions.PageError:
-            logger.warning(f"No Wikipedia page found for '{query}'.")
-            return f"No Wikipedia page found for '{query}'."
         except Exception as e:
             logger.error(f"Wikipedia search error: {e}", exc_info=True)
-            return "An error occurred while searching Wikipedia."
+            return RetrievalFailure("An error occurred while searching Wikipedia.")
 
     def get_weather(self, city: str) -> str:
         try:
             logger.info(f"Fetching weather for: {city}")
-            url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-            response = requests.get(url)
-            data = response.json()
-            logger.debug(f"Weather API response: {data}")
+            data = http_client.get_json(
+                "openweather",
+                OPENWEATHER_URL,
+                params={"q": city, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+            )
+            logger.debug("Weather API response: %s", data, extra={"category": "payload"})
             if data.get('cod') != 200:
                 logger.warning(f"Weather data not found for '{city}': {data.get('message')}")
-                return f"Weather data not found for '{city}'."
+                return RetrievalFailure(f"Weather data not found for '{city}'.")
             weather = data['weather'][0]['description']
             temp = data['main']['temp']
             logger.info(f"Weather in {city}: {weather}, {temp}°C")
             return f"The current weather in {city} is {weather} with a temperature of {temp}°C."
         except Exception as e:
             logger.error(f"Weather API error: {e}", exc_info=True)
-            return "An error occurred while fetching the weather information."
+            return RetrievalFailure("An error occurred while fetching the weather information.")
 
     def get_news(self, topic: str) -> str:
         try:
             logger.info(f"Fetching news for: {topic}")
-            all_articles = newsapi.get_everything(q=topic,
-                                                  language='en',
-                                                  sort_by='publishedAt',
-                                                  page_size=3)
+            all_articles = http_client.get_json(
+                "newsapi",
+                NEWSAPI_URL,
+                params={"q": topic, "language": "en", "sortBy": "publishedAt", "pageSize": 3},
+                headers={"X-Api-Key": NEWSAPI_KEY}
+            )
+            if all_articles.get('status') == 'error':
+                logger.error(f"NewsAPI error: {all_articles.get('message')}")
+                return RetrievalFailure("An error occurred while fetching news information.")
             articles = all_articles.get('articles')
             if not articles:
                 logger.warning(f"No news articles found for '{topic}'.")
-                return f"No news articles found for '{topic}'."
+                return RetrievalFailure(f"No news articles found for '{topic}'.")
             news_summary = f"Here are the latest news articles about {topic}:\n"
             for article in articles:
                 news_summary += f"- {article['title']} ({article['source']['name']})\n"
-            logger.debug(f"News summary: {news_summary}")
+            logger.debug("News summary: %s", news_summary, extra={"category": "payload"})
             return news_summary
         except Exception as e:
             logger.error(f"NewsAPI error: {e}", exc_info=True)
-            return "An error occurred while fetching news information."
+            return RetrievalFailure("An error occurred while fetching news information.")
 
     def perform_serpapi_search(self, query: str, max_results: int = 5) -> str:
         try:
@@ -99,101 +200,176 @@ class InfoRetriever:
                 "api_key": SERPAPI_API_KEY,
                 "num": max_results
             }
-            search = GoogleSearch(params)
-            results = search.get_dict()
+            results = http_client.get_json("serpapi", SERPAPI_URL, params=params)
             if "error" in results:
                 logger.error(f"SerpAPI error: {results['error']}")
-                return "An error occurred while performing the search."
+                return RetrievalFailure("An error occurred while performing the search.")
             organic_results = results.get("organic_results", [])
             if not organic_results:
                 logger.warning(f"No search results found for '{query}'.")
-                return f"No search results found for '{query}'."
+                return RetrievalFailure(f"No search results found for '{query}'.")
             search_summary = f"Here are the top search results for '{query}':\n"
             for result in organic_results:
                 title = result.get('title')
                 link = result.get('link')
                 snippet = result.get('snippet')
                 search_summary += f"- {title}: {snippet} ({link})\n"
-            logger.debug(f"SerpAPI search summary: {search_summary}")
+            logger.debug("SerpAPI search summary: %s", search_summary, extra={"category": "payload"})
 
-            summarized_info = self.summarize_text_local(search_summary)
+            summarized_info = self.summarize_text_local(search_summary, query=query)
             return summarized_info
         except Exception as e:
             logger.error(f"SerpAPI search error: {e}", exc_info=True)
-            return "An error occurred while performing the search."
+            return RetrievalFailure("An error occurred while performing the search.")
 
 
     def scrape_wikipedia_page(self, query: str) -> str:
         try:
             logger.info(f"Scraping Wikipedia page for: {query}")
-            page = wikipedia.page(query)
-            content = page.content
-            logger.debug(f"Scraped Wikipedia content: {content[:500]}...")  
+            page = self.fetch_wikipedia_page(query)
+            if page is None or page["disambiguation"]:
+                raise LookupError(f"No unambiguous Wikipedia page for '{query}'.")
+            content = page["extract"]
+            logger.debug("Scraped Wikipedia content: %.500s...", content, extra={"category": "payload"})
             return content
         except Exception as e:
             logger.error(f"Error scraping Wikipedia page: {e}", exc_info=True)
-            return "An error occurred while scraping the Wikipedia page."
+            return RetrievalFailure("An error occurred while scraping the Wikipedia page.")
 
-    def summarize_text_local(self, text: str, max_length: int = 150, timeout: int = 30) -> str:
+    def summarize_text_local(self, text: str, max_length: int = 150, timeout: int = 30, query: str = None) -> str:
         """
-        Summarize text using the local Vicuna model with a timeout.
+        Summarize text using the local Vicuna model, allowing `timeout` seconds per generation.
+        Long texts are first cut to the sentences most relevant to `query`, then summarized
+        map-reduce style if they still do not fit the context window. If a generation times out or
+        fails, the most relevant sentences that fit in `max_length` tokens are returned instead.
+        Identical concurrent requests wait for a single generation; finished summaries are cached.
         """
-        def generate_summary():
-            logger.debug("Starting summary generation.")
-            prompt = f"Summarize the following information professionally:\n\n{text}"
-            inputs = self.tokenizer(
-                prompt,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=2048
-            ).to(self.model.device)
-            logger.debug("Tokenized prompt successfully.")
-
-            summary_ids = self.model.generate(
-                input_ids=inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                max_length=max_length,
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True,
-                num_return_sequences=1,
-                pad_token_id=self.tokenizer.pad_token_id
-            )
-            logger.debug("Generated summary IDs successfully.")
-
-            summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip()
-            logger.debug(f"Local summarization result: {summary}")
+        cached = self.summary_cache.get(self._summary_key(text, max_length, query))
+        if cached is not None:
+            logger.info("Summary served from cache.")
+            return cached
+        return self.summary_flight.do(
+            (text, max_length, query), self._summarize_text_local, text, max_length, timeout, query
+        )
+
+    @staticmethod
+    def _summary_key(text: str, max_length: int, query: str) -> tuple:
+        # The source text is hashed so cache keys (and snapshot indexes) stay small
+        return hashlib.sha1(text.encode("utf-8")).hexdigest(), max_length, query
+
+    def _generate_summary(self, text: str, max_new_tokens: int, timeout: float) -> str:
+        """
+        One generation stage; cancels itself through the current token after `timeout` seconds.
+        """
+        timer = threading.Timer(timeout, current_token.get().cancel, args=(f"summary stage over {timeout}s",))
+        timer.daemon = True
+        timer.start()
+        try:
+            return self._run_summary(text, max_new_tokens)
+        finally:
+            timer.cancel()
+
+    def _run_summary(self, text: str, max_new_tokens: int) -> str:
+        prompt = SUMMARY_PROMPT.format(text=text)
+        inputs = self.tokenizer(
+            prompt,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=CONTEXT_TOKENS - max_new_tokens
+        ).to(self.model.device)
+        logger.debug(f"Tokenized summary prompt ({inputs['input_ids'].shape[-1]} tokens).")
+
+        summary_ids = generate(
+            self.model,
+            draft_model=self.draft_model,
+            label="summary",
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=max_new_tokens,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True,
+            num_return_sequences=1,
+            pad_token_id=self.tokenizer.pad_token_id
+        )
+
+        # Decode only the generated tokens, not the echoed prompt
+        prompt_length = inputs["input_ids"].shape[-1]
+        return self.tokenizer.decode(summary_ids[0][prompt_length:], skip_special_tokens=True).strip()
+
+    def _count_tokens(self, sentences: list) -> np.ndarray:
+        if not sentences:
+            return np.zeros(0, dtype=np.int64)
+        encoded = self.tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        return np.array([len(ids) for ids in encoded], dtype=np.int64)
+
+    def _summarize_pipeline(self, text: str, max_length: int, query: str, stage_timeout: float) -> str:
+        # Room left for the text once the prompt template and the generated summary are accounted for
+        text_budget = CONTEXT_TOKENS - max_length - SUMMARY_PROMPT_TOKENS
+        sentences = split_sentences(text)
+        token_counts = self._count_tokens(sentences)
+
+        if token_counts.sum() > text_budget:
+            # Extractive stage: keep only the sentences most relevant to the query
+            sentences = extract_relevant(sentences, token_counts, text_budget * MAP_REDUCE_MAX_CHUNKS, query)
+            token_counts = self._count_tokens(sentences)
+            logger.debug(f"Extractive pre-filter kept {len(sentences)} sentences ({token_counts.sum()} tokens).")
+
+        if token_counts.sum() <= text_budget:
+            return self._generate_summary(" ".join(sentences), max_length, stage_timeout)
+
+        # Map: summarize each chunk; reduce: summarize the partial summaries
+        chunks = chunk_sentences(sentences, token_counts, text_budget)
+        logger.info(f"Text too long for one pass; summarizing {len(chunks)} chunks.")
+        partials = [self._generate_summary(chunk, MAP_SUMMARY_TOKENS, stage_timeout) for chunk in chunks]
+        return self._generate_summary("\n".join(partials), max_length, stage_timeout)
+
+    def _extractive_summary(self, text: str, max_length: int, query: str) -> str:
+        # The sentences most relevant to `query` that fit in `max_length` tokens, in document order
+        sentences = split_sentences(text)
+        return " ".join(extract_relevant(sentences, self._count_tokens(sentences), max_length, query))
+
+    def _summarize_text_local(self, text: str, max_length: int, timeout: int, query: str) -> str:
+        # The summary runs under its own token, cancelled with the request or when a stage runs over its
+        # timeout, so a timed-out generation stops instead of holding the model
+        summary_token = CancellationToken()
+        request_token = current_token.get()
+        if request_token is not None:
+            request_token.on_cancel(lambda: summary_token.cancel(request_token.reason))
+        context = contextvars.copy_context()
+        context.run(current_token.set, summary_token)
+        try:
+            logger.info("Summarizing text using the local Vicuna model.")
+            summary = context.run(self._summarize_pipeline, text, max_length, query, timeout)
+            logger.debug("Local summarization result: %s", summary, extra={"category": "payload"})
 
-            self.summary_cache[text] = summary  
-            logger.debug("Summary cached successfully.")
+            self.summary_cache.put(self._summary_key(text, max_length, query), summary)
+            logger.info("Summarization completed successfully.")
             return summary
+        except RequestCancelled:
+            if request_token is not None and request_token.cancelled:
+                raise
+            logger.error(f"Summarization stage timed out after {timeout}s; using an extractive summary.")
+        except Exception as e:
+            logger.error(f"Local summarization error: {e}; using an extractive summary.", exc_info=True)
 
         try:
-            logger.info("Summarizing text using the local Vicuna model.")
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(generate_summary)
-                summary = future.result(timeout=timeout)
-                logger.debug(f"Local summarization result: {summary}")
-                logger.info("Summarization completed successfully.")
-                return summary
-        except concurrent.futures.TimeoutError:
-            logger.error("Summarization timed out.")
-            return "An error occurred while summarizing the information due to a timeout."
+            return self._extractive_summary(text, max_length, query)
         except Exception as e:
-            logger.error(f"Local summarization error: {e}", exc_info=True)
-            return "An error occurred while summarizing the information locally."
+            logger.error(f"Extractive summarization error: {e}", exc_info=True)
+            return RetrievalFailure("An error occurred while summarizing the information locally.")
 
     def list_files(self, directory: str) -> str:
         try:
             logger.info(f"Listing files in directory: {directory}")
             files = os.listdir(directory)
             file_list = "\n".join(files)
-            logger.debug(f"Files in '{directory}':\n{file_list}")
+            logger.debug("Files in '%s':\n%s", directory, file_list, extra={"category": "payload"})
             return f"Files in '{directory}':\n{file_list}"
         except Exception as e:
             logger.error(f"Error listing files in directory '{directory}': {e}", exc_info=True)
-            return f"An error occurred while listing files in '{directory}'."
+            return RetrievalFailure(f"An error occurred while listing files in '{directory}'.")
 
     def open_application(self, app_path: str) -> str:
         try:
@@ -202,16 +378,54 @@ class InfoRetriever:
             return f"Opened application at {app_path}."
         except Exception as e:
             logger.error(f"Error opening application '{app_path}': {e}", exc_info=True)
-            return f"An error occurred while opening '{app_path}'."
+            return RetrievalFailure(f"An error occurred while opening '{app_path}'.")
 
     def retrieve_information(self, query: str) -> str:
         """
         Determine the type of query and fetch information from appropriate sources.
         Prioritize sources based on query intent.
+        Concurrent requests for the same normalized query share one retrieval, and results for
+        intents in RETRIEVAL_TTLS are cached for that long.
+        """
+        key = normalize_query(query)
+        ttl = RETRIEVAL_TTLS.get(self.classify_intent(query))
+        if ttl:
+            cached = self.retrieval_cache.get(key)
+            if cached is not None:
+                logger.info(f"Retrieval for '{key}' served from cache.")
+                return cached
+        result = self.retrieval_flight.do(key, self._retrieve_information, query)
+        if ttl and result and not isinstance(result, RetrievalFailure):
+            self.retrieval_cache.put(key, result, ttl=ttl)
+        return result
+
+    def classify_intent(self, query: str) -> str:
         """
+        Name the retrieval branch `query` falls into; the order matches retrieve_information.
+        """
+        query = query.lower()
+        if 'capital of' in query:
+            return "capital"
+        elif 'weather' in query:
+            return "weather"
+        elif 'news' in query:
+            return "news"
+        elif any(keyword in query for keyword in ['who is', 'what is', 'tell me about']):
+            return "subject"
+        elif any(keyword in query for keyword in ['if i am', 'when was i born', 'how old am i']):
+            return "age"
+        elif any(keyword in query for keyword in ['list files in', 'open application']):
+            return "system"
+        elif 'read screen' in query:
+            return "read_screen"
+        else:
+            return "search"
+
+    def _retrieve_information(self, query: str) -> str:
         logger.info(f"Retrieving information for query: {query}")
+        intent = self.classify_intent(query)
 
-        if 'capital of' in query.lower():
+        if intent == "capital":
             try:
 
                 match = re.search(r'capital of\s+([a-zA-Z\s]+)', query.lower())
@@ -226,11 +440,11 @@ class InfoRetriever:
                     return summary
                 else:
                     logger.warning("Failed to extract country from 'capital of' query.")
-                    return "Please specify the country for which you want to know the capital."
+                    return RetrievalFailure("Please specify the country for which you want to know the capital.")
             except Exception as e:
                 logger.error(f"Error retrieving capital: {e}", exc_info=True)
-                return "An error occurred while retrieving the capital information."
-        elif 'weather' in query.lower():
+                return RetrievalFailure("An error occurred while retrieving the capital information.")
+        elif intent == "weather":
 
             try:
 
@@ -242,8 +456,8 @@ class InfoRetriever:
                 return self.get_weather(city)
             except Exception as e:
                 logger.error(f"Error extracting city from weather query: {e}", exc_info=True)
-                return "Please specify the city for which you want the weather information."
-        elif 'news' in query.lower():
+                return RetrievalFailure("Please specify the city for which you want the weather information.")
+        elif intent == "news":
 
             try:
                 match = re.search(r'news about\s+([a-zA-Z\s]+)', query.lower())
@@ -254,8 +468,8 @@ class InfoRetriever:
                 return self.get_news(topic)
             except Exception as e:
                 logger.error(f"Error extracting news topic from query: {e}", exc_info=True)
-                return "Please specify the topic for which you want the latest news."
-        elif any(keyword in query.lower() for keyword in ['who is', 'what is', 'tell me about']):
+                return RetrievalFailure("Please specify the topic for which you want the latest news.")
+        elif intent == "subject":
             try:
                 if 'who is' in query.lower():
                     parts = query.lower().split('who is')
@@ -274,8 +488,8 @@ class InfoRetriever:
                 return summary
             except Exception as e:
                 logger.error(f"Error extracting subject from query: {e}", exc_info=True)
-                return "Please specify the subject you want information about."
-        elif any(keyword in query.lower() for keyword in ['if i am', 'when was i born', 'how old am i']):
+                return RetrievalFailure("Please specify the subject you want information about.")
+        elif intent == "age":
 
             try:
 
@@ -288,11 +502,11 @@ class InfoRetriever:
                     return f"If you are {age} years old, you were born in {birth_year}."
                 else:
                     logger.warning("Failed to extract age from query.")
-                    return "Please specify your age to calculate your birth year."
+                    return RetrievalFailure("Please specify your age to calculate your birth year.")
             except Exception as e:
                 logger.error(f"Error processing age-related query: {e}", exc_info=True)
-                return "An error occurred while processing your query."
-        elif any(keyword in query.lower() for keyword in ['list files in', 'open application']):
+                return RetrievalFailure("An error occurred while processing your query.")
+        elif intent == "system":
 
             try:
                 if 'list files in' in query.lower():
@@ -303,7 +517,7 @@ class InfoRetriever:
                         return self.list_files(directory)
                     else:
                         logger.warning("Failed to extract directory from 'list files in' query.")
-                        return "Please specify the directory you want to list files from."
+                        return RetrievalFailure("Please specify the directory you want to list files from.")
                 elif 'open application' in query.lower():
 
                     match = re.search(r'open application\s+([a-zA-Z0-9_]+)', query.lower())
@@ -320,29 +534,29 @@ class InfoRetriever:
                             return self.open_application(app_path)
                         else:
                             logger.warning(f"Application '{app_name}' not recognized.")
-                            return f"Application '{app_name}' not recognized."
+                            return RetrievalFailure(f"Application '{app_name}' not recognized.")
                     else:
                         logger.warning("Failed to extract application name from 'open application' query.")
-                        return "Please specify the application you want to open."
+                        return RetrievalFailure("Please specify the application you want to open.")
                 else:
                     logger.warning(f"Unhandled system operation in query: {query}")
-                    return "I'm sorry, I can't perform that operation."
+                    return RetrievalFailure("I'm sorry, I can't perform that operation.")
             except Exception as e:
                 logger.error(f"Error handling system operation: {e}", exc_info=True)
-                return "An error occurred while performing the requested operation."
-        elif 'read screen' in query.lower():
+                return RetrievalFailure("An error occurred while performing the requested operation.")
+        elif intent == "read_screen":
 
             logger.warning("The 'read screen' feature is currently disabled.")
-            return "I'm sorry, the 'read screen' feature is currently unavailable."
+            return RetrievalFailure("I'm sorry, the 'read screen' feature is currently unavailable.")
         else:
 
             if not SERPAPI_API_KEY:
                 logger.error("SerpAPI API key not set.")
-                return "Search functionality is currently unavailable. Please try again later."
+                return RetrievalFailure("Search functionality is currently unavailable. Please try again later.")
 
             logger.debug("Performing general SerpAPI search.")
             search_result = self.perform_serpapi_search(query)
-            if any(error_phrase in search_result.lower() for error_phrase in ["an error occurred", "please specify", "no search results found"]):
+            if isinstance(search_result, RetrievalFailure):
 
                 logger.info("Falling back to Wikipedia due to search error.")
                 wiki_summary = self.search_wikipedia(query)
@@ -350,13 +564,10 @@ class InfoRetriever:
 
                     wiki_summary = self.scrape_wikipedia_page(query)
 
-                summarized_info = self.summarize_text_local(wiki_summary)
-                if "An error occurred while summarizing" in summarized_info:
-
+                if isinstance(wiki_summary, RetrievalFailure):
                     return wiki_summary
-                else:
-
-                    return summarized_info
+                # Never the raw article: it would crowd the question out of the chat prompt
+                return self.summarize_text_local(wiki_summary, query=query)
             else:
-                summarized_info = self.summarize_text_local(search_result)
+                summarized_info = self.summarize_text_local(search_result, query=query)
                 return summarized_info
\ No newline at end of file
@@ -0,0 +1,75 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+from cancellation import RequestCancelled, check_cancelled
+
+logger = logging.getLogger("Single_Flight")
+
+def normalize_query(text: str) -> str:
+    """
+    Key for de-duplication: case and whitespace differences are ignored. Punctuation is kept, since it
+    can change the meaning ("c++" vs "c", "3.5" vs "3 5").
+    """
+    return " ".join(text.lower().split())
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution; the other callers
+    wait on the leader's future and receive the same result (or exception).
+    The leader's cancellation is its own: followers whose requests are still live run the
+    call again (one of them leading) instead of receiving RequestCancelled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            logger.info(f"[{self.name}] Joined in-flight call; {self.shared} duplicate(s) saved so far.")
+            try:
+                return future.result()
+            except RequestCancelled:
+                check_cancelled()  # Only give up if this caller's own request was cancelled
+                logger.info(f"[{self.name}] Leading call was cancelled; running it again.")
+                return self.do(key, fn, *args, **kwargs)
+
+        # The key is released before followers wake, so any that run the call again start a new flight
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    def _release(self, key):
+        with self.lock:
+            self.calls.pop(key, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.executed + self.shared
+            return {
+                "executed": self.executed,
+                "shared": self.shared,
+                "in_flight": len(self.calls),
+                "saved_ratio": self.shared / total if total else 0.0
+            }
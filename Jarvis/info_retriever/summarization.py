@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+CENTROID_TERMS = 20  # Pseudo-query size when no query is given
+
+_sentence_split = re.compile(r"(?<=[.!?])\s+|\n+")
+_term = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have he her his in is it its of on or she that the their "
+    "they this to was were which who will with what when where how".split()
+)
+
+
+def split_sentences(text: str) -> list:
+    return [sentence.strip() for sentence in _sentence_split.split(text) if sentence and sentence.strip()]
+
+
+def _terms(text: str) -> list:
+    return [term for term in _term.findall(text.lower()) if term not in STOPWORDS]
+
+
+def bm25_scores(sentences: list, query: str = None) -> np.ndarray:
+    """
+    Score each sentence against `query` with BM25, treating sentences as documents.
+    Without a query, the document's most frequent terms act as the query, which favours central sentences.
+    """
+    tokenized = [_terms(sentence) for sentence in sentences]
+    vocabulary = {}
+    rows, cols = [], []
+    for row, terms in enumerate(tokenized):
+        for term in terms:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+    if not vocabulary:
+        return np.zeros(len(sentences))
+
+    tf = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    np.add.at(tf, (np.array(rows), np.array(cols)), 1.0)
+
+    if query:
+        query_columns = [vocabulary[term] for term in set(_terms(query)) if term in vocabulary]
+    else:
+        query_columns = list(np.argsort(-tf.sum(axis=0))[:CENTROID_TERMS])
+    if not query_columns:
+        return np.zeros(len(sentences))
+
+    document_count = len(sentences)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((document_count - df + 0.5) / (df + 0.5) + 1.0)
+    lengths = tf.sum(axis=1, keepdims=True)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+
+    q_tf = tf[:, query_columns]
+    return (idf[query_columns] * q_tf * (BM25_K1 + 1) / (q_tf + norm)).sum(axis=1)
+
+
+def extract_relevant(sentences: list, token_counts: np.ndarray, token_budget: int, query: str = None) -> list:
+    """
+    Keep the highest-scoring sentences that fit in `token_budget`, in their original order.
+    If even the best sentence is over budget, its leading words are kept in proportion to the budget.
+    """
+    if token_counts.sum() <= token_budget:
+        return sentences
+    scores = bm25_scores(sentences, query)
+    # Stable sort so ties keep document order (earlier sentences tend to be more general)
+    order = np.argsort(-scores, kind="stable")
+    fits = np.cumsum(token_counts[order]) <= token_budget
+    keep = np.sort(order[fits])
+    if not len(keep):
+        best = order[0]
+        words = sentences[best].split()
+        return [" ".join(words[:max(1, len(words) * token_budget // int(token_counts[best]))])]
+    return [sentences[i] for i in keep]
+
+
+def chunk_sentences(sentences: list, token_counts: np.ndarray, chunk_budget: int) -> list:
+    """
+    Group consecutive sentences into chunks of at most `chunk_budget` tokens.
+    A single sentence longer than the budget becomes its own chunk.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for sentence, count in zip(sentences, token_counts):
+        if current and current_tokens + count > chunk_budget:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += int(count)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
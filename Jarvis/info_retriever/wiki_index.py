@@ -0,0 +1,247 @@
+import argparse
+import bz2
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ElementTree
+
+try:
+    import mwparserfromhell
+except ImportError:
+    mwparserfromhell = None
+
+logger = logging.getLogger("Wiki_Index")
+
+SUMMARY_SENTENCES = 3  # Matches the live lookup's lead-section summary
+COMMIT_EVERY = 5000
+MATCH_CANDIDATES = 5  # Full-text matches checked for a title that matches the query
+
+_sentence_split = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+_fts_token = re.compile(r"\w+", re.UNICODE)
+
+
+def _strip_nested(text, opener, closer):
+    # Remove balanced {{...}} / {|...|} blocks, which regexes cannot match when nested
+    output = []
+    depth = 0
+    i = 0
+    while i < len(text):
+        if text.startswith(opener, i):
+            depth += 1
+            i += len(opener)
+        elif depth and text.startswith(closer, i):
+            depth -= 1
+            i += len(closer)
+        else:
+            if not depth:
+                output.append(text[i])
+            i += 1
+    return "".join(output)
+
+
+def wikitext_to_plain(wikitext):
+    """
+    Convert wikitext to plain text. Uses mwparserfromhell when installed, else a regex approximation.
+    """
+    text = re.sub(r"<!--.*?-->", "", wikitext, flags=re.S)
+    text = re.sub(r"<ref[^>/]*/>", "", text)
+    text = re.sub(r"<ref[^>]*>.*?</ref>", "", text, flags=re.S)
+    text = _strip_nested(text, "{{", "}}")
+    text = _strip_nested(text, "{|", "|}")
+    text = re.sub(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", "", text, flags=re.I)
+
+    if mwparserfromhell is not None:
+        text = mwparserfromhell.parse(text).strip_code()
+    else:
+        text = re.sub(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]", r"\1", text)
+        text = re.sub(r"\[https?://\S+ ([^\]]*)\]", r"\1", text)
+        text = re.sub(r"'{2,}", "", text)
+        text = re.sub(r"<[^>]+>", "", text)
+
+    text = re.sub(r"^\s*=+\s*(.*?)\s*=+\s*$", r"\n\1\n", text, flags=re.M)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def lead_summary(wikitext, sentences=SUMMARY_SENTENCES):
+    lead = re.split(r"^\s*==", wikitext, maxsplit=1, flags=re.M)[0]
+    plain = " ".join(wikitext_to_plain(lead).split())
+    return " ".join(_sentence_split.split(plain)[:sentences])
+
+
+def _iter_dump(path):
+    """
+    Yield (title, wikitext, redirect_target) for main-namespace pages of a pages-articles XML dump.
+    """
+    opener = bz2.open if path.endswith(".bz2") else open
+    with opener(path, "rb") as stream:
+        title = namespace = redirect = text = None
+        root = None
+        for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+            if root is None:
+                root = element
+            if event == "start":
+                continue
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = element.text
+            elif tag == "ns":
+                namespace = element.text
+            elif tag == "redirect":
+                redirect = element.get("title")
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0":
+                    yield title, text, redirect
+                title = namespace = redirect = text = None
+                root.clear()  # Drop finished pages so memory stays flat over a full dump
+
+
+def _iter_jsonl(path):
+    with open(path, encoding="utf-8") as stream:
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                yield record["title"], record.get("text", ""), record.get("redirect")
+
+
+def build_index(source, db_path, limit=None, titles=None):
+    """
+    Build a local SQLite FTS5 index from a Wikipedia XML dump (.xml or .xml.bz2) or a JSONL
+    file of {"title", "text"[, "redirect"]} records. `titles` restricts ingestion to a subset.
+    """
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.executescript('''
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY,
+            title TEXT UNIQUE COLLATE NOCASE,
+            summary TEXT,
+            content TEXT,
+            disambiguation INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS redirects (
+            title TEXT PRIMARY KEY COLLATE NOCASE,
+            target TEXT
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, summary, content='articles', content_rowid='id'
+        );
+    ''')
+
+    records = _iter_jsonl(source) if source.endswith(".jsonl") else _iter_dump(source)
+    wanted = {title.lower() for title in titles} if titles else None
+    start = time.perf_counter()
+    count = 0
+
+    for title, wikitext, redirect in records:
+        if wanted is not None and title.lower() not in wanted:
+            continue
+        if redirect:
+            c.execute('INSERT OR REPLACE INTO redirects (title, target) VALUES (?, ?)', (title, redirect))
+            continue
+
+        summary = lead_summary(wikitext)
+        disambiguation = title.endswith("(disambiguation)") or "may refer to" in summary
+        c.execute('''
+            INSERT OR REPLACE INTO articles (title, summary, content, disambiguation) VALUES (?, ?, ?, ?)
+        ''', (title, summary, wikitext_to_plain(wikitext), int(disambiguation)))
+
+        count += 1
+        if count % COMMIT_EVERY == 0:
+            conn.commit()
+            logger.info(f"Indexed {count} articles ({count / (time.perf_counter() - start):.0f}/s).")
+        if limit and count >= limit:
+            break
+
+    c.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+    conn.commit()
+    c.execute("INSERT INTO articles_fts(articles_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    logger.info(f"Indexed {count} articles into '{db_path}' in {time.perf_counter() - start:.1f}s.")
+    return count
+
+
+def _title_matches(title, query_tokens):
+    """
+    True when the title's words include every query word ("tower" -> "Eiffel Tower") or the query
+    holds every word of the title ("who was gustave eiffel" -> "Gustave Eiffel").
+    """
+    title_words = {token.lower() for token in _fts_token.findall(title)}
+    query_words = {token.lower() for token in query_tokens}
+    return query_words <= title_words or title_words <= query_words
+
+
+class WikiIndex:
+    """
+    Read-only lookups against an index built by build_index().
+    """
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Wikipedia index '{db_path}' not found.")
+        self.db_path = db_path
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def lookup(self, query):
+        """
+        Return {"title", "summary", "content", "disambiguation"} for the best match, or None.
+        Exact titles and redirects win; otherwise the best BM25 match on title and lead summary whose
+        title matches the query (see _title_matches). An article that only mentions the query terms
+        is a miss, so the caller falls back to the API.
+        """
+        conn = self._connect()
+        try:
+            c = conn.cursor()
+            columns = "title, summary, content, disambiguation"
+            c.execute(f'SELECT {columns} FROM articles WHERE title = ?', (query,))
+            row = c.fetchone()
+            if row is None:
+                c.execute(f'''
+                    SELECT {columns} FROM articles
+                    WHERE title = (SELECT target FROM redirects WHERE title = ?)
+                ''', (query,))
+                row = c.fetchone()
+            if row is None:
+                tokens = _fts_token.findall(query)
+                if not tokens:
+                    return None
+                match = " ".join(f'"{token}"' for token in tokens)
+                c.execute(f'''
+                    SELECT {", ".join("a." + column for column in columns.split(", "))}
+                    FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+                    WHERE articles_fts MATCH ?
+                    ORDER BY bm25(articles_fts, 10.0, 1.0)
+                    LIMIT ?
+                ''', (match, MATCH_CANDIDATES))
+                row = next((candidate for candidate in c.fetchall() if _title_matches(candidate[0], tokens)), None)
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        title, summary, content, disambiguation = row
+        return {"title": title, "summary": summary, "content": content, "disambiguation": bool(disambiguation)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a local Wikipedia index for InfoRetriever.")
+    parser.add_argument("source", help="pages-articles .xml/.xml.bz2 dump or .jsonl file")
+    parser.add_argument("db_path", help="output SQLite database")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many articles")
+    parser.add_argument("--titles", default=None, help="file with one title per line to index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    titles = None
+    if args.titles:
+        with open(args.titles, encoding="utf-8") as f:
+            titles = [line.strip() for line in f if line.strip()]
+    build_index(args.source, args.db_path, limit=args.limit, titles=titles)
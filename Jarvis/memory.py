@@ -1,9 +1,16 @@
 # memory.py
 
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import threading
 import time
+import logging
+import atexit
+from collections import OrderedDict, deque
+import numpy as np
+from memory_index import PartitionedIndex
+
+logger = logging.getLogger("Memory")
 
 DB_PATH = "memory.db"
 
@@ -12,12 +19,61 @@ PERSISTENT_MEMORY_DURATION = None  # Never expire
 SHORT_TERM_MEMORY_DURATION = timedelta(hours=1)  # Retain for 1 hour
 MEMORY_CLEANUP_INTERVAL = 600  # Cleanup every 10 minutes
 
+# Every stored time is UTC in SQLite's CURRENT_TIMESTAMP format, so times and cutoffs compare as strings
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Rolling summary of older conversation turns
+RECENT_TURNS = 4  # Turns kept verbatim in the prompt
+SUMMARY_MIN_NEW_TURNS = 2  # Older turns needed before the summary is refreshed
+SUMMARY_COMPACTION_INTERVAL = 60  # Check for new turns at least once a minute
+
+# Semantic recall; turns and facts stay searchable after short-term rows expire
+RECALL_TOP_K = 3
+RECALL_MIN_SCORE = 0.1  # Cosine similarity below which a memory is considered irrelevant
+MAX_TURN_VECTORS = 100000  # Turn vectors kept for recall; the cleanup evicts the oldest beyond this
+
+# Conversation memory is partitioned by client session
+DEFAULT_SESSION = "default"
+HOT_SESSIONS = 256  # Sessions whose recent turns are kept in in-memory ring buffers
+SESSION_BUFFER_TURNS = 16  # Turns held per ring buffer
+
+# Expired rows are deleted in batches so memory_lock is never held for long
+CLEANUP_BATCH_SIZE = 1000
+
+# Write-behind batching of short-term inserts
+WRITE_BEHIND_MAX_DELAY = 0.5  # Seconds a queued write may wait before it is flushed
+
 # Lock for thread-safe operations
 memory_lock = threading.Lock()
 
-def initialize_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    c = conn.cursor()
+# Wakes the compaction thread when new turns arrive; dirty_sessions names the sessions to compact
+compaction_event = threading.Event()
+dirty_sessions = set()
+
+# Set by enable_semantic_index()
+embedder = None
+semantic_index = None  # Partitioned by ("turn", session_id) and ("fact", None)
+
+# In-process cache of persistent keys; reads and invalidations happen under memory_lock
+persistent_cache = {}
+
+# Short-term rows waiting to be written, and the batches currently being written (one per flush)
+write_condition = threading.Condition()
+pending_writes = []
+in_flight_batches = []
+flush_lock = threading.Lock()  # Flushes run one at a time so rows reach the table in the order they were added
+write_behind_started = False
+
+# session_id -> deque of (command, response, timestamp), least recently used first
+session_buffers = OrderedDict()
+session_lock = threading.Lock()
+
+def _add_column_if_missing(c, table, column, definition):
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _create_tables(c):
     c.execute('''
         CREATE TABLE IF NOT EXISTS persistent_memory (
             key TEXT PRIMARY KEY,
@@ -30,13 +86,73 @@ def initialize_db():
             category TEXT,
             command TEXT,
             response TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id TEXT NOT NULL DEFAULT 'default'
         )
     ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_summary (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT,
+            last_turn_id INTEGER,
+            updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS memory_vectors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            ref TEXT,
+            text TEXT,
+            vector BLOB,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id TEXT
+        )
+    ''')
+
+def _migrate_sessions(c):
+    _add_column_if_missing(c, "short_term_memory", "session_id", "TEXT NOT NULL DEFAULT 'default'")
+    _add_column_if_missing(c, "memory_vectors", "session_id", "TEXT")
+    # The summary used to be a single global row; it is disposable, so rebuild it per session
+    c.execute("PRAGMA table_info(conversation_summary)")
+    if "id" in [row[1] for row in c.fetchall()]:
+        c.execute('DROP TABLE conversation_summary')
+        _create_tables(c)
+
+def _migrate_indexes(c):
+    # Recent turns: WHERE session_id = ? AND category = ? ORDER BY id DESC LIMIT n
+    c.execute('DROP INDEX IF EXISTS idx_short_term_session')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_short_term_session ON short_term_memory (session_id, category, id)')
+    # Expiry: cleanup finds old rows without scanning the table
+    c.execute('CREATE INDEX IF NOT EXISTS idx_short_term_timestamp ON short_term_memory (timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_conversation_summary_updated ON conversation_summary (updated)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_memory_vectors_ref ON memory_vectors (kind, ref)')
+
+# Applied in order; PRAGMA user_version records how many have run. Each must be idempotent.
+SCHEMA_MIGRATIONS = [
+    _migrate_sessions,
+    _migrate_indexes,
+]
+
+def initialize_db():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    c = conn.cursor()
+    # WAL lets readers proceed during the write-behind and cleanup commits
+    c.execute('PRAGMA journal_mode=WAL')
+    _create_tables(c)
+
+    c.execute('PRAGMA user_version')
+    version = c.fetchone()[0]
+    for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        migration(c)
+        c.execute(f'PRAGMA user_version = {number}')
+        logger.info(f"Applied memory schema migration {number} ({migration.__name__}).")
     conn.commit()
     conn.close()
 
 def set_persistent(key, value):
+    text = f"{key.replace('_', ' ')}: {value}"
+    vector = _embed(text)
     with memory_lock:
         conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         c = conn.cursor()
@@ -44,51 +160,422 @@ def set_persistent(key, value):
             INSERT INTO persistent_memory (key, value) VALUES (?, ?)
             ON CONFLICT(key) DO UPDATE SET value=excluded.value
         ''', (key, value))
+        if vector is not None:
+            _index_text(c, "fact", key, text, vector, replace=True)
         conn.commit()
         conn.close()
+        persistent_cache.pop(key, None)
 
 def get_persistent(key):
     with memory_lock:
+        if key in persistent_cache:
+            return persistent_cache[key]
         conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         c = conn.cursor()
         c.execute('SELECT value FROM persistent_memory WHERE key=?', (key,))
         result = c.fetchone()
         conn.close()
-        return result[0] if result else None
+        persistent_cache[key] = result[0] if result else None
+        return persistent_cache[key]
+
+def _turn_vectors(rows):
+    """
+    Embeddings of the conversation turns among `rows` (None for other rows). Call without memory_lock.
+    """
+    return [_embed(format_turn(command, response)) if category == "conversation" else None
+            for category, command, response, _, _ in rows]
+
+def _write_short_term(rows, vectors=None):
+    """
+    Insert (category, command, response, timestamp, session_id) rows in a single transaction, indexing
+    the ones with a vector from _turn_vectors(). Caller holds memory_lock.
+    """
+    vectors = vectors or [None] * len(rows)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    c = conn.cursor()
+    for (category, command, response, timestamp, session_id), vector in zip(rows, vectors):
+        c.execute('''
+            INSERT INTO short_term_memory (category, command, response, timestamp, session_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (category, command, response, timestamp, session_id))
+        if vector is not None:
+            _index_text(c, "turn", str(c.lastrowid), format_turn(command, response), vector, session_id=session_id)
+    conn.commit()
+    conn.close()
+    sessions = {row[4] for row in rows if row[0] == "conversation"}
+    if sessions:
+        dirty_sessions.update(sessions)
+        compaction_event.set()
+
+def utc_timestamp(ago=None):
+    """
+    Current UTC time, or `ago` (a timedelta) before it, formatted as TIMESTAMP_FORMAT.
+    """
+    now = datetime.now(timezone.utc)
+    return (now - ago if ago else now).strftime(TIMESTAMP_FORMAT)
+
+def add_short_term(category, command, response, session_id=DEFAULT_SESSION):
+    # Same format as SQLite's CURRENT_TIMESTAMP, which earlier rows were written with
+    timestamp = utc_timestamp()
+    row = (category, command, response, timestamp, session_id)
+    if category == "conversation":
+        with session_lock:
+            if session_id in session_buffers:
+                session_buffers[session_id].append((command, response, timestamp))
+    if not write_behind_started:
+        vectors = _turn_vectors([row])
+        with memory_lock:
+            _write_short_term([row], vectors)
+        return
+    with write_condition:
+        pending_writes.append(row)
+        write_condition.notify()
+
+def _unflushed_rows():
+    """
+    Rows accepted by add_short_term but not yet committed. Caller holds memory_lock.
+    """
+    with write_condition:
+        return [row for batch in in_flight_batches for row in batch] + pending_writes
 
-def add_short_term(category, command, response):
+def flush_memory():
+    """
+    Write all queued short-term rows now. If the write fails, the rows go back to the front of the
+    queue for the next flush and the error is raised.
+    """
+    with flush_lock:
+        _flush_batch()
+
+def _flush_batch():
+    with write_condition:
+        if not pending_writes:
+            return
+        batch = pending_writes[:]
+        pending_writes.clear()
+        in_flight_batches.append(batch)
+    written = False
+    try:
+        vectors = _turn_vectors(batch)
+        with memory_lock:
+            _write_short_term(batch, vectors)
+        written = True
+    finally:
+        with write_condition:
+            in_flight_batches[:] = [other for other in in_flight_batches if other is not batch]
+            if not written:
+                pending_writes[:0] = batch
+                logger.error(f"Requeued {len(batch)} short-term memory row(s) after a failed flush.")
+    logger.debug(f"Flushed {len(batch)} short-term memory row(s).")
+
+def write_behind_daemon():
+    while True:
+        with write_condition:
+            while not pending_writes:
+                write_condition.wait()
+        # Let a burst of writes accumulate into one transaction
+        time.sleep(WRITE_BEHIND_MAX_DELAY)
+        try:
+            flush_memory()
+        except Exception as e:
+            logger.error(f"Short-term memory flush failed: {e}", exc_info=True)
+
+def start_write_behind():
+    global write_behind_started
+    write_behind_started = True
+    writer_thread = threading.Thread(target=write_behind_daemon, daemon=True)
+    writer_thread.start()
+    atexit.register(flush_memory)
+
+def get_short_term(session_id=DEFAULT_SESSION, category=None):
     with memory_lock:
         conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         c = conn.cursor()
+        cutoff = utc_timestamp(SHORT_TERM_MEMORY_DURATION)
         c.execute('''
-            INSERT INTO short_term_memory (category, command, response) VALUES (?, ?, ?)
-        ''', (category, command, response))
+            SELECT category, command, response, timestamp 
+            FROM short_term_memory 
+            WHERE session_id = ? AND (? IS NULL OR category = ?) AND timestamp >= ?
+            ORDER BY id DESC
+        ''', (session_id, category, category, cutoff))
+        results = c.fetchall()
+        conn.close()
+        unflushed = [row[:4] for row in _unflushed_rows()
+                     if row[4] == session_id and (category is None or row[0] == category)]
+        return unflushed[::-1] + results
+
+def cleanup_short_term():
+    """
+    Delete expired rows in batches of CLEANUP_BATCH_SIZE, releasing memory_lock between batches.
+    """
+    cutoff = utc_timestamp(SHORT_TERM_MEMORY_DURATION)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    c = conn.cursor()
+    c.execute('PRAGMA synchronous=NORMAL')  # Durable enough under WAL; avoids an fsync per batch
+    deleted = 0
+    while True:
+        with memory_lock:
+            c.execute('''
+                DELETE FROM short_term_memory WHERE id IN (
+                    SELECT id FROM short_term_memory WHERE timestamp < ? LIMIT ?
+                )
+            ''', (cutoff, CLEANUP_BATCH_SIZE))
+            batch = c.rowcount
+            conn.commit()
+        deleted += batch
+        if batch < CLEANUP_BATCH_SIZE:
+            break
+        time.sleep(0)  # Give waiting request threads a chance at memory_lock
+    with memory_lock:
+        c.execute('DELETE FROM conversation_summary WHERE updated < ?', (cutoff,))
         conn.commit()
+    evicted = _evict_turn_vectors(conn)
+    conn.close()
+    if deleted:
+        logger.info(f"Cleaned up {deleted} expired short-term memory row(s).")
+    if evicted:
+        logger.info(f"Evicted {evicted} turn vector(s) beyond {MAX_TURN_VECTORS}.")
+    return deleted
+
+def _evict_turn_vectors(conn):
+    """
+    Delete the oldest turn vectors beyond MAX_TURN_VECTORS, from the table and the in-memory index,
+    in batches of CLEANUP_BATCH_SIZE. Facts are never evicted.
+    """
+    c = conn.cursor()
+    evicted = 0
+    while True:
+        with memory_lock:
+            c.execute("SELECT COUNT(*) FROM memory_vectors WHERE kind = 'turn'")
+            excess = c.fetchone()[0] - MAX_TURN_VECTORS
+            if excess <= 0:
+                break
+            c.execute("SELECT id FROM memory_vectors WHERE kind = 'turn' ORDER BY id LIMIT ?",
+                      (min(excess, CLEANUP_BATCH_SIZE),))
+            ids = [item_id for (item_id,) in c.fetchall()]
+            c.execute(f'DELETE FROM memory_vectors WHERE id IN ({",".join("?" * len(ids))})', ids)
+            conn.commit()
+            if semantic_index is not None:
+                for item_id in ids:
+                    semantic_index.remove(item_id)
+        evicted += len(ids)
+        time.sleep(0)
+    if evicted and semantic_index is not None:
+        semantic_index.compact()
+    return evicted
+
+def format_turn(command, response):
+    return f"User: {command} / Assistant: {response}"
+
+def _embed(text):
+    """
+    Embedding of `text` for the semantic index, or None when it is disabled. Call without memory_lock.
+    """
+    if semantic_index is None:
+        return None
+    return np.asarray(embedder(text), dtype=np.float32)
+
+def _index_text(c, kind, ref, text, vector, replace=False, session_id=None):
+    """
+    Store `text` and its embedding in memory_vectors and the in-memory index. Caller holds memory_lock.
+    """
+    if replace:
+        c.execute('SELECT id FROM memory_vectors WHERE kind = ? AND ref = ?', (kind, ref))
+        for (old_id,) in c.fetchall():
+            semantic_index.remove(old_id)
+        c.execute('DELETE FROM memory_vectors WHERE kind = ? AND ref = ?', (kind, ref))
+    c.execute('''
+        INSERT INTO memory_vectors (kind, ref, text, vector, session_id) VALUES (?, ?, ?, ?, ?)
+    ''', (kind, ref, text, vector.tobytes(), session_id))
+    semantic_index.add(c.lastrowid, vector, _partition(kind, session_id))
+
+def _partition(kind, session_id):
+    # Facts are shared by every session
+    return (kind, None if kind == "fact" else session_id)
+
+def enable_semantic_index(embedding_function):
+    """
+    Turn on embedding of turns and facts as they are written, and load previously stored vectors.
+    """
+    global embedder, semantic_index
+    with memory_lock:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        c = conn.cursor()
+        dimensions = len(embedding_function("dimension probe"))
+        index = PartitionedIndex(dimensions)
+        c.execute('SELECT id, kind, vector, session_id FROM memory_vectors ORDER BY id')
+        for item_id, kind, blob, session_id in c.fetchall():
+            vector = np.frombuffer(blob, dtype=np.float32)
+            if vector.shape[0] != dimensions:
+                continue  # Stored with a different embedder; skipped until re-indexed
+            index.add(item_id, vector, _partition(kind, session_id))
         conn.close()
+        embedder = embedding_function
+        semantic_index = index
+    logger.info(f"Semantic memory index enabled with {index.size} stored vectors.")
+
+def recall(query, session_id=DEFAULT_SESSION, k=RECALL_TOP_K, kinds=("turn", "fact"), exclude_texts=()):
+    """
+    Return up to k stored turns/facts most relevant to `query` as (kind, text, score) tuples.
+    Turns are limited to `session_id`; facts are shared. Only those partitions are searched.
+    """
+    if semantic_index is None:
+        return []
+
+    query_vector = embedder(query)
+    partitions = [_partition(kind, session_id) for kind in kinds]
+    hits = semantic_index.search(query_vector, partitions, k + len(exclude_texts))
+    if not hits:
+        return []
 
-def get_short_term():
     with memory_lock:
         conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         c = conn.cursor()
-        cutoff = datetime.now() - SHORT_TERM_MEMORY_DURATION
+        ids = [item_id for item_id, _ in hits]
+        c.execute(
+            f'SELECT id, kind, text FROM memory_vectors WHERE id IN ({",".join("?" * len(ids))})',
+            ids
+        )
+        rows = {item_id: (kind, text) for item_id, kind, text in c.fetchall()}
+        conn.close()
+
+    results = []
+    for item_id, score in hits:
+        if score < RECALL_MIN_SCORE:
+            break
+        if item_id in rows and rows[item_id][1] not in exclude_texts:
+            kind, text = rows[item_id]
+            results.append((kind, text, score))
+    return results[:k]
+
+def _load_session_buffer(session_id):
+    """
+    Read a session's latest turns from the database into a new ring buffer.
+    """
+    with memory_lock:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        c = conn.cursor()
         c.execute('''
-            SELECT category, command, response, timestamp 
-            FROM short_term_memory 
-            WHERE timestamp >= ?
-            ORDER BY timestamp DESC
-        ''', (cutoff,))
+            SELECT command, response, timestamp
+            FROM short_term_memory
+            WHERE session_id = ? AND category = 'conversation'
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (session_id, SESSION_BUFFER_TURNS))
         results = c.fetchall()
         conn.close()
-        return results
+        unflushed = [(cmd, resp, ts) for category, cmd, resp, ts, sid in _unflushed_rows()
+                     if sid == session_id and category == "conversation"]
+        return deque(results[::-1] + unflushed, maxlen=SESSION_BUFFER_TURNS)
 
-def cleanup_short_term():
+def get_recent_conversation(session_id=DEFAULT_SESSION, limit=RECENT_TURNS):
+    """
+    Return the session's last `limit` conversation turns as (command, response) pairs, oldest first.
+    """
+    with session_lock:
+        buffer = session_buffers.get(session_id)
+        if buffer is not None:
+            session_buffers.move_to_end(session_id)
+
+    if buffer is None:
+        buffer = _load_session_buffer(session_id)
+        with session_lock:
+            # Another thread may have loaded (and appended to) it meanwhile; keep theirs
+            buffer = session_buffers.setdefault(session_id, buffer)
+            while len(session_buffers) > HOT_SESSIONS:
+                session_buffers.popitem(last=False)
+
+    cutoff = utc_timestamp(SHORT_TERM_MEMORY_DURATION)
+    with session_lock:
+        turns = [(cmd, resp) for cmd, resp, ts in buffer if ts >= cutoff]
+    return turns[-limit:]
+
+def get_conversation_summary(session_id=DEFAULT_SESSION):
+    with memory_lock:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('SELECT summary FROM conversation_summary WHERE session_id = ?', (session_id,))
+        result = c.fetchone()
+        conn.close()
+        return result[0] if result else ""
+
+def get_conversation_context(session_id=DEFAULT_SESSION):
+    """
+    Return (summary, turns) for the prompt: the rolling summary and every turn it does not cover yet,
+    at least the last RECENT_TURNS. Turns that left the recent window stay here until compaction
+    folds them into the summary, so none drop out of the prompt in between.
+    """
+    cutoff = utc_timestamp(SHORT_TERM_MEMORY_DURATION)
     with memory_lock:
         conn = sqlite3.connect(DB_PATH, check_same_thread=False)
         c = conn.cursor()
-        cutoff = datetime.now() - SHORT_TERM_MEMORY_DURATION
-        c.execute('DELETE FROM short_term_memory WHERE timestamp < ?', (cutoff,))
+        c.execute('SELECT summary, last_turn_id FROM conversation_summary WHERE session_id = ?', (session_id,))
+        row = c.fetchone()
+        summary, last_turn_id = row if row else ("", 0)
+        c.execute('''
+            SELECT COUNT(*)
+            FROM short_term_memory
+            WHERE session_id = ? AND category = 'conversation' AND id > ? AND timestamp >= ?
+        ''', (session_id, last_turn_id, cutoff))
+        unsummarized = c.fetchone()[0]
+        conn.close()
+        unsummarized += sum(1 for category, _, _, ts, sid in _unflushed_rows()
+                            if sid == session_id and category == "conversation" and ts >= cutoff)
+    return summary, get_recent_conversation(session_id, limit=max(RECENT_TURNS, unsummarized))
+
+def compact_conversation(summarizer, session_id=DEFAULT_SESSION):
+    """
+    Fold a session's conversation turns older than the last RECENT_TURNS into its rolling summary.
+    `summarizer(previous_summary, turns)` returns the new summary; it runs without holding memory_lock.
+    """
+    with memory_lock:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('SELECT summary, last_turn_id FROM conversation_summary WHERE session_id = ?', (session_id,))
+        row = c.fetchone()
+        previous_summary, last_turn_id = row if row else ("", 0)
+        cutoff = utc_timestamp(SHORT_TERM_MEMORY_DURATION)
+        c.execute('''
+            SELECT id, command, response
+            FROM short_term_memory
+            WHERE session_id = ? AND category = 'conversation' AND id > ? AND timestamp >= ?
+            ORDER BY id ASC
+        ''', (session_id, last_turn_id, cutoff))
+        rows = c.fetchall()
+        conn.close()
+
+    older = rows[:-RECENT_TURNS] if len(rows) > RECENT_TURNS else []
+    if len(older) < SUMMARY_MIN_NEW_TURNS:
+        return False
+
+    summary = summarizer(previous_summary, [(cmd, resp) for _, cmd, resp in older])
+
+    with memory_lock:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO conversation_summary (session_id, summary, last_turn_id, updated) VALUES (?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                summary=excluded.summary, last_turn_id=excluded.last_turn_id, updated=excluded.updated
+        ''', (session_id, summary, older[-1][0], utc_timestamp()))
         conn.commit()
         conn.close()
+    return True
+
+def summary_compaction_daemon(summarizer):
+    while True:
+        compaction_event.wait(timeout=SUMMARY_COMPACTION_INTERVAL)
+        compaction_event.clear()
+        sessions = list(dirty_sessions)
+        dirty_sessions.difference_update(sessions)
+        for session_id in sessions:
+            try:
+                compact_conversation(summarizer, session_id)
+            except Exception as e:
+                logger.error(f"Conversation compaction failed for session '{session_id}': {e}", exc_info=True)
+
+def start_summary_compaction(summarizer):
+    compaction_thread = threading.Thread(target=summary_compaction_daemon, args=(summarizer,), daemon=True)
+    compaction_thread.start()
 
 def memory_cleanup_daemon():
     while True:
@@ -0,0 +1,251 @@
+# memory_index.py
+
+import hashlib
+import logging
+import re
+import threading
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+logger = logging.getLogger("Memory_Index")
+
+# Switch from brute force to an approximate (HNSW) index once the store is this large
+APPROXIMATE_INDEX_THRESHOLD = 50000
+PARTITION_CAPACITY = 64  # Initial rows per partition; most sessions hold only a few dozen turns
+HASHING_DIMENSIONS = 512
+
+_token_pattern = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder: hashed unigrams and bigrams, L2-normalized.
+    Good enough for keyword-level recall when no sentence embedding model is installed.
+    """
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.dimensions
+
+    def __call__(self, text):
+        tokens = _token_pattern.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if features:
+            np.add.at(vector, [self._bucket(feature) for feature in features], 1.0)
+        return vector
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def __call__(self, text):
+        return self.model.encode(text, convert_to_numpy=True).astype(np.float32)
+
+
+def load_embedder(model_name=None):
+    """
+    Return a sentence-transformers embedder for `model_name` if available, else the hashing embedder.
+    """
+    if model_name:
+        try:
+            embedder = SentenceTransformerEmbedder(model_name)
+            logger.info(f"Loaded embedding model '{model_name}'.")
+            return embedder
+        except Exception as e:
+            logger.warning(f"Could not load embedding model '{model_name}': {e}. Falling back to hashing embedder.")
+    return HashingEmbedder()
+
+
+def normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over normalized vectors.
+    Exact NumPy search by default; an hnswlib index is built once the store passes
+    APPROXIMATE_INDEX_THRESHOLD entries, if hnswlib is installed.
+    """
+
+    def __init__(self, dimensions, approximate_threshold=APPROXIMATE_INDEX_THRESHOLD, capacity=1024):
+        self.dimensions = dimensions
+        self.approximate_threshold = approximate_threshold
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.positions = {}  # id -> row in self.vectors
+        self.size = 0
+        self.hnsw = None
+        self.lock = threading.Lock()
+
+    def _grow(self):
+        capacity = self.vectors.shape[0] * 2
+        self.vectors = np.resize(self.vectors, (capacity, self.dimensions))
+        self.ids = np.resize(self.ids, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.alive = alive
+        if self.hnsw is not None:
+            self.hnsw.resize_index(capacity)
+
+    def _build_hnsw(self):
+        self.hnsw = hnswlib.Index(space="ip", dim=self.dimensions)
+        self.hnsw.init_index(max_elements=self.vectors.shape[0], ef_construction=200, M=16)
+        self.hnsw.add_items(self.vectors[:self.size], np.arange(self.size))
+        for row in np.flatnonzero(~self.alive[:self.size]):
+            self.hnsw.mark_deleted(int(row))
+        self.hnsw.set_ef(64)
+        logger.info(f"Built approximate index over {self.size} vectors.")
+
+    def add(self, item_id, vector):
+        vector = normalize(np.asarray(vector, dtype=np.float32))
+        with self.lock:
+            if self.size == self.vectors.shape[0]:
+                self._grow()
+            row = self.size
+            self.vectors[row] = vector
+            self.ids[row] = item_id
+            self.alive[row] = True
+            self.positions[item_id] = row
+            self.size += 1
+
+            if self.hnsw is not None:
+                self.hnsw.add_items(vector[None, :], [row])
+            elif hnswlib is not None and self.size >= self.approximate_threshold:
+                self._build_hnsw()
+
+    def remove(self, item_id):
+        with self.lock:
+            row = self.positions.pop(item_id, None)
+            if row is None:
+                return
+            self.alive[row] = False
+            if self.hnsw is not None:
+                self.hnsw.mark_deleted(row)
+
+    def compact(self):
+        """
+        Drop removed rows so evicted vectors stop taking memory; rebuilds the approximate index if any.
+        """
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.size])
+            if len(live) == self.size:
+                return
+            capacity = max(self.capacity, 2 * len(live))
+            vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            vectors[:len(live)] = self.vectors[live]
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:len(live)] = self.ids[live]
+            self.vectors, self.ids = vectors, ids
+            self.alive = np.zeros(capacity, dtype=bool)
+            self.alive[:len(live)] = True
+            self.positions = {int(item_id): row for row, item_id in enumerate(ids[:len(live)])}
+            self.size = len(live)
+            self.hnsw = None
+            if hnswlib is not None and self.size >= self.approximate_threshold:
+                self._build_hnsw()
+
+    def search(self, vector, k=5, allowed=None):
+        """
+        Return up to k (id, score) pairs, best first. `allowed` optionally filters ids.
+        """
+        query = normalize(np.asarray(vector, dtype=np.float32))
+        with self.lock:
+            if self.size == 0:
+                return []
+
+            if self.hnsw is not None:
+                # Over-fetch so filtering still leaves k results
+                fetch = min(max(k * 4, k + 10), len(self.positions))
+                rows, distances = self.hnsw.knn_query(query, k=fetch)
+                candidates = zip(rows[0], 1.0 - distances[0])
+            else:
+                scores = self.vectors[:self.size] @ query
+                scores[~self.alive[:self.size]] = -np.inf
+                fetch = min(k * 4 if allowed is not None else k, self.size)
+                top = np.argpartition(-scores, fetch - 1)[:fetch]
+                top = top[np.argsort(-scores[top])]
+                candidates = ((row, scores[row]) for row in top if np.isfinite(scores[row]))
+
+            results = []
+            for row, score in candidates:
+                item_id = int(self.ids[row])
+                if allowed is not None and not allowed(item_id):
+                    continue
+                results.append((item_id, float(score)))
+                if len(results) == k:
+                    break
+            return results
+
+
+class PartitionedIndex:
+    """
+    One VectorIndex per partition (e.g. a session's turns, or the shared facts), so a search only
+    scores the partitions it names and another partition's closer vectors cannot crowd out its results.
+    """
+
+    def __init__(self, dimensions, approximate_threshold=APPROXIMATE_INDEX_THRESHOLD):
+        self.dimensions = dimensions
+        self.approximate_threshold = approximate_threshold
+        self.partitions = {}  # partition -> VectorIndex
+        self.owners = {}  # id -> partition
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        with self.lock:
+            return len(self.owners)
+
+    def add(self, item_id, vector, partition):
+        with self.lock:
+            index = self.partitions.get(partition)
+            if index is None:
+                index = self.partitions[partition] = VectorIndex(
+                    self.dimensions, self.approximate_threshold, capacity=PARTITION_CAPACITY
+                )
+            self.owners[item_id] = partition
+        index.add(item_id, vector)
+
+    def remove(self, item_id):
+        with self.lock:
+            partition = self.owners.pop(item_id, None)
+            index = self.partitions.get(partition)
+        if index is not None:
+            index.remove(item_id)
+
+    def compact(self):
+        """
+        Compact every partition and drop the ones left empty.
+        """
+        with self.lock:
+            partitions = list(self.partitions.items())
+        for partition, index in partitions:
+            index.compact()
+        with self.lock:
+            for partition, index in partitions:
+                if not index.positions and self.partitions.get(partition) is index:
+                    del self.partitions[partition]
+
+    def search(self, vector, partitions, k=5):
+        """
+        Return up to k (id, score) pairs, best first, from the named partitions only.
+        """
+        with self.lock:
+            indexes = [self.partitions[partition] for partition in partitions if partition in self.partitions]
+        hits = [hit for index in indexes for hit in index.search(vector, k)]
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
@@ -0,0 +1,371 @@
+# model_worker.py
+
+import argparse
+import itertools
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener, wait
+
+import torch
+
+from cancellation import CancellationToken, RequestCancelled, current_token
+from structured_logging import setup_logging
+
+logger = logging.getLogger("Model_Worker")
+
+# Token ids travel between processes as packed int32 arrays rather than pickled tensors
+TOKEN_TYPECODE = "i"
+
+WORKER_START_TIMEOUT = 900  # Seconds for every worker to load its model and report ready
+WORKER_POLL_INTERVAL = 1.0
+
+
+def _pack(ids):
+    return array(TOKEN_TYPECODE, ids).tobytes()
+
+
+def _unpack(data):
+    tokens = array(TOKEN_TYPECODE)
+    tokens.frombytes(data)
+    return tokens.tolist()
+
+
+class _WorkerHandle:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.alive = True
+
+
+class ModelWorkerPool:
+    """
+    Serves the LLM from dedicated worker processes so the network front end keeps the GIL to itself.
+    Requests are dispatched to the worker with the fewest requests in flight.
+    """
+
+    def __init__(self, num_workers, model_name, devices=None, draft_model_name=None, token=None,
+                 start_timeout=WORKER_START_TIMEOUT):
+        self.num_workers = num_workers
+        self.model_name = model_name
+        self.devices = devices or ["auto"]
+        self.draft_model_name = draft_model_name
+        self.token = token
+        self.start_timeout = start_timeout
+        self.workers = []
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def start(self):
+        authkey = os.urandom(32)
+        listener = Listener(authkey=authkey)
+        env = dict(os.environ, MODEL_WORKER_AUTHKEY=authkey.hex())
+        if self.token:
+            env["HUGGINGFACE_HUB_TOKEN"] = self.token
+
+        processes = {}
+        for index in range(self.num_workers):
+            device = self.devices[index % len(self.devices)]
+            command = [
+                sys.executable, os.path.abspath(__file__),
+                "--address", listener.address,
+                "--index", str(index),
+                "--device", device,
+                "--model", self.model_name
+            ]
+            if self.draft_model_name:
+                command += ["--draft-model", self.draft_model_name]
+            processes[index] = subprocess.Popen(command, env=env)
+            logger.info(f"Started model worker {index} on device '{device}'.")
+
+        try:
+            self._await_workers(listener, processes)
+        except BaseException:
+            self._terminate(processes)
+            raise
+        finally:
+            listener.close()
+
+    def _await_workers(self, listener, processes):
+        """
+        Wait for every worker to connect and report ready, failing as soon as one exits or reports an
+        error, or once start_timeout has passed.
+        """
+        # Workers connect immediately and report ready once their model is loaded. accept() cannot time
+        # out, so it runs on its own thread while this one watches the processes and the deadline.
+        connections = queue.Queue()
+
+        def accept():
+            for _ in range(self.num_workers):
+                try:
+                    connections.put(listener.accept())
+                except Exception as e:  # Closed listener, failed handshake
+                    connections.put(e)
+                    return
+
+        threading.Thread(target=accept, daemon=True).start()
+        deadline = time.monotonic() + self.start_timeout
+        connected = []
+        while len(self.workers) < self.num_workers:
+            while not connections.empty():
+                item = connections.get_nowait()
+                if isinstance(item, Exception):
+                    raise RuntimeError(f"Model worker failed to connect: {item}") from item
+                connected.append(item)
+
+            for conn in wait(connected, timeout=WORKER_POLL_INTERVAL) if connected else ():
+                connected.remove(conn)
+                try:
+                    status, index = conn.recv()
+                except (EOFError, OSError):
+                    raise RuntimeError("Model worker disconnected before it was ready.")
+                if status != "ready":
+                    raise RuntimeError(f"Model worker {index} failed to start: {status}")
+                worker = _WorkerHandle(index, processes[index], conn)
+                self.workers.append(worker)
+                threading.Thread(target=self._receive_results, args=(worker,), daemon=True).start()
+                logger.info(f"Model worker {index} is ready.")
+            if not connected:
+                time.sleep(WORKER_POLL_INTERVAL if connections.empty() else 0)
+
+            ready = {worker.index for worker in self.workers}
+            for index, process in processes.items():
+                if index not in ready and process.poll() is not None:
+                    raise RuntimeError(f"Model worker {index} exited with code {process.returncode} before it was ready.")
+            if len(self.workers) < self.num_workers and time.monotonic() > deadline:
+                raise TimeoutError(f"Model workers not ready after {self.start_timeout}s "
+                                   f"({len(self.workers)} of {self.num_workers} ready).")
+
+    def _terminate(self, processes):
+        for worker in self.workers:
+            worker.conn.close()
+        self.workers = []
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        logger.error("Model workers terminated after a failed start.")
+
+    def _receive_results(self, worker):
+        while True:
+            try:
+                request_id, output, error = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = worker.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error == "cancelled":
+                future.set_exception(RequestCancelled("cancelled"))
+            elif error:
+                future.set_exception(RuntimeError(f"Model worker {worker.index}: {error}"))
+            else:
+                future.set_result(_unpack(output))
+
+        logger.error(f"Model worker {worker.index} disconnected.")
+        with self.lock:
+            worker.alive = False
+            pending = list(worker.pending.values())
+            worker.pending.clear()
+        for future in pending:
+            future.set_exception(RuntimeError(f"Model worker {worker.index} exited."))
+
+    def submit(self, input_ids, attention_mask=None, cancel_token=None, **generate_kwargs):
+        future = Future()
+        with self.lock:
+            alive = [worker for worker in self.workers if worker.alive]
+            if not alive:
+                raise RuntimeError("No model workers are available.")
+            worker = min(alive, key=lambda w: len(w.pending))
+            request_id = next(self.request_ids)
+            worker.pending[request_id] = future
+
+        mask = _pack(attention_mask) if attention_mask is not None else None
+        with worker.send_lock:
+            worker.conn.send((request_id, _pack(input_ids), mask, generate_kwargs))
+        if cancel_token is not None:
+            cancel_token.on_cancel(lambda: self._cancel(worker, request_id))
+        return future
+
+    def _cancel(self, worker, request_id):
+        with self.lock:
+            if request_id not in worker.pending:
+                return
+        try:
+            with worker.send_lock:
+                worker.conn.send(("cancel", request_id))
+        except OSError:
+            pass
+
+    def generate(self, input_ids, attention_mask=None, cancel_token=None, **generate_kwargs):
+        return self.submit(input_ids, attention_mask, cancel_token, **generate_kwargs).result()
+
+    def shutdown(self):
+        for worker in self.workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self.workers:
+            try:
+                worker.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Model worker {worker.index} did not exit; killing it.")
+                worker.process.kill()
+                worker.process.wait()
+        logger.info("Model workers shut down.")
+
+
+class RemoteModel:
+    """
+    Stand-in for the in-process model: exposes .device and .generate() backed by a ModelWorkerPool.
+    Cancelling the current request stops the generation inside the worker.
+    """
+
+    remote = True  # generation.generate leaves stopping criteria to the worker
+
+    def __init__(self, pool, assisted=False, label="generate"):
+        self.pool = pool
+        self.assisted = assisted  # Workers use their own draft model when set
+        self.label = label
+        self.device = torch.device("cpu")  # Tokenized inputs stay on the CPU until they reach a worker
+
+    def generate(self, input_ids, attention_mask=None, **generate_kwargs):
+        mask = attention_mask[0].tolist() if attention_mask is not None else None
+        output = self.pool.generate(
+            input_ids[0].tolist(),
+            mask,
+            cancel_token=current_token.get(),
+            assisted=self.assisted,
+            label=self.label,
+            **generate_kwargs
+        )
+        return torch.tensor([output], dtype=torch.long)
+
+
+def worker_main(address, index, device, model_name, draft_model_name=None):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from generation import generate, load_draft_model
+
+    authkey = bytes.fromhex(os.environ["MODEL_WORKER_AUTHKEY"])
+    token = os.getenv("HUGGINGFACE_HUB_TOKEN")
+    conn = Client(address, authkey=authkey)
+
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float16,
+            device_map=device,
+            low_cpu_mem_usage=True,
+            use_auth_token=token,
+            use_safetensors=False
+        )
+        model.eval()
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True, use_auth_token=token)
+        draft_model = load_draft_model(draft_model_name, model, token=token) if draft_model_name else None
+    except Exception as e:
+        logger.critical(f"Worker {index} failed to load model: {e}", exc_info=True)
+        conn.send((repr(e), index))
+        return
+
+    conn.send(("ready", index))
+
+    # A reader thread takes requests off the connection so cancellations arrive mid-generation
+    requests = queue.Queue()
+    tokens = {}
+    tokens_lock = threading.Lock()
+
+    def read_requests():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = None
+            if message is None:
+                requests.put(None)
+                return
+            if message[0] == "cancel":
+                with tokens_lock:
+                    cancel_token = tokens.get(message[1])
+                if cancel_token is not None:
+                    cancel_token.cancel()
+                continue
+            with tokens_lock:
+                tokens[message[0]] = CancellationToken()
+            requests.put(message)
+
+    threading.Thread(target=read_requests, daemon=True).start()
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+
+        request_id, ids, mask, generate_kwargs = message
+        with tokens_lock:
+            cancel_token = tokens[request_id]
+        current_token.set(cancel_token)
+        try:
+            cancel_token.raise_if_cancelled()
+            input_ids = torch.tensor([_unpack(ids)], dtype=torch.long, device=model.device)
+            if mask is not None:
+                attention_mask = torch.tensor([_unpack(mask)], dtype=torch.long, device=model.device)
+            else:
+                attention_mask = torch.ones_like(input_ids)
+            assisted = generate_kwargs.pop("assisted", False)
+            label = generate_kwargs.pop("label", "generate")
+
+            with torch.no_grad():
+                output_ids = generate(
+                    model,
+                    draft_model=draft_model if assisted else None,
+                    label=f"{label}/worker-{index}",
+                    tokenizer=tokenizer,
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    **generate_kwargs
+                )
+            conn.send((request_id, _pack(output_ids[0].tolist()), None))
+        except RequestCancelled:
+            logger.info(f"Worker {index} cancelled request {request_id}.")
+            conn.send((request_id, None, "cancelled"))
+        except Exception as e:
+            logger.error(f"Worker {index} failed request {request_id}: {e}", exc_info=True)
+            conn.send((request_id, None, repr(e)))
+        finally:
+            with tokens_lock:
+                tokens.pop(request_id, None)
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jarvis LLM worker process")
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--index", type=int, required=True)
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--draft-model", default=None)
+    args = parser.parse_args()
+
+    setup_logging(
+        fmt=f'%(asctime)s - worker {args.index} - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    worker_main(args.address, args.index, args.device, args.model, args.draft_model)
@@ -0,0 +1,147 @@
+# sanitizer.py
+
+import re
+from collections import deque
+from functools import lru_cache
+
+# Same ranges sanitize_response has always stripped; every match is a single code point,
+# so chunks can be cleaned independently
+EMOJI_PATTERN = re.compile("["
+                           u"\U0001F600-\U0001F64F"  # Emoticons
+                           u"\U0001F300-\U0001F5FF"  # Symbols & Pictographs
+                           u"\U0001F680-\U0001F6FF"  # Transport & Map Symbols
+                           u"\U0001F1E0-\U0001F1FF"  # Flags
+                           u"\U00002702-\U000027B0"
+                           u"\U000024C2-\U0001F251"
+                           "]+", flags=re.UNICODE)
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over the cut-off phrases, flattened into a DFA so each character
+    costs one dict lookup. Characters outside the phrases' alphabet go back to the root.
+    Whole texts are cut with `pattern` instead: the leftmost match of the alternation is the same
+    cut, and the regex engine scans in C.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = tuple(phrase for phrase in phrases if phrase)
+        self.pattern = re.compile("|".join(map(re.escape, self.phrases))) if self.phrases else None
+        goto = [{}]
+        self.depth = [0]
+        self.match_length = [0]  # Longest phrase ending at each state
+
+        for phrase in self.phrases:
+            state = 0
+            for char in phrase:
+                if char not in goto[state]:
+                    goto.append({})
+                    self.depth.append(self.depth[state] + 1)
+                    self.match_length.append(0)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            self.match_length[state] = max(self.match_length[state], len(phrase))
+
+        # Breadth-first: each state's transitions are its own edges layered over its failure state's
+        fail = [0] * len(goto)
+        self.delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.match_length[state] = max(self.match_length[state], self.match_length[fail[state]])
+            transitions = dict(self.delta[fail[state]])
+            for char, target in goto[state].items():
+                fail[target] = self.delta[fail[state]].get(char, 0) if state else 0
+                transitions[char] = target
+                queue.append(target)
+            self.delta[state] = transitions
+
+
+@lru_cache(maxsize=32)
+def compile_phrases(phrases):
+    return PhraseAutomaton(phrases)
+
+
+class StreamingSanitizer:
+    """
+    Sanitizes a reply as it is generated. feed() returns the text that is safe to emit: emojis
+    removed, with any tail that could still become a cut-off phrase held back. The cut is where
+    sanitize() cuts, at the earliest-starting phrase: when a phrase completes, a longer one that
+    started before it may still be in progress, so `stopped` is only set once no phrase can start
+    earlier. Everything from the cut on is dropped.
+    """
+
+    def __init__(self, phrases):
+        self.automaton = compile_phrases(tuple(phrases))
+        self.state = 0
+        self.pending = ""
+        self.consumed = 0  # Characters fed so far
+        self.cut = None  # Start of the earliest complete phrase, counted in characters fed
+        self.raw_parts = []
+        self.stopped = False
+
+    def feed(self, chunk):
+        if self.stopped:
+            return ""
+        delta = self.automaton.delta
+        match_length = self.automaton.match_length
+        depth = self.automaton.depth
+        state = self.state
+        base = self.consumed
+        for index, char in enumerate(chunk):
+            state = delta[state].get(char, 0)
+            position = base + index + 1
+            if match_length[state]:
+                start = position - match_length[state]
+                if self.cut is None or start < self.cut:
+                    self.cut = start
+            # depth[state] characters may be the start of a phrase still in progress
+            if self.cut is not None and position - depth[state] >= self.cut:
+                return self._stop(self.pending + chunk[:index + 1], position)
+
+        self.state = state
+        self.consumed = base + len(chunk)
+        raw = self.pending + chunk
+        hold = depth[state]  # Always reaches back to self.cut, if set
+        self.pending = raw[len(raw) - hold:] if hold else ""
+        return self._emit(raw[:len(raw) - hold])
+
+    def finish(self):
+        if self.stopped:
+            return ""
+        if self.cut is not None:
+            return self._stop(self.pending, self.consumed)
+        raw, self.pending = self.pending, ""
+        return self._emit(raw)
+
+    def _stop(self, raw, end):
+        # `raw` is the unemitted text ending `end` characters into the stream
+        self.stopped = True
+        self.pending = ""
+        return self._emit(raw[:len(raw) - (end - self.cut)])
+
+    def _emit(self, raw):
+        if not raw:
+            return raw
+        self.raw_parts.append(raw)
+        return EMOJI_PATTERN.sub('', raw)
+
+    @property
+    def text(self):
+        """
+        The sanitized reply so far, exactly as sanitize_response has always produced it:
+        a cut reply is stripped before emojis are removed.
+        """
+        raw = "".join(self.raw_parts)
+        return EMOJI_PATTERN.sub('', raw.strip() if self.stopped else raw)
+
+
+def sanitize(text, phrases):
+    """
+    One-shot sanitizing: cut at the first cut-off phrase and remove emojis.
+    """
+    pattern = compile_phrases(tuple(phrases)).pattern
+    match = pattern.search(text) if pattern else None
+    if match:
+        text = text[:match.start()].strip()
+    return EMOJI_PATTERN.sub('', text)
@@ -0,0 +1,114 @@
+# scheduler.py
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from cancellation import RequestCancelled, current_token
+
+logger = logging.getLogger("Scheduler")
+
+# Priority classes, most urgent first
+PRIORITY_CONTROL = 0  # Greetings and control commands
+PRIORITY_DIRECT = 1  # Answers that skip the LLM
+PRIORITY_CHAT = 2  # LLM replies
+PRIORITY_SUMMARY = 3  # Retrieval plus summarization
+PRIORITY_NAMES = ["control", "direct", "chat", "summary"]
+
+STATS_LOG_INTERVAL = 50  # Log queue-wait statistics every N jobs
+
+
+class RequestScheduler:
+    """
+    Runs requests on a fixed set of worker threads, most urgent class first.
+    `reserved_workers` only take control and direct jobs, so a cheap request never waits
+    behind a long generation.
+    """
+
+    def __init__(self, workers=1, reserved_workers=1):
+        self.queues = [deque() for _ in PRIORITY_NAMES]
+        self.condition = threading.Condition()
+        self.wait_totals = [0.0] * len(PRIORITY_NAMES)
+        self.wait_max = [0.0] * len(PRIORITY_NAMES)
+        self.counts = [0] * len(PRIORITY_NAMES)
+        self.cancelled = 0
+        self.completed = 0
+
+        for index in range(workers):
+            self._start_worker(f"scheduler-{index}", PRIORITY_SUMMARY)
+        for index in range(reserved_workers):
+            self._start_worker(f"scheduler-reserved-{index}", PRIORITY_DIRECT)
+
+    def _start_worker(self, name, lowest_priority):
+        thread = threading.Thread(target=self._worker, args=(lowest_priority,), name=name, daemon=True)
+        thread.start()
+
+    def submit(self, priority, fn, *args, token=None, **kwargs):
+        future = Future()
+        # Jobs run in the submitter's context, so request-scoped variables (e.g. the log request ID) follow them
+        context = contextvars.copy_context()
+        with self.condition:
+            self.queues[priority].append((time.perf_counter(), future, token, context, fn, args, kwargs))
+            self.condition.notify_all()
+        return future
+
+    def _next_job(self, lowest_priority):
+        # Caller holds self.condition
+        for priority in range(lowest_priority + 1):
+            if self.queues[priority]:
+                return priority, self.queues[priority].popleft()
+        return None, None
+
+    def _worker(self, lowest_priority):
+        while True:
+            with self.condition:
+                priority, job = self._next_job(lowest_priority)
+                while job is None:
+                    self.condition.wait()
+                    priority, job = self._next_job(lowest_priority)
+
+            enqueued, future, token, context, fn, args, kwargs = job
+            self._record_wait(priority, time.perf_counter() - enqueued)
+
+            if token is not None and token.cancelled:
+                with self.condition:
+                    self.cancelled += 1
+                future.set_exception(RequestCancelled(token.reason))
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            context.run(current_token.set, token)
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except RequestCancelled as e:
+                with self.condition:
+                    self.cancelled += 1
+                future.set_exception(e)
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _record_wait(self, priority, waited):
+        with self.condition:
+            self.counts[priority] += 1
+            self.wait_totals[priority] += waited
+            self.wait_max[priority] = max(self.wait_max[priority], waited)
+            self.completed += 1
+            should_log = self.completed % STATS_LOG_INTERVAL == 0
+        if should_log:
+            logger.info(f"Queue wait by class: {self.stats()}")
+
+    def stats(self):
+        with self.condition:
+            return {
+                name: {
+                    "jobs": self.counts[i],
+                    "mean_wait_ms": 1000 * self.wait_totals[i] / self.counts[i] if self.counts[i] else 0.0,
+                    "max_wait_ms": 1000 * self.wait_max[i],
+                    "queued": len(self.queues[i])
+                }
+                for i, name in enumerate(PRIORITY_NAMES)
+            } | {"cancelled": self.cancelled}
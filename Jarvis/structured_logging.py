@@ -0,0 +1,225 @@
+# structured_logging.py
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - [%(request_id)s +%(elapsed_ms)dms] %(message)s'
+
+# High-frequency categories (set with extra={"category": ...}): fraction of records kept, and the
+# most records per second let through. Warnings and errors are never dropped.
+# Override with e.g. LOG_SAMPLE_RATES="audio_read=0.01,prompt=1" and LOG_RATE_LIMITS="payload=10".
+DEFAULT_SAMPLE_RATES = {"audio_read": 0.01, "prompt": 0.1, "payload": 0.25}
+DEFAULT_RATE_LIMITS = {"audio_read": 1.0, "payload": 5.0}
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+request_start_var = contextvars.ContextVar("request_start", default=None)
+
+# Anything else on a record came from `extra` and is written out as a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "elapsed_ms", "category", "taskName"
+}
+
+
+@contextmanager
+def request_context(request_id=None):
+    """
+    Tag every record logged inside the block (and in contexts copied from it) with a request ID
+    and the milliseconds elapsed since the block started.
+    """
+    request_id = request_id or uuid.uuid4().hex[:8]
+    id_token = request_id_var.set(request_id)
+    start_token = request_start_var.set(time.perf_counter())
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(id_token)
+        request_start_var.reset(start_token)
+
+
+def elapsed_ms():
+    start = request_start_var.get()
+    return 0.0 if start is None else 1000 * (time.perf_counter() - start)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Attached to the queue handler, so it runs in the calling thread where the request's
+    context variables are visible.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.elapsed_ms = elapsed_ms()
+        if not hasattr(record, "category"):
+            record.category = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps every Nth record of a sampled category and caps each rate-limited category with a token
+    bucket. The next record let through carries `suppressed`, the number dropped since the last one.
+    """
+
+    def __init__(self, sample_rates=None, rate_limits=None):
+        super().__init__()
+        self.every = {
+            category: round(1 / rate) if rate > 0 else 0
+            for category, rate in (sample_rates or {}).items() if rate < 1
+        }
+        self.rate_limits = dict(rate_limits or {})
+        self.counters = defaultdict(int)
+        self.buckets = {}
+        self.suppressed = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        category = getattr(record, "category", None)
+        if category is None or record.levelno >= logging.WARNING:
+            return True
+        with self.lock:
+            keep = True
+            every = self.every.get(category)
+            if every is not None:
+                keep = every > 0 and self.counters[category] % every == 0
+                self.counters[category] += 1
+            limit = self.rate_limits.get(category)
+            if keep and limit:
+                now = time.monotonic()
+                tokens, last = self.buckets.get(category, (max(limit, 1.0), now))
+                tokens = min(max(limit, 1.0), tokens + (now - last) * limit)
+                keep = tokens >= 1.0
+                self.buckets[category] = (tokens - 1.0 if keep else tokens, now)
+            if not keep:
+                self.suppressed[category] += 1
+                return False
+            suppressed = self.suppressed.pop(category, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Text lines with `extra` fields appended as key=value, or one JSON object per line.
+    """
+
+    def __init__(self, fmt=DEFAULT_FORMAT, json_lines=False):
+        super().__init__(fmt)
+        self.json_lines = json_lines
+
+    def _fields(self, record):
+        return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
+        fields = self._fields(record)
+        if record.category:
+            fields = {"category": record.category, **fields}
+        if fields:
+            text += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+    def format(self, record):
+        if not self.json_lines:
+            return super().format(record)
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "elapsed_ms": round(getattr(record, "elapsed_ms", 0.0), 1),
+            "category": getattr(record, "category", None),
+            "message": record.getMessage(),
+            **self._fields(record)
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock QueueHandler formats and copies every record in the caller so it can be pickled.
+    The listener here is in the same process, so only the message is merged (the arguments may be
+    mutated after the call) and formatting, tracebacks included, is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _parse_rates(value, defaults):
+    rates = dict(defaults)
+    for item in filter(None, (value or "").split(",")):
+        category, _, rate = item.partition("=")
+        rates[category.strip()] = float(rate)
+    return rates
+
+
+def stop_listener(listener):
+    """
+    Flush and stop a listener from setup_logging; safe to call more than once.
+    """
+    try:
+        listener.stop()
+    except AttributeError:  # Already stopped
+        pass
+
+
+def setup_logging(filename=None, level=logging.DEBUG, fmt=DEFAULT_FORMAT, filemode='a', json_lines=None,
+                  sample_rates=None, rate_limits=None, caller_info=None):
+    """
+    Route all logging through a queue: callers only filter and enqueue, and a listener thread
+    does the formatting and file I/O. Replaces any handlers already on the root logger.
+    Set LOG_FORMAT=json for JSON lines. Unless caller_info is set (or LOG_CALLER_INFO=1), records skip
+    the source file/line and thread/process lookups (none are in the default format), which is most
+    of what a record costs the caller before it can be sampled out. These are logging module globals,
+    so this affects every logger and handler in the process, not only the ones set up here.
+    """
+    if caller_info is None:
+        caller_info = os.getenv("LOG_CALLER_INFO") == "1"
+    if not caller_info:
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
+    if json_lines is None:
+        json_lines = os.getenv("LOG_FORMAT") == "json"
+    if sample_rates is None:
+        sample_rates = _parse_rates(os.getenv("LOG_SAMPLE_RATES"), DEFAULT_SAMPLE_RATES)
+    if rate_limits is None:
+        rate_limits = _parse_rates(os.getenv("LOG_RATE_LIMITS"), DEFAULT_RATE_LIMITS)
+
+    target = logging.FileHandler(filename, mode=filemode) if filename else logging.StreamHandler()
+    target.setFormatter(StructuredFormatter(fmt, json_lines))
+
+    log_queue = queue.SimpleQueue()
+    handler = InProcessQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rates, rate_limits))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, target)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
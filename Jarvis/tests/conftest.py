@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other as top-level names (the server runs from this directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+import io
+import socket
+import wave
+
+import audio_transport
+from audio_transport import decodable_codecs, decode_to_wav, negotiate, pack_header, read_response
+
+
+class FakeSoundfile:
+    def __init__(self, subtypes, formats):
+        self.subtypes = subtypes
+        self.formats = formats
+
+    def available_subtypes(self, format):
+        return self.subtypes
+
+    def available_formats(self):
+        return self.formats
+
+
+def test_negotiation_prefers_the_cheapest_offered_codec():
+    assert negotiate(["pcm", "mp3", "opus"]) == ("opus", 16000)
+    assert negotiate(["pcm", "mp3"]) == ("mp3", 16000)
+    assert negotiate(["pcm"]) == ("pcm", 16000)
+    assert negotiate(["flac", "wav"]) == (None, None)
+
+
+def test_negotiation_picks_the_highest_rate_not_above_the_request():
+    assert negotiate(["opus"], 44100) == ("opus", 24000)
+    assert negotiate(["pcm"], 8000) == ("pcm", 8000)
+    assert negotiate(["opus"], 8000) == ("opus", 16000)  # Nothing fits, so the lowest supported rate
+
+
+def test_clients_offer_only_codecs_they_can_decode(monkeypatch):
+    monkeypatch.setattr(audio_transport, "sf", FakeSoundfile({"OPUS": "Opus"}, {"MP3": "MPEG"}))
+    assert decodable_codecs() == ["opus", "mp3", "pcm"]
+
+    monkeypatch.setattr(audio_transport, "sf", FakeSoundfile({"VORBIS": "Vorbis"}, {"MP3": "MPEG"}))
+    assert decodable_codecs() == ["mp3", "pcm"]
+    assert negotiate(decodable_codecs()) == ("mp3", 16000)
+
+    monkeypatch.setattr(audio_transport, "sf", None)
+    assert decodable_codecs() == ["pcm"]
+    assert negotiate(decodable_codecs()) == ("pcm", 16000)
+
+
+def test_negotiated_reply_round_trips_as_wav():
+    pcm = bytes(range(256)) * 4
+    server, client = socket.socketpair()
+    try:
+        server.sendall(pack_header("pcm", 24000, len(pcm)) + pcm)
+        header, payload = read_response(client)
+    finally:
+        server.close()
+        client.close()
+
+    assert header == {"codec": "pcm", "sample_rate": 24000, "size": len(pcm)}
+    with wave.open(io.BytesIO(decode_to_wav(header["codec"], payload, header["sample_rate"]))) as wav:
+        assert wav.getframerate() == 24000
+        assert wav.getnchannels() == 1
+        assert wav.readframes(wav.getnframes()) == pcm
+
+
+def test_empty_reply_reads_as_nothing():
+    server, client = socket.socketpair()
+    server.close()
+    try:
+        assert read_response(client) == (None, b"")
+    finally:
+        client.close()
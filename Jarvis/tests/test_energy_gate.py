@@ -0,0 +1,82 @@
+import numpy as np
+
+from energy_gate import EnergyGate
+
+FRAME = 160  # 10 ms at 16 kHz
+QUIET = 100  # About -50 dBFS
+LOUD = 8000
+
+
+def make_gate(**kwargs):
+    # 3 frames of look-back, 5 of hangover
+    return EnergyGate(FRAME, lookback_ms=30, hangover_ms=50, **kwargs)
+
+
+def block(*levels):
+    """
+    One frame per level; every frame holds a constant sample value, so frames can be told apart.
+    """
+    return np.repeat(np.array(levels, dtype=np.int16), FRAME).tobytes()
+
+
+def levels(frames):
+    return [int(frame[0]) for frame in frames]
+
+
+def quiet(count, start=0):
+    return [QUIET + start + i for i in range(count)]
+
+
+def test_steady_noise_is_gated_out():
+    gate = make_gate()
+
+    for _ in range(5):
+        assert len(gate.process(block(*quiet(20)))) == 0
+    assert gate.frames_seen == 100
+    assert gate.pass_ratio == 0.0
+
+
+def test_frames_must_clear_the_noise_floor_by_the_margin():
+    gate = make_gate(margin_db=9.0)
+    gate.process(block(*quiet(10)))
+
+    below = round(QUIET * 10 ** (8 / 20))
+    above = round(QUIET * 10 ** (10 / 20))
+    assert len(gate.process(block(QUIET, below, QUIET))) == 0
+    assert above in levels(gate.process(block(QUIET, above, QUIET)))
+
+
+def test_quiet_room_does_not_open_below_min_speech_level():
+    gate = make_gate(min_speech_db=-55.0)
+    gate.process(block(*[1] * 10))  # About -90 dBFS
+
+    assert len(gate.process(block(1, 33, 1))) == 0  # 30 dB above the floor but still about -60 dBFS
+    assert levels(gate.process(block(1, 100, 1))) == [33, 1, 1, 100, 1]  # With look-back into the last block
+
+
+def test_gate_passes_lookback_and_hangover_around_a_loud_frame():
+    gate = make_gate()
+    frames = quiet(5) + [LOUD] + quiet(10, start=5)
+
+    passed = levels(gate.process(block(*frames)))
+
+    assert passed == frames[2:11]  # 3 frames before, the loud one, 5 after
+    assert len(gate.process(block(*quiet(10, start=20)))) == 0
+
+
+def test_hangover_and_lookback_carry_across_blocks():
+    gate = make_gate()
+    gate.process(block(*quiet(10)))
+
+    # Look-back reaches into the previous block
+    assert levels(gate.process(block(QUIET + 50, LOUD))) == [QUIET + 8, QUIET + 9, QUIET + 50, LOUD]
+    # Hangover continues into the next one
+    assert levels(gate.process(block(*quiet(8, start=20)))) == quiet(5, start=20)
+    assert gate.frames_passed == 9
+
+
+def test_partial_frames_are_ignored():
+    gate = make_gate()
+
+    assert len(gate.process(block(QUIET)[:FRAME])) == 0
+    assert gate.frames_seen == 0
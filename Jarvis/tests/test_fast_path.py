@@ -0,0 +1,17 @@
+from fast_path import FastPath
+
+
+def test_deterministic_answer_is_served():
+    fast_path = FastPath()
+    assert fast_path.answer("weather", "The current weather in Paris is clear sky.") == \
+        "The current weather in Paris is clear sky."
+
+
+def test_failed_retrieval_falls_through_to_the_model():
+    fast_path = FastPath()
+    assert fast_path.answer("weather", "Weather data not found for 'Atlantis'.", failed=True) is None
+    assert fast_path.stats()["served"] == 0
+
+
+def test_non_deterministic_intent_is_not_served():
+    assert FastPath().answer("search", "Some search results") is None
@@ -0,0 +1,120 @@
+import contextvars
+import logging
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import generation
+from cancellation import CancellationToken, RequestCancelled, current_token
+from generation import SanitizerCriteria, generate, load_draft_model, record_wasted_tokens, reply_token_budget
+from sanitizer import StreamingSanitizer
+
+
+class LetterTokenizer:
+    """Decodes token i as the i-th character of a fixed alphabet."""
+
+    alphabet = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789."
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(self.alphabet[int(i) % len(self.alphabet)] for i in ids)
+
+
+def tiny_model(seed, layers=2, vocab_size=64):
+    torch.manual_seed(seed)
+    config = transformers.LlamaConfig(
+        vocab_size=vocab_size, hidden_size=32, intermediate_size=64, num_hidden_layers=layers,
+        num_attention_heads=2, num_key_value_heads=2, max_position_embeddings=128,
+        pad_token_id=0, bos_token_id=1, eos_token_id=2,
+    )
+    return transformers.LlamaForCausalLM(config).eval()
+
+
+def prompt():
+    input_ids = torch.tensor([[1, 5, 6, 7]])
+    return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+
+def run_with_token(token, fn, *args, **kwargs):
+    context = contextvars.copy_context()
+    context.run(current_token.set, token)
+    return context.run(fn, *args, **kwargs)
+
+
+def test_assisted_greedy_output_matches_plain_generation(caplog):
+    model = tiny_model(0)
+    draft_model = tiny_model(1, layers=1)
+
+    plain = generate(model, **prompt(), max_new_tokens=12, min_new_tokens=12, do_sample=False)
+    with caplog.at_level(logging.INFO, logger="Generation"):
+        assisted = generate(model, draft_model=draft_model, label="test", **prompt(),
+                            max_new_tokens=12, min_new_tokens=12, do_sample=False)
+
+    assert torch.equal(plain, assisted)
+    assert any("[test] Assisted generation: 12 tokens" in r.getMessage() for r in caplog.records)
+
+
+def test_draft_model_with_another_vocabulary_is_rejected(monkeypatch):
+    model = tiny_model(0)
+    monkeypatch.setattr(transformers.AutoModelForCausalLM, "from_pretrained",
+                        lambda *args, **kwargs: tiny_model(1, layers=1, vocab_size=32))
+
+    assert load_draft_model("tiny-draft", model) is None
+
+
+def test_cancelled_request_stops_generation():
+    model = tiny_model(0)
+    token = CancellationToken()
+    token.cancel("client disconnected")
+
+    with pytest.raises(RequestCancelled):
+        run_with_token(token, generate, model, **prompt(), max_new_tokens=50, do_sample=False)
+
+
+def test_generation_stops_once_a_stop_phrase_completes():
+    model = tiny_model(0)
+    tokenizer = LetterTokenizer()
+    full = generate(model, **prompt(), max_new_tokens=20, min_new_tokens=20, do_sample=False)
+    reply = tokenizer.decode(full[0, 4:])
+
+    stopped = generate(model, stop_phrases=[reply[3:6]], tokenizer=tokenizer, **prompt(),
+                       max_new_tokens=20, min_new_tokens=20, do_sample=False)
+
+    # The phrase is only seen after its last token, so generation ends there rather than at its start
+    assert tokenizer.decode(stopped[0, 4:]) == reply[:6]
+
+
+def test_sanitizer_criteria_waits_for_incomplete_characters():
+    class ByteTokenizer:
+        def decode(self, ids, skip_special_tokens=True):
+            return bytes(int(i) for i in ids).decode("utf-8", errors="replace")
+
+    criteria = SanitizerCriteria(StreamingSanitizer(["é!"]), ByteTokenizer(), prompt_length=0)
+    encoded = list("é!".encode("utf-8"))
+
+    assert not criteria(torch.tensor([encoded[:1]]), None)
+    assert criteria.decoded_length == 0
+    assert not criteria(torch.tensor([encoded[:2]]), None)
+    assert criteria(torch.tensor([encoded]), None)
+
+
+def test_reply_token_budget_covers_the_character_limit():
+    assert reply_token_budget(350) == 100
+    assert reply_token_budget(351) == 101
+    assert reply_token_budget(0) == 0
+
+
+def test_wasted_tokens_are_totalled_per_label(monkeypatch, caplog):
+    monkeypatch.setattr(generation, "_waste", {})
+    monkeypatch.setattr(generation, "WASTE_LOG_INTERVAL", 3)
+
+    with caplog.at_level(logging.INFO, logger="Generation"):
+        record_wasted_tokens("chat", 100, 60)
+        record_wasted_tokens("chat", 50, 80)  # Kept counts above generated do not go negative
+        record_wasted_tokens("chat", 30, 10)
+        record_wasted_tokens("other", 10, 0)
+
+    assert generation._waste == {"chat": [3, 180, 60], "other": [1, 10, 10]}
+    summaries = [r.getMessage() for r in caplog.records if r.levelno == logging.INFO]
+    assert summaries == ["[chat] 60/180 generated tokens discarded (33.3%) over 3 generations."]
@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from info_retriever import http_client as http
+from info_retriever.http_client import CircuitOpenError, HttpClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers each GET with the next (status, body) queued on the server and records the request headers.
+    """
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        status, body = self.server.responses.pop(0) if self.server.responses else (200, {"ok": True})
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.responses = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/api"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http, "BACKOFF_BASE", 0)
+    client = HttpClient(source_settings={"stub": {"retries": 2, "failure_threshold": 2, "reset_timeout": 60}})
+    yield client
+    client.executor.shutdown()
+
+
+def test_retries_retryable_statuses(server, client):
+    server.responses = [(503, {}), (429, {}), (200, {"answer": 42})]
+    assert client.get_json("stub", server.url) == {"answer": 42}
+    assert len(server.requests) == 3
+
+
+def test_client_errors_are_returned_without_retrying(server, client):
+    server.responses = [(401, {"message": "bad key"})]
+    assert client.get_json("stub", server.url) == {"message": "bad key"}
+    assert len(server.requests) == 1
+
+
+def test_circuit_opens_after_repeated_failures(server, client):
+    server.responses = [(500, {})] * 6
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get_json("stub", server.url)
+    with pytest.raises(CircuitOpenError):
+        client.submit("stub", server.url).result()
+    assert len(server.requests) == 6
+
+
+def test_requests_identify_the_client(server, client):
+    client.get_json("stub", server.url)
+    assert server.requests[0]["User-Agent"] == http.USER_AGENT
+    assert "Jarvis" in http.USER_AGENT
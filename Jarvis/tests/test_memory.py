@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+import memory
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "DB_PATH", str(tmp_path / "memory.db"))
+    monkeypatch.setattr(memory, "session_buffers", memory.OrderedDict())
+    memory.initialize_db()
+    return memory
+
+
+@pytest.fixture(params=["Asia/Tokyo", "America/Los_Angeles"])
+def local_timezone(request, monkeypatch):
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_fresh_turns_survive_any_local_timezone(db, local_timezone):
+    db.add_short_term("conversation", "hello", "hi there", "s1")
+    assert db.get_recent_conversation("s1") == [("hello", "hi there")]
+    assert [row[1] for row in db.get_short_term("s1")] == ["hello"]
+
+
+def test_expired_turns_are_dropped(db, local_timezone):
+    expired = db.utc_timestamp(db.SHORT_TERM_MEMORY_DURATION + db.timedelta(minutes=5))
+    db._write_short_term([("conversation", "old", "old reply", expired, "s1")])
+    db.add_short_term("conversation", "new", "new reply", "s1")
+    assert db.get_recent_conversation("s1") == [("new", "new reply")]
+    assert [row[1] for row in db.get_short_term("s1")] == ["new"]
+
+
+def test_turns_stay_in_the_prompt_until_summarized(db):
+    turns = [(f"q{i}", f"a{i}") for i in range(db.RECENT_TURNS + 1)]
+    for command, response in turns:
+        db.add_short_term("conversation", command, response, "s1")
+    db.flush_memory()
+
+    # One turn past the recent window is too few to summarize, so it stays verbatim
+    assert not db.compact_conversation(lambda previous, older: "unused", "s1")
+    assert db.get_conversation_context("s1") == ("", turns)
+
+    db.add_short_term("conversation", "q5", "a5", "s1")
+    db.flush_memory()
+    assert db.compact_conversation(lambda previous, older: " ".join(cmd for cmd, _ in older), "s1")
+    assert db.get_conversation_context("s1") == ("q0 q1", turns[2:] + [("q5", "a5")])
+
+
+def test_turns_are_embedded_outside_the_lock_and_evicted_beyond_the_cap(db, monkeypatch):
+    from memory_index import HashingEmbedder
+
+    hashing = HashingEmbedder()
+    locked_calls = []
+
+    def embedder(text):
+        locked_calls.append(db.memory_lock.locked())
+        return hashing(text)
+
+    monkeypatch.setattr(db, "semantic_index", None)
+    monkeypatch.setattr(db, "embedder", None)
+    monkeypatch.setattr(db, "MAX_TURN_VECTORS", 3)
+    db.enable_semantic_index(embedder)
+
+    topics = ["apples", "bicycles", "volcanoes", "guitars", "glaciers"]
+    for topic in topics:
+        db.add_short_term("conversation", f"tell me about {topic}", f"{topic} are great", "s1")
+    db.set_persistent("favorite_color", "green")
+    assert not any(locked_calls[1:])  # The first call is enable_semantic_index's dimension probe
+
+    db.cleanup_short_term()
+    assert db.semantic_index.size == 4  # Three turns and the fact
+    assert db.recall("apples", "s1", kinds=("turn",)) == []
+    assert db.recall("glaciers", "s1")[0][1] == db.format_turn("tell me about glaciers", "glaciers are great")
+    assert db.recall("favorite color", "s1")[0][:2] == ("fact", "favorite color: green")
+
+
+def test_recall_is_not_crowded_out_by_other_sessions(db, monkeypatch):
+    from memory_index import HashingEmbedder
+
+    monkeypatch.setattr(db, "semantic_index", None)
+    monkeypatch.setattr(db, "embedder", None)
+    db.enable_semantic_index(HashingEmbedder())
+
+    db.add_short_term("conversation", "what is the weather in paris", "rain later", "me")
+    for i in range(50):
+        db.add_short_term("conversation", "weather in paris", f"weather in paris is sunny {i}", f"other{i}")
+
+    hits = db.recall("weather in paris", "me")
+    assert [text for _, text, _ in hits] == [db.format_turn("what is the weather in paris", "rain later")]
+    assert db.recall("weather in paris", "nobody") == []
+
+
+def test_rows_stay_visible_and_ordered_while_flushes_overlap(db, monkeypatch):
+    monkeypatch.setattr(db, "write_behind_started", True)
+    writing = threading.Event()
+    release = threading.Event()
+    embed = db._turn_vectors
+
+    def slow_embed(rows):
+        if rows[0][1] == "first":
+            writing.set()
+            release.wait(5)
+        return embed(rows)
+
+    monkeypatch.setattr(db, "_turn_vectors", slow_embed)
+    db.add_short_term("conversation", "first", "one", "s1")
+    first = threading.Thread(target=db.flush_memory)
+    first.start()
+    assert writing.wait(5)
+    db.add_short_term("conversation", "second", "two", "s1")
+    second = threading.Thread(target=db.flush_memory)
+    second.start()
+
+    # The batch being written and the one waiting for it are both visible to readers
+    assert [row[1] for row in db.get_short_term("s1")] == ["second", "first"]
+    release.set()
+    first.join()
+    second.join()
+    assert db.pending_writes == [] and db.in_flight_batches == []
+    assert [row[1] for row in db.get_short_term("s1")] == ["second", "first"]
+    assert db.get_recent_conversation("s1") == [("first", "one"), ("second", "two")]
+
+
+def test_failed_flush_requeues_its_rows(db, monkeypatch):
+    monkeypatch.setattr(db, "write_behind_started", True)
+    db.add_short_term("conversation", "kept", "reply", "s1")
+
+    def failing_write(rows, vectors=None):
+        raise db.sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "_write_short_term", failing_write)
+        with pytest.raises(db.sqlite3.OperationalError):
+            db.flush_memory()
+    assert [row[1] for row in db.get_short_term("s1")] == ["kept"]
+
+    db.flush_memory()
+    assert db.pending_writes == []
+    assert [row[1] for row in db.get_short_term("s1")] == ["kept"]
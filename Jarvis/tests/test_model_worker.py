@@ -0,0 +1,116 @@
+import subprocess
+import threading
+from multiprocessing import Pipe
+
+import pytest
+
+pytest.importorskip("torch")
+
+from cancellation import CancellationToken, RequestCancelled
+from model_worker import ModelWorkerPool, _WorkerHandle, _pack, _unpack
+
+
+class FakeProcess:
+    def __init__(self, hangs=False):
+        self.hangs = hangs
+        self.killed = False
+
+    def wait(self, timeout=None):
+        if self.hangs and not self.killed:
+            raise subprocess.TimeoutExpired("worker", timeout)
+        return 0
+
+    def kill(self):
+        self.killed = True
+
+
+def fake_worker(conn):
+    """
+    Speaks the worker protocol: replies to a request with its ids reversed, except that a request whose
+    first id is 0 is held until it is cancelled and one whose first id is -1 makes the worker exit.
+    """
+    held = set()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        if message[0] == "cancel":
+            if message[1] in held:
+                held.discard(message[1])
+                conn.send((message[1], None, "cancelled"))
+            continue
+        request_id, ids, mask, generate_kwargs = message
+        tokens = _unpack(ids)
+        if tokens[0] == -1:
+            conn.close()
+            return
+        if tokens[0] == 0:
+            held.add(request_id)
+        elif generate_kwargs.get("fail"):
+            conn.send((request_id, None, "ValueError('bad input')"))
+        else:
+            assert _unpack(mask) == [1] * len(tokens)
+            conn.send((request_id, _pack(tokens[::-1]), None))
+
+
+def fake_pool(process=None):
+    pool_conn, worker_conn = Pipe()
+    pool = ModelWorkerPool(1, "fake-model")
+    pool.workers = [_WorkerHandle(0, process or FakeProcess(), pool_conn)]
+    worker = threading.Thread(target=fake_worker, args=(worker_conn,), daemon=True)
+    worker.start()
+    threading.Thread(target=pool._receive_results, args=(pool.workers[0],), daemon=True).start()
+    return pool, worker
+
+
+def test_request_round_trips_through_a_worker():
+    pool, worker = fake_pool()
+
+    assert pool.generate([5, 6, 7], [1, 1, 1], max_new_tokens=4) == [7, 6, 5]
+    assert pool.workers[0].pending == {}
+
+    with pytest.raises(RuntimeError, match="bad input"):
+        pool.generate([5], [1], fail=True)
+
+    pool.shutdown()
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_cancelling_the_token_cancels_the_worker_request():
+    pool, _ = fake_pool()
+    token = CancellationToken()
+
+    future = pool.submit([0, 1], [1, 1], cancel_token=token)
+    assert not future.done()
+    token.cancel("client disconnected")
+
+    with pytest.raises(RequestCancelled):
+        future.result(timeout=5)
+    # Other requests still go through afterwards
+    assert pool.generate([1, 2], [1, 1]) == [2, 1]
+
+
+def test_pending_requests_fail_when_the_worker_disconnects():
+    pool, worker = fake_pool()
+
+    future = pool.submit([0], [1])
+    pool.submit([-1], [1])
+    worker.join(5)
+
+    with pytest.raises(RuntimeError, match="exited"):
+        future.result(timeout=5)
+    with pytest.raises(RuntimeError, match="No model workers"):
+        pool.submit([1], [1])
+
+
+def test_shutdown_kills_a_worker_that_does_not_exit():
+    process = FakeProcess(hangs=True)
+    pool, _ = fake_pool(process)
+
+    pool.shutdown()
+
+    assert process.killed
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from sanitizer import StreamingSanitizer, sanitize
+
+PHRASES = ["User:", "Jarvis:", "abcab", "bca", "<\\s>"]
+
+
+def stream(text, phrases, chunk_size):
+    sanitizer = StreamingSanitizer(phrases)
+    emitted = ""
+    for offset in range(0, len(text), chunk_size):
+        emitted += sanitizer.feed(text[offset:offset + chunk_size])
+        if sanitizer.stopped:
+            break
+    emitted += sanitizer.finish()
+    return emitted, sanitizer
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_overlapping_phrases_cut_at_the_earliest_start(chunk_size):
+    emitted, sanitizer = stream(":abcab", ["abcab", "bca"], chunk_size)
+    assert emitted == ":"
+    assert sanitizer.stopped
+    assert sanitizer.text == sanitize(":abcab", ["abcab", "bca"]) == ":"
+
+
+def test_later_phrase_cuts_when_the_longer_one_does_not_complete():
+    emitted, sanitizer = stream("x abcax", ["abcab", "bca"], 1)
+    assert emitted == "x a"
+    assert sanitizer.text == sanitize("x abcax", ["abcab", "bca"]) == "x a"
+
+
+def test_stops_before_the_stream_ends():
+    sanitizer = StreamingSanitizer(PHRASES)
+    assert sanitizer.feed("Sure thing. ") == "Sure thing. "
+    sanitizer.feed("User: next")
+    assert sanitizer.stopped
+    assert sanitizer.feed("more") == ""
+    assert sanitizer.text == "Sure thing."
+
+
+def test_streaming_matches_sanitize_on_random_text():
+    rng = random.Random(0)
+    alphabet = "abc:User Jarvis<\\s>\U0001F600"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        emitted, sanitizer = stream(text, PHRASES, rng.randint(1, 5))
+        expected = sanitize(text, PHRASES)
+        assert sanitizer.text == expected, text
+        assert emitted.strip() == expected.strip(), text
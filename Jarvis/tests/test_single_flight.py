@@ -0,0 +1,123 @@
+import contextvars
+import threading
+import time
+
+from cancellation import CancellationToken, RequestCancelled, current_token
+from info_retriever.single_flight import SingleFlight, normalize_query
+
+
+def run_with_token(token, fn, *args):
+    context = contextvars.copy_context()
+    context.run(current_token.set, token)
+    return context.run(fn, *args)
+
+
+def test_followers_share_one_execution():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert results == ["answer", "answer"]
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_does_not_cancel_follower():
+    flight = SingleFlight("test")
+    leader_token = CancellationToken()
+    follower_token = CancellationToken()
+    started = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(current_token.get())
+        started.set()
+        token = current_token.get()
+        # Stands in for a generation that stops on its request's token
+        for _ in range(500):
+            token.raise_if_cancelled()
+            if token is follower_token:
+                return "answer"
+            time.sleep(0.01)
+        return "timed out"
+
+    outcomes = {}
+
+    def call(name, token):
+        try:
+            outcomes[name] = run_with_token(token, flight.do, "key", work)
+        except RequestCancelled as e:
+            outcomes[name] = e
+
+    leader = threading.Thread(target=call, args=("leader", leader_token))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call, args=("follower", follower_token))
+    follower.start()
+    time.sleep(0.05)
+    leader_token.cancel("client disconnected")
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(outcomes["leader"], RequestCancelled)
+    assert outcomes["follower"] == "answer"
+    assert calls == [leader_token, follower_token]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_follower_gives_up():
+    flight = SingleFlight("test")
+    leader_token = CancellationToken()
+    follower_token = CancellationToken()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        while True:
+            current_token.get().raise_if_cancelled()
+            time.sleep(0.01)
+
+    outcomes = {}
+
+    def call(name, token):
+        try:
+            outcomes[name] = run_with_token(token, flight.do, "key", work)
+        except RequestCancelled as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=call, args=("leader", leader_token))]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=call, args=("follower", follower_token)))
+    threads[1].start()
+    time.sleep(0.05)
+    follower_token.cancel()
+    leader_token.cancel()
+    for thread in threads:
+        thread.join(5)
+
+    assert isinstance(outcomes["leader"], RequestCancelled)
+    assert isinstance(outcomes["follower"], RequestCancelled)
+
+
+def test_normalize_query_keeps_punctuation():
+    assert normalize_query("  What is   C++? ") == "what is c++?"
+    assert normalize_query("what is c++") != normalize_query("what is c")
+    assert normalize_query("python 3.5") != normalize_query("python 3 5")
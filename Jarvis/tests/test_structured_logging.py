@@ -0,0 +1,80 @@
+import json
+import logging
+
+import structured_logging
+from structured_logging import (
+    RequestContextFilter, SamplingFilter, StructuredFormatter, _parse_rates, request_context
+)
+
+
+def make_record(level=logging.DEBUG, category=None, message="read audio block", **extra):
+    record = logging.LogRecord("test", level, __file__, 1, message, (), None)
+    if category is not None:
+        record.category = category
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_sampled_category_keeps_every_nth_debug_line():
+    sampler = SamplingFilter({"audio_read": 0.25})
+
+    kept = [sampler.filter(make_record(category="audio_read")) for _ in range(12)]
+
+    assert kept == [True, False, False, False] * 3
+
+
+def test_errors_and_uncategorized_records_always_pass():
+    sampler = SamplingFilter({"audio_read": 0.0}, {"audio_read": 1.0})
+
+    assert all(sampler.filter(make_record(logging.ERROR, "audio_read")) for _ in range(20))
+    assert all(sampler.filter(make_record(logging.WARNING, "audio_read")) for _ in range(20))
+    assert all(sampler.filter(make_record()) for _ in range(20))
+    assert not sampler.filter(make_record(category="audio_read"))
+
+
+def test_next_kept_record_reports_how_many_were_dropped():
+    sampler = SamplingFilter({"prompt": 1 / 3})
+    records = [make_record(category="prompt") for _ in range(4)]
+
+    assert [sampler.filter(record) for record in records] == [True, False, False, True]
+    assert not hasattr(records[0], "suppressed")
+    assert records[3].suppressed == 2
+
+
+def test_rate_limit_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(structured_logging.time, "monotonic", lambda: now[0])
+    sampler = SamplingFilter(rate_limits={"payload": 2.0})
+
+    assert [sampler.filter(make_record(category="payload")) for _ in range(3)] == [True, True, False]
+    now[0] += 0.5  # One more token
+    assert [sampler.filter(make_record(category="payload")) for _ in range(2)] == [True, False]
+
+
+def test_rates_from_the_environment_override_the_defaults():
+    rates = _parse_rates("audio_read=0.5, payload=1,", {"audio_read": 0.01, "prompt": 0.1})
+
+    assert rates == {"audio_read": 0.5, "prompt": 0.1, "payload": 1.0}
+
+
+def test_json_lines_carry_request_context_and_extra_fields():
+    formatter = StructuredFormatter(json_lines=True)
+    record = make_record(logging.INFO, "prompt", "Prompt built", tokens=42)
+
+    with request_context("abc123"):
+        RequestContextFilter().filter(record)
+    line = json.loads(formatter.format(record))
+
+    assert line["request_id"] == "abc123"
+    assert line["category"] == "prompt"
+    assert line["message"] == "Prompt built"
+    assert line["tokens"] == 42
+
+
+def test_text_lines_append_extra_fields():
+    formatter = StructuredFormatter(fmt="%(request_id)s %(message)s")
+    record = make_record(logging.INFO, "payload", "Sent reply", suppressed=3)
+    RequestContextFilter().filter(record)
+
+    assert formatter.format(record) == "- Sent reply | category=payload suppressed=3"
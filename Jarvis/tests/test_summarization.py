@@ -0,0 +1,22 @@
+import numpy as np
+
+from info_retriever.summarization import extract_relevant, split_sentences
+
+
+def test_keeps_the_most_relevant_sentences_in_order():
+    sentences = split_sentences(
+        "Paris is the capital of France. The Seine flows through Paris. Bread is baked daily. "
+        "Paris hosts the Louvre museum."
+    )
+    counts = np.array([7, 6, 4, 6])
+    assert extract_relevant(sentences, counts, 13, "paris louvre") == [
+        "Paris is the capital of France.", "Paris hosts the Louvre museum."
+    ]
+
+
+def test_truncates_the_best_sentence_when_none_fits():
+    sentences = ["Unrelated filler sentence.", " ".join(f"volcano{i}" for i in range(40)) + " volcano."]
+    counts = np.array([3, 80])
+    kept = extract_relevant(sentences, counts, 20, "volcano")
+    assert len(kept) == 1
+    assert kept[0].split() == [f"volcano{i}" for i in range(10)]
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import warm_state
+from warm_state import WarmCache
+
+
+def restart(cache, path):
+    fresh = WarmCache(cache.name, max_entries=cache.max_entries, max_bytes=cache.max_bytes, codec=cache.codec)
+    fresh.restore(path)
+    return fresh
+
+
+def test_restored_entries_are_read_lazily(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = WarmCache("test")
+    cache.put(("key", 1, None), "value")
+    cache.dump(path)
+
+    restored = restart(cache, path)
+    assert restored.stats()["on_disk"] == 1
+    assert restored.get(("key", 1, None)) == "value"
+    assert restored.stats()["restored_hits"] == 1
+
+
+def test_snapshot_respects_max_bytes_across_restarts(tmp_path):
+    path = str(tmp_path / "audio.snapshot")
+    cache = WarmCache("audio", max_bytes=1000, codec="bytes")
+    sizes = []
+    for restart_number in range(5):
+        for i in range(3):
+            cache.put(f"reply {restart_number}-{i}", os.urandom(300))
+        cache.dump(path)
+        sizes.append(os.path.getsize(path))
+        cache = restart(cache, path)
+
+    data_bytes = sum(length for _, _, length in cache.restored.values())
+    assert data_bytes <= 1000
+    assert max(sizes) - min(sizes) < 300
+    # Newest entries win
+    assert cache.get("reply 4-2") is not None
+    assert cache.get("reply 0-0") is None
+
+
+def test_failed_snapshot_leaves_cache_dirty(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.snapshot")
+    cache = WarmCache("test")
+    cache.put("key", "value")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(warm_state.os, "replace", fail)
+    with pytest.raises(OSError):
+        cache.dump(path)
+    assert cache.changes != cache.dumped_changes
+
+    monkeypatch.undo()
+    cache.dump(path)
+    assert cache.changes == cache.dumped_changes
+
+
+def test_mismatched_version_is_discarded(tmp_path):
+    path = str(tmp_path / "cache.snapshot")
+    cache = WarmCache("test", version="a")
+    cache.put("key", "value")
+    cache.dump(path)
+
+    assert WarmCache("test", version="b").restore(path) == 0
+    assert not os.path.exists(path)
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from info_retriever.wiki_index import WikiIndex, build_index
+
+ARTICLES = [
+    {"title": "Eiffel Tower", "text": "The '''Eiffel Tower''' is a wrought-iron lattice tower in Paris."},
+    {"title": "Gustave Eiffel", "text": "'''Gustave Eiffel''' was a French civil engineer who built the Eiffel Tower."},
+    {"title": "Paris", "text": "'''Paris''' is the capital of France. Its museums include the Louvre."},
+    {"title": "Iron Lady", "text": "Nickname.", "redirect": "Eiffel Tower"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    source = tmp_path / "articles.jsonl"
+    source.write_text("\n".join(json.dumps(article) for article in ARTICLES), encoding="utf-8")
+    build_index(str(source), str(tmp_path / "wiki.db"))
+    return WikiIndex(str(tmp_path / "wiki.db"))
+
+
+def test_exact_titles_and_redirects(index):
+    assert index.lookup("paris")["title"] == "Paris"
+    assert index.lookup("Iron Lady")["title"] == "Eiffel Tower"
+
+
+def test_full_text_match_needs_a_matching_title(index):
+    assert index.lookup("tower")["title"] == "Eiffel Tower"
+    assert index.lookup("who was gustave eiffel")["title"] == "Gustave Eiffel"
+    # Only mentioned in the Paris summary: a miss, not the Paris article
+    assert index.lookup("louvre") is None
+    assert index.lookup("french engineer") is None
@@ -0,0 +1,280 @@
+# warm_state.py
+#
+# Caches that survive restarts. A WarmCache is a bounded LRU; WarmState snapshots every registered cache
+# to its own file and, at startup, memory-maps the previous snapshots instead of loading them: only the
+# index is parsed, and a value is read from the mapping the first time its key is looked up.
+#
+# Snapshot layout: MAGIC, 4-byte big-endian header length, JSON header, then the encoded values back to
+# back. The header records the snapshot format, the cache's name, version and value codec, and an index
+# of [key, expires_at, offset, length]. A snapshot whose format or version does not match is deleted.
+
+import atexit
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("Warm_State")
+
+MAGIC = b"JWS\x01"
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_INTERVAL = 300  # Seconds between snapshots of caches that changed
+
+VALUE_CODECS = {
+    "text": (lambda value: value.encode("utf-8"), lambda data: str(data, "utf-8")),
+    "bytes": (bytes, bytes),
+    "json": (lambda value: json.dumps(value).encode("utf-8"), json.loads)
+}
+
+
+def cache_version(*parts):
+    """
+    Short digest of whatever a cache's values depend on (model, prompt template, voice...);
+    snapshots taken under a different version are discarded.
+    """
+    return hashlib.sha1("\x00".join(map(str, parts)).encode("utf-8")).hexdigest()[:12]
+
+
+def _freeze(key):
+    # JSON turns tuple keys into lists
+    return tuple(_freeze(part) for part in key) if isinstance(key, list) else key
+
+
+class WarmCache:
+    """
+    Thread-safe LRU of at most `max_entries` values (and `max_bytes` encoded bytes, if set). Entries
+    expire after `ttl` seconds unless put() gives their own. Keys must survive a JSON round trip
+    (strings, numbers, None and tuples of them).
+    """
+
+    def __init__(self, name, max_entries=1024, max_bytes=None, ttl=None, version="1", codec="text"):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = version
+        self.codec = codec
+        self.encode, self.decode = VALUE_CODECS[codec]
+
+        self.entries = OrderedDict()  # key -> (value, expires_at, size); expires_at 0 means never
+        self.total_bytes = 0
+        self.restored = {}  # key -> (expires_at, offset, length) in self.mapping, not yet looked up
+        self.mapping = None
+        self.lock = threading.Lock()
+        self.changes = 0
+        self.dumped_changes = 0
+        self.hits = 0
+        self.restored_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries) + len(self.restored)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if not entry[1] or entry[1] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._evict(key)
+            located = self.restored.pop(key, None)
+            if located is not None and (not located[0] or located[0] > now):
+                expires_at, offset, length = located
+                value = self.decode(self.mapping[offset:offset + length])
+                self._store(key, value, expires_at, length)
+                self.restored_hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else 0
+        size = len(value) if self.codec == "bytes" else len(self.encode(value))
+        with self.lock:
+            self.restored.pop(key, None)
+            self._store(key, value, expires_at, size)
+            self.changes += 1
+
+    def _store(self, key, value, expires_at, size):
+        if key in self.entries:
+            self._evict(key)
+        self.entries[key] = (value, expires_at, size)
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or (
+                self.max_bytes and self.total_bytes > self.max_bytes and len(self.entries) > 1):
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, key):
+        self.total_bytes -= self.entries.pop(key)[2]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "on_disk": len(self.restored),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "restored_hits": self.restored_hits,
+                "misses": self.misses
+            }
+
+    def _within_limits(self, sizes):
+        """
+        How many of the newest entries (given their sizes, newest last) fit max_entries and max_bytes.
+        """
+        kept = total = 0
+        for size in reversed(sizes[-self.max_entries:]):
+            if self.max_bytes and kept and total + size > self.max_bytes:
+                break
+            total += size
+            kept += 1
+        return kept
+
+    def dump(self, path):
+        """
+        Write a snapshot of the live entries plus restored ones never looked up, newest last,
+        atomically replacing `path`. Restored entries count against max_entries and max_bytes
+        like live ones. Returns the number of entries written.
+        """
+        now = time.time()
+        with self.lock:
+            live = [(key, value, expires_at) for key, (value, expires_at, _) in self.entries.items()]
+            unread = list(self.restored.items())
+            mapping = self.mapping
+            changes = self.changes
+
+        # Restored values are written straight from the old mapping, without copying or decoding them
+        view = memoryview(mapping) if mapping is not None else None
+        items = [(key, expires_at, view[offset:offset + length]) for key, (expires_at, offset, length) in unread]
+        items += [(key, expires_at, self.encode(value)) for key, value, expires_at in live]
+        items = [item for item in items if not item[1] or item[1] > now]
+        kept = self._within_limits([len(data) for _, _, data in items])
+        items = items[len(items) - kept:]
+
+        index, offset = [], 0
+        for key, expires_at, data in items:
+            index.append([key, expires_at, offset, len(data)])
+            offset += len(data)
+        header = json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "cache": self.name,
+            "version": self.version,
+            "codec": self.codec,
+            "created": now,
+            "index": index
+        }).encode("utf-8")
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(4, byteorder="big") + header)
+            for _, _, data in items:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        # Only a snapshot that reached the disk marks the cache clean
+        self.dumped_changes = changes
+        return len(items)
+
+    def restore(self, path):
+        """
+        Map a snapshot written by dump() and index its entries for lazy lookup. Snapshots from another
+        format, cache or version are deleted. Returns the number of entries made available.
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError("not a warm-state snapshot")
+                header_length = int.from_bytes(f.read(4), byteorder="big")
+                header = json.loads(f.read(header_length))
+                expected = (SNAPSHOT_FORMAT, self.name, self.version, self.codec)
+                found = (header.get("format"), header.get("cache"), header.get("version"), header.get("codec"))
+                if found != expected:
+                    raise ValueError(f"snapshot is {found}, expected {expected}")
+                data_start = len(MAGIC) + 4 + header_length
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if header["index"] else None
+        except (OSError, ValueError) as e:  # json.JSONDecodeError is a ValueError
+            logger.warning(f"Discarding warm-state snapshot '{path}': {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return 0
+
+        now = time.time()
+        index = [
+            (_freeze(key), expires_at, data_start + offset, length)
+            for key, expires_at, offset, length in header["index"]
+            if not expires_at or expires_at > now
+        ]
+        # A snapshot taken with larger limits is cut to this cache's, newest entries first
+        index = index[len(index) - self._within_limits([length for _, _, _, length in index]):]
+        with self.lock:
+            self.mapping = mapping
+            self.restored = {
+                key: (expires_at, offset, length)
+                for key, expires_at, offset, length in index if key not in self.entries
+            }
+            return len(self.restored)
+
+
+class WarmState:
+    """
+    Snapshots registered caches into `directory` every `interval` seconds (only those that changed)
+    and at exit, and restores them at startup.
+    """
+
+    def __init__(self, directory, interval=SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.caches = {}
+        self.lock = threading.Lock()  # One snapshot at a time
+
+    def register(self, cache):
+        self.caches[cache.name] = cache
+        return cache
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.snapshot")
+
+    def restore(self):
+        start = time.perf_counter()
+        counts = {name: cache.restore(self.path(name)) for name, cache in self.caches.items()}
+        logger.info(
+            f"Warm state restored in {1000 * (time.perf_counter() - start):.1f} ms: "
+            + ", ".join(f"{name}={count}" for name, count in counts.items())
+        )
+        return counts
+
+    def snapshot(self, force=False):
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for name, cache in self.caches.items():
+                if not force and cache.changes == cache.dumped_changes:
+                    continue
+                try:
+                    start = time.perf_counter()
+                    count = cache.dump(self.path(name))
+                    logger.info(f"Snapshotted {count} '{name}' entries in {1000 * (time.perf_counter() - start):.1f} ms.")
+                except Exception as e:
+                    logger.error(f"Failed to snapshot '{name}': {e}", exc_info=True)
+
+    def snapshot_daemon(self):
+        while True:
+            time.sleep(self.interval)
+            self.snapshot()
+
+    def start(self):
+        threading.Thread(target=self.snapshot_daemon, daemon=True).start()
+        atexit.register(self.snapshot)